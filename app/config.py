@@ -22,6 +22,103 @@ class Config(BaseSettings):
     DB_PORT: str
     DB_NAME: str
     DB_PASSWORD: str
+    DB_POOL_SIZE: int = 2
+
+    # Reports and analytics: a separate pool, optionally on a replica.
+    REPORT_DSN: str | None = None
+    REPORT_POOL_SIZE: int = 2
+    REPORT_STATEMENT_TIMEOUT_MS: int = 60000
+    TRADE_RESULT_INTERVAL: float = 60
+    # Background writes (shadow trades, partition maintenance): their own pool, never the trading one.
+    WRITER_POOL_SIZE: int = 2
+
+    # Monthly partitions of orders: longest an order stays open (for partition pruning),
+    # closed months older than the retention go to ORDERS_ARCHIVE_DIR, None keeps everything.
+    # Maintenance runs in the bot on the writer pool, its DDL waits at most the lock timeout;
+    # detaching a month locks the whole table, so the drop waits much less per attempt.
+    ORDERS_MAX_OPEN_DAYS: int = 31
+    ORDERS_RETENTION_MONTHS: int | None = None
+    ORDERS_ARCHIVE_DIR: str = "archive"
+    PARTITION_MAINTENANCE: bool = True
+    PARTITION_MAINTENANCE_INTERVAL: float = 6 * 3600
+    PARTITION_LOCK_TIMEOUT_MS: int = 5000
+    PARTITION_DROP_LOCK_TIMEOUT_MS: int = 200
+
+    INSTRUMENTS_TTL: int = 3600
+    TAPE_DIR: str | None = None
+    STRATEGY: str = "ema_rsi"
+    # Higher timeframes (minutes) rolled up from 1m bars, e.g. [5, 15, 60, 240];
+    # confluence rule they gate the 1m/1s signal with: all, majority or trend (none against).
+    # Startup pages back 102 bars of the longest one; a timeframe still warming up never agrees.
+    TIMEFRAMES: list[int] = []
+    CONFLUENCE: str = "trend"
+    # Volume indicators on closed 1m klines (one kline request a minute when on): VWAP window in bars
+    # (None - UTC day session) and band width in std, profile window in bars, bucket size as a share
+    # of price and value area share; VOLUME_TP pulls TP in front of VWAP/profile levels.
+    VOLUME_INDICATORS: bool = False
+    VWAP_WINDOW: int | None = None
+    VWAP_BAND_STD: float = 2
+    VOLUME_PROFILE_BARS: int = 1440
+    VOLUME_PROFILE_RESOLUTION: float = 0.0005
+    VOLUME_VALUE_AREA: float = 0.7
+    VOLUME_TP: bool = False
+
+    # Warm restart: state snapshot file, save interval and max age (seconds) to still use it.
+    SNAPSHOT_PATH: str | None = None
+    SNAPSHOT_INTERVAL: float = 10
+    SNAPSHOT_MAX_AGE: float = 12 * 3600
+
+    # L2 book over the websocket, 0 disables it; imbalance depth in levels, max age in seconds.
+    ORDERBOOK_DEPTH: int = 0
+    ORDERBOOK_IMBALANCE_DEPTH: int = 5
+    ORDERBOOK_MAX_AGE: float = 5
+
+    # amend_order budget (per second / burst) shared by entry chasing and trailing stops.
+    AMEND_RATE: float = 5
+    AMEND_BURST: int = 10
+    # Entry chasing: reprice after `trigger` drift, up to `max_drift` from the first price; 0 amends disables.
+    ENTRY_CHASE_TRIGGER: float = 0.002
+    ENTRY_CHASE_MAX_DRIFT: float = 0.01
+    ENTRY_CHASE_MAX_AMENDS: int = 5
+
+    # Trailing stop after TP1: "atr" or "percent" distance, amended after a min step (fraction of price) and interval.
+    TRAILING_MODE: str = "atr"
+    TRAILING_ATR_MULT: float = 1.0
+    TRAILING_PERCENT: float = 0.003
+    TRAILING_MIN_STEP: float = 0.0005
+    TRAILING_MIN_INTERVAL: float = 5
+
+    # Shadow variants paper-traded on the live feed; empty SHADOW_VARIANTS means the default grid.
+    SHADOW_ENABLED: bool = False
+    SHADOW_VARIANTS: list[dict] = []
+    SHADOW_FLUSH_INTERVAL: float = 30
+    SHADOW_MAX_PENDING: int = 10000
+
+    # Entry sizing: leverage of new entries, share of equity lost at a 1 ATR stop, exposure cap in equities.
+    LEVERAGE: float = 10
+    RISK_PER_TRADE: float = 0.01
+    RISK_MAX_EXPOSURE: float = 3.0
+    RISK_MAX_MARGIN_USDT: float = 20
+    RISK_REFRESH_INTERVAL: float = 30
+
+    # Sampling profiler: SIGUSR1 or `start [seconds]` on the local PROFILE_PORT toggles it.
+    PROFILE_DIR: str = "profiles"
+    PROFILE_INTERVAL: float = 0.01
+    PROFILE_DURATION: float = 30
+    PROFILE_FORMAT: str = "speedscope"
+    PROFILE_PORT: int | None = None
+
+    # Memory instrumentation: tracemalloc per stage, report interval (seconds) and an RSS budget.
+    MEMORY_TRACE: bool = False
+    MEMORY_TRACE_FRAMES: int = 5
+    MEMORY_INTERVAL: float = 300
+    MEMORY_BUDGET_MB: float | None = None
+
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = False
+    LOG_ENQUEUE: bool = True
+    LOG_SAMPLE_INTERVAL: float = 1.0
+    LOG_SAMPLE_INTERVALS: dict[str, float] = {}
 
     @property
     def base_dir(self) -> str:
@@ -35,5 +132,9 @@ class Config(BaseSettings):
             f"@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
         )
 
+    @property
+    def report_dsn(self) -> str:
+        return self.REPORT_DSN or self.async_dsn
+
 
 config = Config()
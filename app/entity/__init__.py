@@ -1,6 +1,8 @@
 from pydantic import BaseModel
+from app.entity.instrument import Instrument
 from app.entity.order import Order, AddOrder, BybitOrder
-from app.entity.trade import TradeResult, Kline, Ticker
+from app.entity.trade import TradeResult, Kline, Ticker, ReplayDecision, Position, TradeReport, ShadowTrade, ShadowVariant, \
+    RiskFraction, RiskSimulation
 
 
 AnyModel = dict[str, any]
@@ -11,10 +13,18 @@ __all__ = [
     "AnyModel",
     "Entity",
     "FindAllResult",
+    "Instrument",
     "Order",
     "AddOrder",
     "BybitOrder",
     "TradeResult",
     "Kline",
     "Ticker",
+    "ReplayDecision",
+    "Position",
+    "TradeReport",
+    "ShadowTrade",
+    "ShadowVariant",
+    "RiskFraction",
+    "RiskSimulation",
 ]
@@ -0,0 +1,77 @@
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP, ROUND_UP
+from typing import Any
+
+from pydantic import BaseModel, model_validator
+
+
+class Instrument(BaseModel):
+    symbol: str
+    tick_size: Decimal
+    qty_step: Decimal
+    min_qty: Decimal
+    max_qty: Decimal
+    min_notional: Decimal = Decimal(0)
+    min_leverage: float = 1
+    max_leverage: float
+    leverage_step: Decimal = Decimal("0.01")
+
+    @model_validator(mode="before")
+    @classmethod
+    def parse_bybit(cls, data: Any) -> Any:
+        if not isinstance(data, dict) or "priceFilter" not in data:
+            return data
+        lot_size = data["lotSizeFilter"]
+        leverage = data["leverageFilter"]
+        return {
+            "symbol": data["symbol"],
+            "tick_size": data["priceFilter"]["tickSize"],
+            "qty_step": lot_size["qtyStep"],
+            "min_qty": lot_size["minOrderQty"],
+            "max_qty": lot_size["maxOrderQty"],
+            "min_notional": lot_size.get("minNotionalValue") or 0,
+            "min_leverage": leverage["minLeverage"],
+            "max_leverage": leverage["maxLeverage"],
+            "leverage_step": leverage["leverageStep"],
+        }
+
+    @staticmethod
+    def _quantize(value: float | Decimal, step: Decimal, rounding: str) -> Decimal:
+        steps = (Decimal(str(value)) / step).to_integral_value(rounding)
+        return (steps * step).quantize(step)
+
+    def quantize_price(self, value: float) -> Decimal:
+        return self._quantize(value, self.tick_size, ROUND_HALF_UP)
+
+    def quantize_qty(self, value: float) -> Decimal:
+        """Floors qty to the step, never rounds a position size up."""
+        return self._quantize(value, self.qty_step, ROUND_DOWN)
+
+    def quantize_order_qty(self, value: float, price: float | None = None) -> Decimal:
+        """Entry qty: floored to the step, then raised to the minimal qty and notional."""
+        qty = max(self.quantize_qty(value), self.min_qty)
+        if price and self.min_notional and qty * Decimal(str(price)) < self.min_notional:
+            qty = self._quantize(self.min_notional / Decimal(str(price)), self.qty_step, ROUND_UP)
+        return min(qty, self.max_qty)
+
+    def split_tp_qty(self, value: float) -> tuple[Decimal, Decimal]:
+        """TP1 and TP2 sizes covering the whole position: TP1 floored to half, TP2 the rest."""
+        total = self.quantize_qty(value)
+        tp1 = self.quantize_qty(total / 2)
+        return tp1, total - tp1
+
+    def can_split_tp(self, value: float) -> bool:
+        """Both TP legs reach the minimal qty, otherwise the exchange rejects the smaller one."""
+        return min(self.split_tp_qty(value)) >= self.min_qty
+
+    def quantize_leverage(self, value: float) -> Decimal:
+        value = min(max(value, self.min_leverage), self.max_leverage)
+        return self._quantize(value, self.leverage_step, ROUND_DOWN)
+
+    def round_price(self, value: float) -> float:
+        return float(self.quantize_price(value))
+
+    def round_qty(self, value: float) -> float:
+        return float(self.quantize_qty(value))
+
+    def round_order_qty(self, value: float, price: float | None = None) -> float:
+        return float(self.quantize_order_qty(value, price))
@@ -3,6 +3,7 @@ import datetime
 from pydantic import BaseModel, computed_field, Field, field_validator
 
 from app.entity.enums import OrderType
+from app.entity.instrument import Instrument
 from app.entity.mixins import IdMixin, DateTimeMixin
 
 
@@ -87,6 +88,27 @@ class AddOrder(BaseOrder):
     # orderId_open: str | None = None
     # reverse: bool = False
     atr: float
+    instrument: Instrument | None = Field(default=None, exclude=True)
+    margin: float = Field(default=20, exclude=True)
+    # Volume levels (VWAP bands, POC, value area) TP is pulled in front of, empty keeps pure ATR targets.
+    tp_levels: list[float] = Field(default_factory=list, exclude=True)
+
+    def _round_price(self, value: float) -> float:
+        if self.instrument is None:
+            return round(value, 1)
+        return self.instrument.round_price(value)
+
+    def _target(self, multiple: float, nearest: float) -> float:
+        """price_open + `multiple` ATR in the trade direction, or the closest level from `nearest` ATR on before it."""
+        sign = 1 if self.order_type == OrderType.long else -1
+        distance = self.atr * multiple
+        levels = [
+            sign * (level - self.price_open) for level in self.tp_levels
+            if self.atr * nearest <= sign * (level - self.price_open) < distance
+        ]
+        if levels:
+            distance = min(levels)
+        return self._round_price(self.price_open + sign * distance)
 
     # @property
     # def open_side(self) -> str:
@@ -117,33 +139,28 @@ class AddOrder(BaseOrder):
     @computed_field
     @property
     def value(self) -> float:
-        value_usdt = 20
-        value = self.leverage * value_usdt / self.price_open
-        return round(value, 3)
+        value = self.leverage * self.margin / self.price_open
+        if self.instrument is None:
+            return round(value, 3)
+        return self.instrument.round_order_qty(value, self.price_open)
 
     @computed_field
     @property
     def price_tp1(self) -> float:
-        if self.order_type == OrderType.long:
-            return round(self.price_open + self.atr * 1, 1)
-        else:
-            return round(self.price_open - self.atr * 1, 1)
+        return self._target(1, 0.5)
 
     @computed_field
     @property
     def price_tp2(self) -> float:
-        if self.order_type == OrderType.long:
-            return round(self.price_open + self.atr * 2.5, 1)
-        else:
-            return round(self.price_open - self.atr * 2.5, 1)
+        return self._target(2.5, 1.5)
 
     @computed_field
     @property
     def price_sl(self) -> float:
         if self.order_type == OrderType.long:
-            return round(self.price_open - self.atr * 1, 1)
+            return self._round_price(self.price_open - self.atr * 1)
         else:
-            return round(self.price_open + self.atr * 1, 1)
+            return self._round_price(self.price_open + self.atr * 1)
 
 
 class BybitOrder(BaseModel):
@@ -1,6 +1,9 @@
 import datetime
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+from app.entity.enums import OrderType
+from app.entity.mixins import IdMixin, DateTimeMixin
 
 
 class TradeResult(BaseModel):
@@ -27,3 +30,95 @@ class Kline(BaseModel):
 class Ticker(BaseModel):
     close: float = Field(..., alias="lastPrice")
     mark_price: float = Field(..., alias="markPrice")
+
+
+class ReplayDecision(BaseModel):
+    time: datetime.datetime
+    action: str
+    price: float
+    direction: OrderType | None
+
+
+class Position(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    position_idx: int = Field(..., alias="positionIdx")
+    side: str
+    size: float
+    avg_price: float = Field(..., alias="avgPrice")
+    mark_price: float = Field(0, alias="markPrice")
+    unrealised_pnl: float = Field(0, alias="unrealisedPnl")
+
+    @field_validator("avg_price", "mark_price", "unrealised_pnl", mode="before")
+    def parse_float(cls, value: str | float) -> float:
+        return float(value or 0)
+
+    @property
+    def sign(self) -> int:
+        return 1 if self.position_idx == 1 else -1
+
+    @property
+    def value(self) -> float:
+        return self.size * (self.mark_price or self.avg_price)
+
+
+class TradeReport(BaseModel):
+    trades: int
+    pnl: float
+    win_rate: float | None
+    max_drawdown: float
+    sharpe: float | None
+    avg_r: float | None
+    tp1_ratio: float | None
+    tp2_ratio: float | None
+    sl_ratio: float | None
+    avg_time_in_trade: datetime.timedelta | None
+
+
+class RiskFraction(BaseModel):
+    fraction: float
+    risk_of_ruin: float
+    drawdown_p50: float
+    drawdown_p95: float
+    drawdown_p99: float
+    growth_p05: float
+    growth_p50: float
+
+
+class RiskSimulation(BaseModel):
+    trades: int
+    paths: int
+    horizon: int
+    current_fraction: float | None
+    optimal_fraction: float | None
+    fractions: list[RiskFraction]
+
+
+class ShadowTrade(IdMixin, DateTimeMixin):
+    variant: str
+    order_type: OrderType
+    value: float
+    price_open: float
+    price_tp1: float
+    price_tp2: float
+    price_sl: float
+    price_close: float
+    pnl: float
+    exit_reason: str
+    open_at: datetime.datetime
+    close_at: datetime.datetime
+    tp1_executed_at: datetime.datetime | None
+
+
+class ShadowVariant(BaseModel):
+    """Parameters of a paper-traded strategy variant; TP/SL are in ATR."""
+
+    name: str
+    ema_fast: int = 9
+    ema_slow: int = 21
+    rsi_upper: float = 70
+    rsi_lower: float = 30
+    min_atr: float = 0.0015
+    tp1: float = 1
+    tp2: float = 2.5
+    sl: float = 1
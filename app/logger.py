@@ -1,5 +1,7 @@
 import json
 import sys
+import time
+from typing import Any, TextIO
 
 from loguru import logger
 
@@ -10,17 +12,88 @@ def serialize(record):
         "module": record["module"],
         "message": record["message"],
         "line": record["line"],
-        "exception": record["exception"],
+        "exception": str(record["exception"]) if record["exception"] else None,
         "level_name": record["level"].name,
         "file_path": record["file"].path,
         "time": str(record["time"]),
     }
-    return json.dumps(subset)
+    extra = {key: value for key, value in record["extra"].items() if key != "serialized"}
+    if extra:
+        subset["extra"] = extra
+    return json.dumps(subset, default=str)
 
 
 def patching(record):
     record["extra"]["serialized"] = serialize(record)
 
 
+class JsonSink:
+    """Serializes records in the sink, so with enqueue=True json.dumps runs in the loguru worker thread."""
+
+    def __init__(self, stream: TextIO = sys.stdout):
+        self.stream = stream
+
+    def __call__(self, message) -> None:
+        self.stream.write(serialize(message.record) + "\n")
+        self.stream.flush()
+
+
+class Sampler:
+    """Per message type rate limiter: allows one message per `interval` seconds for each key."""
+
+    def __init__(self, interval: float = 1.0, intervals: dict[str, float] | None = None):
+        self.interval = interval
+        self.intervals = intervals or {}
+        self.last: dict[str, float] = {}
+        self.suppressed: dict[str, int] = {}
+
+    def __call__(self, key: str) -> bool:
+        now = time.monotonic()
+        interval = self.intervals.get(key, self.interval)
+        if now - self.last.get(key, float("-inf")) < interval:
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1
+            return False
+        self.last[key] = now
+        return True
+
+    def pop_suppressed(self, key: str) -> int:
+        return self.suppressed.pop(key, 0)
+
+
+sampler = Sampler()
+
+
+def log_sampled(
+    key: str, message: str, *args: Any, level: str = "INFO", lazy: bool = False, **kwargs: Any
+) -> None:
+    """Logs at most once per sampling interval for `key`.
+
+    Arguments are formatted by loguru only when the message is actually emitted,
+    so callers must pass values as args instead of pre-formatted f-strings.
+    With lazy=True args are callables evaluated only for emitted messages.
+    """
+    if not sampler(key):
+        return
+    logger.bind(sample=key, suppressed=sampler.pop_suppressed(key)).opt(lazy=lazy, depth=1).log(
+        level, message, *args, **kwargs
+    )
+
+
+def setup_logger(
+    level: str = "INFO",
+    json_format: bool = False,
+    enqueue: bool = True,
+    sample_interval: float = 1.0,
+    sample_intervals: dict[str, float] | None = None,
+) -> None:
+    sampler.interval = sample_interval
+    sampler.intervals = sample_intervals or {}
+    logger.remove()
+    if json_format:
+        logger.add(JsonSink(sys.stdout), level=level, format="{message}", enqueue=enqueue)
+    else:
+        logger.add(sys.stdout, level=level, enqueue=enqueue)
+
+
 # logger = logger.patch(patching)
 # logger.add(sys.stdout, format="{extra[serialized]}")
@@ -1,7 +1,9 @@
 from app.models.mixins import Base
 from app.models.orders import Order
+from app.models.shadow_trades import ShadowTrade
 
 __all__ = [
     "Base",
     "Order",
+    "ShadowTrade",
 ]
\ No newline at end of file
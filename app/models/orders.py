@@ -1,13 +1,27 @@
 import datetime
 
+from sqlalchemy import Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.entity.enums import OrderType
 from app.models.mixins import IdMixin, TimestampMixin, Base
+from app.utils.datetime import utc_now
 
 
 class Order(IdMixin, TimestampMixin, Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Keyset pagination keys
+        Index("ix_orders_close_at_id", "close_at", "id"),
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        # Open orders lookup, tiny in every partition
+        Index("ix_orders_open", "reverse", postgresql_where=text("close_at IS NULL")),
+        # Monthly partitions, managed by app.services.partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    # The partition key has to be part of the primary key.
+    created_at: Mapped[datetime.datetime] = mapped_column(default=utc_now, primary_key=True, sort_order=99)
 
     value: Mapped[float] = mapped_column(nullable=False)
     value_tokens: Mapped[float] = mapped_column(nullable=False)
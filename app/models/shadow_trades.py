@@ -0,0 +1,30 @@
+import datetime
+
+from sqlalchemy import Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.entity.enums import OrderType
+from app.models.mixins import IdMixin, TimestampMixin, Base
+
+
+class ShadowTrade(IdMixin, TimestampMixin, Base):
+    """Paper trade of a shadow strategy variant, never sent to the exchange."""
+
+    __tablename__ = "shadow_trades"
+    __table_args__ = (
+        Index("ix_shadow_trades_variant_close_at", "variant", "close_at"),
+    )
+
+    variant: Mapped[str] = mapped_column(nullable=False)
+    order_type: Mapped[OrderType] = mapped_column(nullable=False)
+    value: Mapped[float] = mapped_column(nullable=False)
+    price_open: Mapped[float] = mapped_column(nullable=False)
+    price_tp1: Mapped[float] = mapped_column(nullable=False)
+    price_tp2: Mapped[float] = mapped_column(nullable=False)
+    price_sl: Mapped[float] = mapped_column(nullable=False)
+    price_close: Mapped[float] = mapped_column(nullable=False)
+    pnl: Mapped[float] = mapped_column(nullable=False)
+    exit_reason: Mapped[str] = mapped_column(nullable=False)
+    open_at: Mapped[datetime.datetime] = mapped_column(nullable=False)
+    close_at: Mapped[datetime.datetime] = mapped_column(nullable=False)
+    tp1_executed_at: Mapped[datetime.datetime] = mapped_column(nullable=True)
@@ -1,7 +1,21 @@
-from app.repository.sauow import engine, pg_async_session_maker, SAUnitOfWork
+from app.repository.sauow import (
+    engine,
+    pg_async_session_maker,
+    report_engine,
+    report_session_maker,
+    writer_engine,
+    writer_session_maker,
+    SAUnitOfWork,
+    ReadOnlyUnitOfWork,
+)
 
 __all__ = [
     "engine",
     "pg_async_session_maker",
+    "report_engine",
+    "report_session_maker",
+    "writer_engine",
+    "writer_session_maker",
     "SAUnitOfWork",
+    "ReadOnlyUnitOfWork",
 ]
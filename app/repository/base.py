@@ -1,8 +1,12 @@
 import abc
+import enum
+import functools
+from itertools import islice
+from typing import Any, AsyncIterator, Iterable
 
 import pydantic
 from sqlalchemy import exc as saexc
-from sqlalchemy import insert, select, update, func, delete
+from sqlalchemy import insert, select, update, func, delete, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from sqlalchemy.dialects.postgresql import insert as pg_insert
@@ -11,6 +15,21 @@ from app import exc
 from app.entity import AnyModel, Entity, FindAllResult
 
 
+# Postgres wire protocol limit of bind parameters per statement.
+MAX_BIND_PARAMS = 32767
+
+
+def chunked(data: Iterable, size: int) -> Iterable[list]:
+    iterator = iter(data)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@functools.cache
+def type_adapter(schema) -> pydantic.TypeAdapter:
+    return pydantic.TypeAdapter(schema)
+
+
 class AbstractRepository(abc.ABC):
     @abc.abstractmethod
     async def add(self, data: AnyModel) -> Entity:
@@ -40,6 +59,16 @@ class AbstractRepository(abc.ABC):
     async def find_all(self, filter_by: AnyModel, offset: int, limit: int, order: str, order_by: str) -> FindAllResult:
         raise NotImplementedError
 
+    @abc.abstractmethod
+    async def find_page(
+            self, filter_by: AnyModel, after: tuple | None, limit: int, order: str, order_by: str
+    ) -> list[Entity]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def stream_all(self, filter_by: AnyModel, batch_size: int, order: str, order_by: str) -> AsyncIterator[Entity]:
+        raise NotImplementedError
+
     @abc.abstractmethod
     async def bulk_add(self, data: list[AnyModel]) -> list[Entity]:
         raise NotImplementedError
@@ -50,6 +79,12 @@ class AbstractRepository(abc.ABC):
     ) -> list[Entity]:
         raise NotImplementedError
 
+    @abc.abstractmethod
+    async def bulk_copy(
+            self, data: Iterable[AnyModel | pydantic.BaseModel], by_fields: list[str] | None, fields: list[str] | None
+    ) -> int:
+        raise NotImplementedError
+
 
 class SARepository(AbstractRepository):
     model = None
@@ -117,13 +152,22 @@ class SARepository(AbstractRepository):
         return row
 
     async def find_all(
-        self, filter_by: AnyModel, offset: int = 0, limit: int = 100, order: str = "desc", order_by: str = "id"
+        self,
+        filter_by: AnyModel,
+        offset: int = 0,
+        limit: int = 100,
+        order: str = "desc",
+        order_by: str = "id",
+        estimate: bool = False,
     ) -> FindAllResult:
         filter_by = filter_by or {}
         order = getattr(self.model, order_by).desc() if order == "desc" else getattr(self.model, order_by).asc()
-        count = (await self.session.execute(
-            select(func.count(self.model.id)).filter_by(**filter_by)
-        )).scalar_one()
+        if estimate and not filter_by:
+            count = await self.estimate_count()
+        else:
+            count = (await self.session.execute(
+                select(func.count(self.model.id)).filter_by(**filter_by)
+            )).scalar_one()
 
         rows = (await self.session.execute(
             select(self.model)
@@ -135,15 +179,107 @@ class SARepository(AbstractRepository):
 
         return count, self.to_read_models(rows)
 
+    async def estimate_count(self) -> int:
+        """Planner row estimate of the whole table, no scan.
+
+        A partitioned parent is never analyzed, its estimate is the sum over the partitions;
+        a partition not analyzed yet (new and empty ones) counts as 0.
+        """
+        stmt = text(
+            "SELECT CASE WHEN c.relkind = 'p' THEN ("
+            "  SELECT CASE WHEN bool_or(p.reltuples >= 0) THEN sum(greatest(p.reltuples, 0)) ELSE -1 END"
+            "  FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhrelid WHERE i.inhparent = c.oid"
+            ") ELSE c.reltuples END::bigint "
+            "FROM pg_class c WHERE c.oid = CAST(:table AS regclass)"
+        )
+        count = (await self.session.execute(stmt, {"table": self.model.__tablename__})).scalar_one_or_none()
+        if count is None or count < 0:
+            # Never analyzed yet.
+            return (await self.session.execute(select(func.count(self.model.id)))).scalar_one()
+        return count
+
+    def _keyset(self, filter_by: AnyModel, after: tuple | None, order: str, order_by: str, nulls: bool = False):
+        """One phase of keyset pagination over `order_by`.
+
+        A nullable column is paged in two phases so that each is a plain range scan of the
+        (column, id) index: rows with a value first, then with `nulls` the NULL rows by id.
+        """
+        column = getattr(self.model, order_by)
+        desc = order == "desc"
+        id_order = self.model.id.desc() if desc else self.model.id.asc()
+        stmt = select(*self.model.__table__.columns).filter_by(**(filter_by or {}))
+        if order_by == "id":
+            if after is not None:
+                stmt = stmt.filter(column < after[0] if desc else column > after[0])
+            return stmt.order_by(id_order)
+        if nulls:
+            stmt = stmt.filter(column.is_(None))
+            if after is not None:
+                stmt = stmt.filter(self.model.id < after[1] if desc else self.model.id > after[1])
+            return stmt.order_by(id_order)
+        if column.nullable:
+            stmt = stmt.filter(column.is_not(None))
+        if after is not None:
+            # id breaks ties, so the key is unique even for non-unique columns.
+            key = tuple_(column, self.model.id)
+            stmt = stmt.filter(key < tuple_(*after) if desc else key > tuple_(*after))
+        return stmt.order_by(column.desc() if desc else column.asc(), id_order)
+
+    def _nullable_key(self, order_by: str) -> bool:
+        return order_by != "id" and getattr(self.model, order_by).nullable
+
+    @staticmethod
+    def page_key(row: Any, order_by: str = "id") -> tuple:
+        """Cursor for the page following `row`."""
+        if order_by == "id":
+            return (row.id,)
+        return getattr(row, order_by), row.id
+
+    async def find_page(
+        self,
+        filter_by: AnyModel,
+        after: tuple | None = None,
+        limit: int = 100,
+        order: str = "asc",
+        order_by: str = "id",
+    ) -> list[Entity]:
+        """Keyset pagination: pass page_key(last row) as `after` to get the next page.
+
+        Rows with NULL in a nullable `order_by` column come last in either order.
+        """
+        nullable = self._nullable_key(order_by)
+        in_nulls = nullable and after is not None and after[0] is None
+        stmt = self._keyset(filter_by, after, order, order_by, nulls=in_nulls).limit(limit)
+        rows = list((await self.session.execute(stmt)).all())
+        if nullable and not in_nulls and len(rows) < limit:
+            # Строки со значением кончились, страница добирается строками с NULL
+            stmt = self._keyset(filter_by, None, order, order_by, nulls=True).limit(limit - len(rows))
+            rows += (await self.session.execute(stmt)).all()
+        return self.to_read_models(rows)
+
+    async def stream_all(
+        self, filter_by: AnyModel, batch_size: int = 1000, order: str = "asc", order_by: str = "id"
+    ) -> AsyncIterator[Entity]:
+        """Streams rows through a server-side cursor validating them batch by batch.
+
+        Core rows are not kept in the session identity map, memory stays at one batch.
+        """
+        for nulls in (False, True) if self._nullable_key(order_by) else (False,):
+            stmt = self._keyset(filter_by, None, order, order_by, nulls).execution_options(yield_per=batch_size)
+            result = await self.session.stream(stmt)
+            async for rows in result.partitions(batch_size):
+                for row in self.to_read_models(rows):
+                    yield row
+
     def to_read_model(self, obj) -> pydantic.BaseModel | None:
         if self.schema is None:
             return obj
-        return pydantic.TypeAdapter(self.schema).validate_python(obj)
+        return type_adapter(self.schema).validate_python(obj)
 
     def to_read_models(self, obj) -> list[pydantic.BaseModel] | None:
         if self.schema is None:
             return obj
-        return pydantic.TypeAdapter(list[self.schema]).validate_python(obj)
+        return type_adapter(list[self.schema]).validate_python(obj)
 
     def _handle_error(self, e: Exception):
         if isinstance(e, saexc.IntegrityError):
@@ -167,28 +303,104 @@ class SARepository(AbstractRepository):
     async def update_or_create(
             self, data: list[pydantic.BaseModel], by_fields: list[str], fields: list[str]
     ) -> list[Entity]:
-        query = pg_insert(self.model).values(
-            [item.model_dump() for item in data]
-        )
-        properties = {field: getattr(query.excluded, field) for field in fields}
+        rows = [item.model_dump() for item in data]
+        if not rows:
+            return []
+        objs = []
         try:
-            query = query.on_conflict_do_update(
-                index_elements=[getattr(self.model, by_field) for by_field in by_fields],
-                set_=properties
-            ).returning(self.model)
-            obj = (await self.session.execute(query)).scalars().all()
-            return self.to_read_models(obj)
+            # Chunked to stay under the bind parameter limit.
+            for chunk in chunked(rows, max(1, MAX_BIND_PARAMS // len(rows[0]))):
+                query = pg_insert(self.model).values(chunk)
+                properties = {field: getattr(query.excluded, field) for field in fields}
+                query = query.on_conflict_do_update(
+                    index_elements=[getattr(self.model, by_field) for by_field in by_fields],
+                    set_=properties
+                ).returning(self.model)
+                objs.extend((await self.session.execute(query)).scalars().all())
+            return self.to_read_models(objs)
         except Exception as e:
             self._handle_error(e)
 
-    async def bulk_add(self, data: list[AnyModel]) -> list[Entity]:
+    async def bulk_add(self, data: list[AnyModel], chunk_size: int = 5000) -> list[Entity]:
+        rows = []
         try:
-            stmt = insert(self.model).returning(self.model)
-            rows = (await self.session.execute(stmt, data)).scalars().all()
+            for chunk in chunked(data, chunk_size):
+                stmt = insert(self.model).returning(self.model)
+                rows.extend((await self.session.execute(stmt, chunk)).scalars().all())
             return self.to_read_models(rows)
         except Exception as e:
             self._handle_error(e)
 
+    def python_defaults(self) -> dict[str, Any]:
+        """Column defaults evaluated on the Python side (`default=`), keyed by column name."""
+        values = {}
+        for column in self.model.__table__.columns:
+            default = column.default
+            if default is None or column.autoincrement is True:
+                continue
+            if default.is_scalar:
+                values[column.name] = default.arg
+            elif default.is_callable:
+                values[column.name] = default.arg(None)
+        return values
+
+    async def bulk_copy(
+            self,
+            data: Iterable[AnyModel | pydantic.BaseModel],
+            by_fields: list[str] | None = None,
+            fields: list[str] | None = None,
+            chunk_size: int = 50000,
+    ) -> int:
+        """Streams rows with COPY into a temp staging table and merges them in one statement per chunk.
+
+        With `by_fields` (a unique index) conflicting rows update `fields`, or are skipped when
+        `fields` is empty. Returns the number of inserted or updated rows. Needs an open transaction
+        owned by the session, the staging table is dropped on commit.
+
+        Every row has to carry the keys of the first one. Model `default=` values are filled in
+        for missing keys (once per chunk, like executemany does); server defaults and the id
+        sequence apply on the merge only, the staging table has just the copied columns.
+        """
+        table = self.model.__tablename__
+        staging = f"_{table}_staging"
+        total = 0
+        columns = None
+        try:
+            driver = (await (await self.session.connection()).get_raw_connection()).driver_connection
+            for chunk in chunked(data, chunk_size):
+                chunk = [item.model_dump() if isinstance(item, pydantic.BaseModel) else item for item in chunk]
+                defaults = {key: value for key, value in self.python_defaults().items() if key not in chunk[0]}
+                if columns is None:
+                    columns = [*chunk[0], *defaults]
+                    names = ", ".join(f'"{column}"' for column in columns)
+                    # No NOT NULL, defaults or serial from the target: COPY takes the rows as they are.
+                    await self.session.execute(text(f'DROP TABLE IF EXISTS "{staging}"'))
+                    await self.session.execute(text(
+                        f'CREATE TEMP TABLE "{staging}" ON COMMIT DROP AS SELECT {names} FROM "{table}" WITH NO DATA'
+                    ))
+                records = [
+                    tuple(
+                        value.value if isinstance(value, enum.Enum) else value
+                        for value in (row[c] if c in row else defaults[c] for c in columns)
+                    )
+                    for row in chunk
+                ]
+                await self.session.execute(text(f'TRUNCATE "{staging}"'))
+                await driver.copy_records_to_table(staging, records=records, columns=columns)
+
+                merge = f'INSERT INTO "{table}" ({names}) SELECT {names} FROM "{staging}"'
+                if by_fields:
+                    conflict = ", ".join(f'"{field}"' for field in by_fields)
+                    if fields:
+                        updates = ", ".join(f'"{field}" = EXCLUDED."{field}"' for field in fields)
+                        merge += f" ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+                    else:
+                        merge += f" ON CONFLICT ({conflict}) DO NOTHING"
+                total += (await self.session.execute(text(merge))).rowcount
+            return total
+        except Exception as e:
+            self._handle_error(e)
+
     async def find_all_by_list(
         self, filter_by: dict[str, list], order: str = "desc", order_by: str = "created_at"
     ) -> list[Entity]:
@@ -0,0 +1,73 @@
+import datetime
+import itertools
+
+from app import entity, models
+from app.entity import AnyModel
+from app.repository.sauow import AbstractUnitOfWork
+from app.utils.datetime import utc_now
+
+
+class MemoryOrderRepository:
+    """The part of OrderRepository the Manager loop uses, over a dict; rows live as long as the object."""
+
+    def __init__(self):
+        self.rows: dict[int, dict] = {}
+        self.ids = itertools.count(1)
+        self.updated_at: datetime.datetime | None = None
+
+    def _now(self) -> datetime.datetime:
+        # updated_at is the row version of the stage gate, two updates must never share it
+        now = utc_now()
+        if self.updated_at is not None and now <= self.updated_at:
+            now = self.updated_at + datetime.timedelta(microseconds=1)
+        self.updated_at = now
+        return now
+
+    @staticmethod
+    def _match(row: dict, filter_by: AnyModel) -> bool:
+        return all(row[key] == value for key, value in filter_by.items())
+
+    async def add(self, data: AnyModel) -> entity.Order:
+        row = {column.name: None for column in models.Order.__table__.columns}
+        row.update(data)
+        row["id"] = next(self.ids)
+        row["created_at"] = row["updated_at"] = self._now()
+        self.rows[row["id"]] = row
+        return entity.Order.model_validate(row)
+
+    async def delete(self, filter_by: AnyModel) -> None:
+        for key in [key for key, row in self.rows.items() if self._match(row, filter_by)]:
+            del self.rows[key]
+
+    async def update(self, id: int, data: AnyModel) -> entity.Order | None:
+        row = self.rows.get(id)
+        if row is None:
+            return None
+        row.update(data)
+        row["updated_at"] = self._now()
+        return entity.Order.model_validate(row)
+
+    async def find_or_none(self, filter_by: AnyModel) -> entity.Order | None:
+        for row in self.rows.values():
+            if self._match(row, filter_by):
+                return entity.Order.model_validate(row)
+        return None
+
+
+class MemoryUnitOfWork(AbstractUnitOfWork):
+    """Unit of work for offline replays, writes are visible at once and commit/rollback do nothing."""
+
+    def __init__(self):
+        self.order = MemoryOrderRepository()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
@@ -1,10 +1,13 @@
 import datetime
+import re
+from typing import AsyncIterator
 
 from pydantic import TypeAdapter
-from sqlalchemy import select, cast, Time, func, and_, or_, text, case, literal
+from sqlalchemy import select, cast, Time, func, and_, or_, text, case, literal, update, delete
 from sqlalchemy.orm import joinedload, aliased
 
 from app.config import config
+from app.entity import AnyModel
 from app.entity.enums import OrderType
 
 from app.repository.base import SARepository
@@ -13,64 +16,239 @@ from app import entity
 from app.utils.datetime import utc_now
 
 
+PARTITION_RE = re.compile(r"^orders_y(\d{4})m(\d{2})$")
+DEFAULT_PARTITION = "orders_default"
+
+
+def month_start(value: datetime.datetime | datetime.date) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_month(value: datetime.date) -> datetime.date:
+    return datetime.date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def partition_name(month: datetime.date) -> str:
+    return f"orders_y{month.year}m{month.month:02d}"
+
 
 class OrderRepository(SARepository):
+    """Point reads and writes of the trading loop only see orders created in the last
+    ORDERS_MAX_OPEN_DAYS, so they touch the recent monthly partitions instead of all of them."""
+
     model = models.Order
     schema = entity.Order
     name = "Order"
 
-    async def get_trade_result(self, date_from: datetime.datetime) -> entity.TradeResult:
-        stmt = select(
-            # self.model.id,
-            func.sum(self.model.price_open * self.model.value).label("spent"),
-            func.sum(
+    def open_window(self):
+        return self.model.created_at >= utc_now() - datetime.timedelta(days=config.ORDERS_MAX_OPEN_DAYS)
+
+    async def update(self, id: int, data: AnyModel) -> entity.Order:
+        try:
+            stmt = (
+                update(self.model).values(**data).filter_by(id=id).filter(self.open_window()).returning(self.model)
+            )
+            result = await self.session.execute(stmt)
+            return self.to_read_model(result.scalars().first())
+        except Exception as e:
+            self._handle_error(e)
+
+    async def delete(self, filter_by: AnyModel):
+        try:
+            stmt = delete(self.model).filter_by(**filter_by).filter(self.open_window())
+            await self.session.execute(stmt)
+        except Exception as e:
+            self._handle_error(e)
+
+    async def find_or_none(self, filter_by: AnyModel) -> entity.Order | None:
+        stmt = select(self.model).filter_by(**filter_by).filter(self.open_window())
+        res = (await self.session.execute(stmt)).scalar_one_or_none()
+        return None if res is None else self.to_read_model(res)
+
+    @property
+    def spent(self):
+        return self.model.price_open * self.model.value
+
+    @property
+    def received(self):
+        return case(
+            (
+                self.model.order_type == OrderType.long,
                 case(
                     (
-                        self.model.order_type == OrderType.long,
+                        self.model.tp1_executed_at.isnot(None),
+                        self.model.price_tp1 * 0.5 * self.model.value
+                    ), else_=0
+                ) + case(
+                    (
+                        self.model.price_close.isnot(None),
                         case(
                             (
                                 self.model.tp1_executed_at.isnot(None),
-                                self.model.price_tp1 * 0.5 * self.model.value
-                            ), else_=0
-                        ) + case(
-                            (
-                                self.model.price_close.isnot(None),
-                                case(
-                                    (
-                                        self.model.tp1_executed_at.isnot(None),
-                                        0.5 * self.model.value * self.model.price_close
-                                    ), else_=self.model.value * self.model.price_close
-                                )
-                            ), else_=0
+                                0.5 * self.model.value * self.model.price_close
+                            ), else_=self.model.value * self.model.price_close
                         )
-                    ),
+                    ), else_=0
+                )
+            ),
+            (
+                self.model.order_type == OrderType.short,
+                case(
+                    (
+                        self.model.tp1_executed_at.isnot(None),
+                        0.5 * (2 * self.model.price_open - self.model.price_tp1) * self.model.value
+                    ), else_=0
+                ) + case(
                     (
-                        self.model.order_type == OrderType.short,
+                        self.model.price_close.isnot(None),
                         case(
                             (
                                 self.model.tp1_executed_at.isnot(None),
-                                0.5 * (2 * self.model.price_open - self.model.price_tp1) * self.model.value
-                            ), else_=0
-                        ) + case(
-                            (
-                                self.model.price_close.isnot(None),
-                                case(
-                                    (
-                                        self.model.tp1_executed_at.isnot(None),
-                                        0.5 * (2 * self.model.price_open - self.model.price_close) * self.model.value
-                                    ), else_=(2 * self.model.price_open - self.model.price_close) * self.model.value
-                                )
-                            ), else_=0
+                                0.5 * (2 * self.model.price_open - self.model.price_close) * self.model.value
+                            ), else_=(2 * self.model.price_open - self.model.price_close) * self.model.value
                         )
-                    ),
-                    else_=0
+                    ), else_=0
                 )
-            ).label("received")
+            ),
+            else_=0
+        )
+
+    def closed_since(self, date_from: datetime.datetime) -> list:
+        """close_at filter plus a created_at bound, so the planner prunes older monthly partitions.
+
+        Relies on no order staying open longer than ORDERS_MAX_OPEN_DAYS.
+        """
+        return [
+            self.model.close_at >= date_from,
+            self.model.created_at >= date_from - datetime.timedelta(days=config.ORDERS_MAX_OPEN_DAYS),
+        ]
+
+    async def get_trade_result(self, date_from: datetime.datetime) -> entity.TradeResult:
+        stmt = select(
+            # self.model.id,
+            func.sum(self.spent).label("spent"),
+            func.sum(self.received).label("received")
         ).filter(
-            self.model.close_at >= date_from
+            *self.closed_since(date_from)
         # ).order_by(
         #     self.model.id.asc()
         )
 
         result = (await self.session.execute(stmt)).one()
         return TypeAdapter(entity.TradeResult).validate_python(result)
+
+    async def get_closed_watermark(
+            self, date_from: datetime.datetime | None = None
+    ) -> tuple[int, datetime.datetime | None, datetime.datetime | None]:
+        """Changes whenever a closed order is added or updated, used as a cache key for reports."""
+        stmt = select(
+            func.count(self.model.id), func.max(self.model.close_at), func.max(self.model.updated_at)
+        ).filter(self.model.close_at.isnot(None))
+        if date_from is not None:
+            stmt = stmt.filter(*self.closed_since(date_from))
+        return tuple((await self.session.execute(stmt)).one())
+
+    async def get_closed_trades(self, date_from: datetime.datetime | None = None) -> dict[str, list]:
+        """Closed orders as columns, with pnl, equity curve and drawdown computed by window functions."""
+        pnl = self.received - self.spent
+        window = {"order_by": (self.model.close_at, self.model.id)}
+        trades = select(
+            self.model.id,
+            self.model.order_type,
+            self.model.leverage,
+            self.model.open_at,
+            self.model.close_at,
+            self.model.tp1_executed_at,
+            self.model.tp2_executed_at,
+            self.model.sl_executed_at,
+            self.spent.label("spent"),
+            pnl.label("pnl"),
+            # Initial stop distance: TP1 and SL are both placed 1 ATR from the entry.
+            (func.abs(self.model.price_tp1 - self.model.price_open) * self.model.value).label("risk"),
+            func.sum(pnl).over(**window).label("equity"),
+        ).filter(self.model.close_at.isnot(None))
+        if date_from is not None:
+            trades = trades.filter(*self.closed_since(date_from))
+        trades = trades.subquery()
+        peak = func.greatest(func.max(trades.c.equity).over(order_by=(trades.c.close_at, trades.c.id)), 0)
+        stmt = select(trades, (peak - trades.c.equity).label("drawdown")).order_by(trades.c.close_at, trades.c.id)
+
+        result = await self.session.execute(stmt)
+        keys = list(result.keys())
+        rows = result.all()
+        return {key: [row[i] for row in rows] for i, key in enumerate(keys)}
+
+    async def partitions(self) -> list[tuple[str, datetime.date]]:
+        """Monthly partitions of orders with their first day, oldest first; the default one is skipped."""
+        stmt = text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'orders'::regclass"
+        )
+        names = (await self.session.execute(stmt)).scalars().all()
+        months = []
+        for name in names:
+            match = PARTITION_RE.match(name)
+            if match:
+                months.append((name, datetime.date(int(match[1]), int(match[2]), 1)))
+        return sorted(months, key=lambda item: item[1])
+
+    async def set_lock_timeout(self, ms: int) -> None:
+        """For the rest of the transaction: give up on a lock after `ms` instead of queueing the tick behind DDL."""
+        await self.session.execute(text(f"SET LOCAL lock_timeout = {int(ms)}"))
+
+    async def create_partition(self, month: datetime.date) -> tuple[str, int]:
+        """Creates the month's partition, returns its name and the rows moved in from the default partition.
+
+        Rows of the month already in the default partition (a downtime longer than the months
+        created ahead) would break the new bounds, they are moved over with the default detached.
+        """
+        name = partition_name(month)
+        end = next_month(month)
+        bounds = f"FOR VALUES FROM ('{month}') TO ('{end}')"
+        in_default = (
+            f"FROM {DEFAULT_PARTITION} WHERE created_at >= '{month}' AND created_at < '{end}'"
+        )
+        if (await self.session.execute(text(f"SELECT 1 {in_default} LIMIT 1"))).first() is None:
+            await self.session.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF orders {bounds}"))
+            return name, 0
+        await self.session.execute(text(f"ALTER TABLE orders DETACH PARTITION {DEFAULT_PARTITION}"))
+        await self.session.execute(text(f"CREATE TABLE {name} PARTITION OF orders {bounds}"))
+        moved = (await self.session.execute(text(f"INSERT INTO {name} SELECT * {in_default}"))).rowcount
+        await self.session.execute(text(f"DELETE {in_default}"))
+        await self.session.execute(text(f"ALTER TABLE orders ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        return name, moved
+
+    async def has_open_orders(self, month: datetime.date) -> bool:
+        stmt = select(self.model.id).filter(
+            self.model.created_at >= month,
+            self.model.created_at < next_month(month),
+            self.model.close_at.is_(None),
+        ).limit(1)
+        return (await self.session.execute(stmt)).first() is not None
+
+    async def stream_partition(self, name: str, batch_size: int = 5000) -> AsyncIterator[list[dict]]:
+        if not PARTITION_RE.match(name):
+            raise ValueError(f"Not an orders partition: {name!r}")
+        stmt = text(f"SELECT * FROM {name} ORDER BY id").execution_options(yield_per=batch_size)
+        result = await self.session.stream(stmt)
+        async for rows in result.mappings().partitions(batch_size):
+            yield [dict(row) for row in rows]
+
+    async def count_partition(self, name: str) -> int:
+        if not PARTITION_RE.match(name):
+            raise ValueError(f"Not an orders partition: {name!r}")
+        return (await self.session.execute(text(f"SELECT count(*) FROM {name}"))).scalar_one()
+
+    async def drop_partition(self, name: str) -> None:
+        """DETACH takes ACCESS EXCLUSIVE on orders (CONCURRENTLY is not allowed next to a default
+        partition), run it under a short lock timeout and retry rather than queue the trading queries."""
+        if not PARTITION_RE.match(name):
+            raise ValueError(f"Not an orders partition: {name!r}")
+        await self.session.execute(text(f"ALTER TABLE orders DETACH PARTITION {name}"))
+        await self.session.execute(text(f"DROP TABLE {name}"))
+
+
+class ShadowTradeRepository(SARepository):
+    model = models.ShadowTrade
+    schema = entity.ShadowTrade
+    name = "ShadowTrade"
@@ -2,15 +2,40 @@ import abc
 
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
+from app import exc
 from app.config import config
 from app.repository.repositories import (
     OrderRepository,
+    ShadowTradeRepository,
 )
 
 
-engine = create_async_engine(config.async_dsn)
+# The trading loop owns this pool, reports never take connections from it.
+engine = create_async_engine(config.async_dsn, pool_size=config.DB_POOL_SIZE, max_overflow=0)
 pg_async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+report_engine = create_async_engine(
+    config.report_dsn,
+    pool_size=config.REPORT_POOL_SIZE,
+    max_overflow=0,
+    execution_options={"postgresql_readonly": True},
+    connect_args={
+        "server_settings": {
+            "application_name": "futures_bot_report",
+            "statement_timeout": str(config.REPORT_STATEMENT_TIMEOUT_MS),
+        },
+    },
+)
+report_session_maker = async_sessionmaker(report_engine, expire_on_commit=False)
+
+writer_engine = create_async_engine(
+    config.async_dsn,
+    pool_size=config.WRITER_POOL_SIZE,
+    max_overflow=0,
+    connect_args={"server_settings": {"application_name": "futures_bot_writer"}},
+)
+writer_session_maker = async_sessionmaker(writer_engine, expire_on_commit=False)
+
 
 class AbstractUnitOfWork(abc.ABC):
 
@@ -39,6 +64,7 @@ class SAUnitOfWork(AbstractUnitOfWork):
         self.session = self.session_factory()
 
         self.order = OrderRepository(self.session)
+        self.shadow_trade = ShadowTradeRepository(self.session)
 
         return self
 
@@ -51,3 +77,10 @@ class SAUnitOfWork(AbstractUnitOfWork):
 
     async def rollback(self):
         await self.session.rollback()
+
+
+class ReadOnlyUnitOfWork(SAUnitOfWork):
+    """Unit of work for reports, analytics and exports over report_session_maker."""
+
+    async def commit(self):
+        raise exc.Forbidden("Read-only unit of work")
@@ -0,0 +1,83 @@
+import asyncio
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from app import entity
+from app.logger import logger
+from app.repository import ReadOnlyUnitOfWork, report_session_maker
+
+
+class TradeAnalytics:
+    """Trade statistics over closed orders, cached until a closed order changes.
+
+    Expects a ReadOnlyUnitOfWork on the report pool, never the trading one.
+    """
+
+    def __init__(self, uow: ReadOnlyUnitOfWork):
+        self.uow = uow
+        self.cache: dict[datetime.datetime | None, tuple[tuple, entity.TradeReport, pd.DataFrame]] = {}
+
+    async def _load(self, date_from: datetime.datetime | None) -> tuple[entity.TradeReport, pd.DataFrame]:
+        async with self.uow:
+            watermark = await self.uow.order.get_closed_watermark(date_from)
+            cached = self.cache.get(date_from)
+            if cached and cached[0] == watermark:
+                return cached[1], cached[2]
+            trades = pd.DataFrame(await self.uow.order.get_closed_trades(date_from))
+        report = self.build_report(trades)
+        self.cache[date_from] = (watermark, report, trades)
+        return report, trades
+
+    async def report(self, date_from: datetime.datetime | None = None) -> entity.TradeReport:
+        report, _ = await self._load(date_from)
+        return report
+
+    async def equity_curve(self, date_from: datetime.datetime | None = None) -> pd.DataFrame:
+        _, trades = await self._load(date_from)
+        if trades.empty:
+            return trades
+        return trades[["close_at", "equity", "drawdown"]]
+
+    @staticmethod
+    def build_report(trades: pd.DataFrame) -> entity.TradeReport:
+        if trades.empty:
+            return entity.TradeReport(
+                trades=0, pnl=0, win_rate=None, max_drawdown=0, sharpe=None, avg_r=None,
+                tp1_ratio=None, tp2_ratio=None, sl_ratio=None, avg_time_in_trade=None,
+            )
+        pnl = trades["pnl"].astype(float)
+        risk = trades["risk"].astype(float)
+        r = (pnl / risk.where(risk > 0)).dropna()
+
+        margin = trades["spent"].astype(float) / trades["leverage"].astype(float)
+        returns = (pnl / margin.where(margin > 0)).fillna(0)
+        daily = returns.groupby(pd.to_datetime(trades["close_at"]).dt.floor("D")).sum()
+        std = daily.std()
+        sharpe = float(daily.mean() / std * np.sqrt(365)) if len(daily) > 1 and std > 0 else None
+
+        durations = (pd.to_datetime(trades["close_at"]) - pd.to_datetime(trades["open_at"])).dropna()
+
+        return entity.TradeReport(
+            trades=len(trades),
+            pnl=float(pnl.sum()),
+            win_rate=float((pnl > 0).mean()),
+            max_drawdown=float(trades["drawdown"].astype(float).max()),
+            sharpe=sharpe,
+            avg_r=float(r.mean()) if len(r) else None,
+            tp1_ratio=float(trades["tp1_executed_at"].notna().mean()),
+            tp2_ratio=float(trades["tp2_executed_at"].notna().mean()),
+            sl_ratio=float(trades["sl_executed_at"].notna().mean()),
+            avg_time_in_trade=durations.mean().to_pytimedelta() if len(durations) else None,
+        )
+
+
+async def main() -> None:
+    analytics = TradeAnalytics(ReadOnlyUnitOfWork(report_session_maker))
+    report = await analytics.report()
+    logger.info("{}", report.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,7 @@
+import datetime
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 from pybit.unified_trading import HTTP
@@ -8,22 +11,42 @@ from app import entity
 from app.config import config
 from app.entity.enums import OrderType
 from app.logger import logger
+from app.services.decode import KlineColumns, OrderColumns, from_ms, install_fast_json
+from app.services.instruments import InstrumentRegistry
 from app.utils.datetime import utc_now
+from app.utils.ratelimit import TokenBucket
 
 
-class BybitAPI:
-
+def new_client() -> HTTP:
     cli = HTTP(
         testnet=config.TESTNET,
         api_key=config.BYBIT_API_KEY,
         api_secret=config.BYBIT_API_SECRET
     )
+    install_fast_json(cli.client)
+    return cli
+
+
+class BybitAPI:
+
+    cli = new_client()
 
     def __init__(self, category: str = "linear"):
         self.category = category
         self.trigger_by = "LastPrice"
         self.pair = "BTCUSDT"
         self.df_orders = []
+        # Bracket legs: one HTTP client (session) per worker thread, made by client_factory
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bybit")
+        self.client_factory = new_client
+        self.local = threading.local()
+        self.instruments = InstrumentRegistry(self.get_instruments_info, ttl=config.INSTRUMENTS_TTL)
+        # Общий бюджет на amend_order для погони за входом и трейлинга
+        self.amend_limiter = TokenBucket(config.AMEND_RATE, config.AMEND_BURST)
+
+    @property
+    def instrument(self) -> entity.Instrument:
+        return self.instruments.get(self.pair)
 
     def create_open_order(self, order: entity.AddOrder) -> dict[str, Any]:
         ord = self.cli.place_order(
@@ -32,15 +55,15 @@ class BybitAPI:
             side=order.open_side,
             # orderType="Market",
             orderType="Limit",
-            price=str(order.price_open),
-            qty=str(order.value),
+            price=self.round_price_str(order.price_open),
+            qty=self.qty_str(order.value),
             isLeverage=1,
             positionIdx=order.position_idx,
             # triggerBy=self.trigger_by,
             # triggerDirection=1 if order.order_type == OrderType.long else 2,
             # triggerPrice=self.round_price_str(order.price_open),
         )
-        logger.info(f"Create Open {order.value=} {order.price_open=}")
+        logger.info("Create Open order.value={} order.price_open={}", order.value, order.price_open)
         return ord
 
     def create_close_order(self, order: entity.Order) -> dict[str, Any]:
@@ -56,7 +79,7 @@ class BybitAPI:
             reduceOnly=True,
             closeOnTrigger=True
         )
-        logger.info(f"Create Close {order.value=} {order.price_open=}")
+        logger.info("Create Close order.value={} order.price_open={}", order.value, order.price_open)
         return ord
 
     # def get_position_value(self, order: Order) -> float:
@@ -71,8 +94,8 @@ class BybitAPI:
             self.cli.set_leverage(
                 category=self.category,
                 symbol=self.pair,
-                buyLeverage=str(buy_leverage),
-                sellLeverage=str(sell_leverage),
+                buyLeverage=str(self.instrument.quantize_leverage(buy_leverage)),
+                sellLeverage=str(self.instrument.quantize_leverage(sell_leverage)),
             )
         except Exception as e:
             logger.error(f"{e=} {traceback.format_exc()}")
@@ -91,31 +114,63 @@ class BybitAPI:
             auth=True,
         )
 
-    def create_take_profit_order(self, order: entity.Order, attr: str) -> None:
-        self.cli.set_trading_stop(
+    def worker_cli(self) -> HTTP:
+        """HTTP client of the calling executor thread, sessions are not shared between threads."""
+        cli = getattr(self.local, "cli", None)
+        if cli is None:
+            cli = self.local.cli = self.client_factory()
+        return cli
+
+    def create_take_profit_order(self, order: entity.Order, attr: str, cli: HTTP | None = None) -> None:
+        (cli or self.cli).set_trading_stop(
             category=self.category,
             symbol=self.pair,
             takeProfit=self.round_price_str(getattr(order, attr)),
-            tpSize=str(order.value / 2),
+            tpSize=str(self.instrument.split_tp_qty(order.value)[0 if attr == "price_tp1" else 1]),
             positionIdx=order.position_idx,
             tpslMode="Partial",
             tpTriggerBy=self.trigger_by,
             tpOrderType="Limit",
             tpLimitPrice=self.round_price_str(getattr(order, attr)),
         )
-        logger.info(f"Create Take profit {order.price_open=} {order.value_tokens=} {getattr(order, attr)}")
+        logger.info(
+            "Create Take profit order.price_open={} order.value_tokens={} {}",
+            order.price_open, order.value_tokens, getattr(order, attr),
+        )
 
-    def create_stop_loss_order(self, order: entity.Order) -> None:
-        self.cli.set_trading_stop(
+    def create_stop_loss_order(self, order: entity.Order, cli: HTTP | None = None) -> None:
+        (cli or self.cli).set_trading_stop(
             category=self.category,
             symbol=self.pair,
             stopLoss=self.round_price_str(order.price_sl),
-            slSize=str(order.value),
+            slSize=self.qty_str(order.value),
             positionIdx=order.position_idx,
             # slTriggerBy=self.trigger_by,
             slTriggerBy="MarkPrice",
         )
-        logger.info(f"Create Stop loss {order.value_tokens=} {order.price_sl=}")
+        logger.info("Create Stop loss order.value_tokens={} order.price_sl={}", order.value_tokens, order.price_sl)
+
+    def create_bracket_orders(self, order: entity.Order, legs: list[str]) -> dict[str, Exception | None]:
+        """Submits protective legs ("sl", "tp1", "tp2"): the stop loss alone first, then both TPs concurrently.
+
+        Returns error per leg, None for legs placed successfully.
+        """
+        submit = {
+            "sl": lambda: self.create_stop_loss_order(order, self.worker_cli()),
+            "tp1": lambda: self.create_take_profit_order(order, "price_tp1", self.worker_cli()),
+            "tp2": lambda: self.create_take_profit_order(order, "price_tp2", self.worker_cli()),
+        }
+        results = {}
+        waves = [[leg for leg in legs if leg == "sl"], [leg for leg in legs if leg != "sl"]]
+        for wave in waves:
+            futures = {leg: self.executor.submit(submit[leg]) for leg in wave}
+            for leg, future in futures.items():
+                try:
+                    future.result()
+                    results[leg] = None
+                except Exception as e:
+                    results[leg] = e
+        return results
 
     def cancel_order(self, order: entity.Order) -> entity.Order:
         try:
@@ -124,7 +179,7 @@ class BybitAPI:
                 symbol=self.pair,
                 orderId=order.orderId_open,
             )
-            logger.info(f"Cancel stop {order.value_tokens=} {order.price_open=}")
+            logger.info("Cancel stop order.value_tokens={} order.price_open={}", order.value_tokens, order.price_open)
         except Exception as e:
             logger.error(f"{e=} {traceback.format_exc()}")
         return order
@@ -141,36 +196,45 @@ class BybitAPI:
             df_orders.extend(res["list"])
         return df_orders
 
-    def get_open_orders(self) -> list[entity.BybitOrder]:
+    def get_open_orders(self) -> OrderColumns:
         df_orders = []
         res = self.cli.get_open_orders(category=self.category, limit=50)["result"]
         df_orders.extend(res["list"])
-        return TypeAdapter(list[entity.BybitOrder]).validate_python(df_orders)
+        return OrderColumns(df_orders)
 
-    def get_last_orders_history(self) -> list[entity.BybitOrder]:
+    def get_last_orders_history(self) -> OrderColumns:
         df_orders = []
         res = self.cli.get_order_history(category=self.category, limit=50)["result"]
         df_orders.extend(res["list"])
-        return TypeAdapter(list[entity.BybitOrder]).validate_python(df_orders)
+        return OrderColumns(df_orders)
 
-    def get_open_orders(self) -> list[dict]:
+    def get_open_orders(self) -> OrderColumns:
         orders = self.cli.get_open_orders(category=self.category, symbol=self.pair)["result"]["list"]
-        return TypeAdapter(list[entity.BybitOrder]).validate_python(orders)
+        return OrderColumns(orders)
 
-    def get_positions(self) -> list[dict]:
-        return self.cli.get_positions(category=self.category, symbol=self.pair, limit=200)["result"]["list"]
+    def get_positions(self) -> list[entity.Position]:
+        positions = self.cli.get_positions(category=self.category, symbol=self.pair, limit=200)["result"]["list"]
+        return TypeAdapter(list[entity.Position]).validate_python(positions)
 
-    def amend_stop_loss(self, order: entity.Order, ) -> None:
+    def amend_stop_loss(self, order: entity.Order, price: float | None = None) -> None:
         query = {
             "category": self.category,
             "symbol": self.pair,
             "orderId": order.orderId_sl,
             # "slTriggerBy": self.setting.stop_loss_order_type,
-            "triggerPrice": self.round_price_str(order.price_ts),
+            "triggerPrice": self.round_price_str(order.price_ts if price is None else price),
             # "triggerBy": self.setting.stop_loss_order_type
         }
         self.cli.amend_order(**query)
 
+    def amend_order_price(self, order: entity.Order, price: float) -> None:
+        self.cli.amend_order(
+            category=self.category,
+            symbol=self.pair,
+            orderId=order.orderId_open,
+            price=self.round_price_str(price),
+        )
+
     # def amend_order(self, order: entity.Order, orderId: str, price: str, step_type: str) -> None:
     #     query = {
     #         "category": self.category,
@@ -197,19 +261,55 @@ class BybitAPI:
     def get_tickers(self) -> list[dict]:
         return self.cli.get_tickers(category=self.category, symbol=self.pair)["result"]["list"]
 
+    def get_orderbook(self, limit: int = 50) -> dict[str, Any]:
+        return self.cli.get_orderbook(category=self.category, symbol=self.pair, limit=limit)["result"]
+
     def get_instruments_info(self) -> list[dict]:
-        return self.cli.get_instruments_info(category=self.category)["result"]["list"]
+        instruments = []
+        res = self.cli.get_instruments_info(category=self.category, limit=1000)["result"]
+        instruments.extend(res["list"])
+        while res.get("nextPageCursor"):
+            res = self.cli.get_instruments_info(
+                category=self.category, limit=1000, cursor=res["nextPageCursor"]
+            )["result"]
+            instruments.extend(res["list"])
+        return instruments
 
-    def get_kline(self) -> list[entity.Kline]:
+    def get_kline(self, start: datetime.datetime | None = None) -> list[entity.Kline]:
+        return self.get_kline_columns(start).to_klines()
+
+    def get_kline_columns(
+            self, start: datetime.datetime | None = None, end: datetime.datetime | None = None
+    ) -> KlineColumns:
+        """1m klines, newest first; from `start` and up to `end` (UTC) if given, at most 1000."""
+        params = {}
+        if start is not None:
+            params["start"] = int(start.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+        if end is not None:
+            params["end"] = int(end.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
         raw_data = self.cli.get_kline(
             category=self.category,
             symbol=self.pair,
             interval="1",
-            limit=1000
+            limit=1000,
+            **params,
         )["result"]["list"]
-        field_names = list(entity.Kline.model_fields.keys())
-        klines = [entity.Kline(**dict(zip(field_names, row))) for row in raw_data]
-        return klines
+        return KlineColumns.from_rows(raw_data)
+
+    def get_kline_history(self, bars: int) -> KlineColumns:
+        """The last `bars` 1m klines, newest first, paged back 1000 at a time."""
+        pages = [self.get_kline_columns()]
+        total = len(pages[0])
+        while total < bars and len(pages[-1]):
+            oldest = int(pages[-1].start[-1])
+            page = self.get_kline_columns(end=from_ms(oldest - 1))
+            # Overlap with the previous page, if the exchange included the bound
+            page = page[int((page.start >= oldest).sum()):]
+            if not len(page):
+                break
+            pages.append(page)
+            total += len(page)
+        return KlineColumns.concat(pages)[:bars]
 
     def get_usdt_wallet_balance(self) -> float:
         balance = self.cli.get_wallet_balance(accountType="UNIFIED", coin="USDT")["result"]["list"]
@@ -217,7 +317,16 @@ class BybitAPI:
         return balance
 
     def round_price(self, value: float) -> float:
-        return round(value, 2)
+        return self.instrument.round_price(value)
 
     def round_price_str(self, value: float) -> str:
-        return str(self.round_price(value))
+        return str(self.instrument.quantize_price(value))
+
+    def round_qty(self, value: float) -> float:
+        return self.instrument.round_qty(value)
+
+    def tp_qty(self, value: float) -> tuple[float, float]:
+        return tuple(float(qty) for qty in self.instrument.split_tp_qty(value))
+
+    def qty_str(self, value: float) -> str:
+        return str(self.instrument.quantize_qty(value))
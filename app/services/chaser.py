@@ -0,0 +1,61 @@
+import traceback
+from typing import Callable
+
+from app import entity
+from app.entity.enums import OrderType
+from app.logger import logger
+from app.services.api import BybitAPI
+
+
+class EntryChaser:
+    """Moves an unfilled limit entry after the market with amend_order instead of cancel + re-place.
+
+    An order is chased once price runs `trigger` away from it, at most `max_amends` times and
+    never further than `max_drift` from its first price. Amends share the API amend budget.
+    """
+
+    def __init__(self, api: BybitAPI, trigger: float = 0.002, max_drift: float = 0.01, max_amends: int = 5):
+        self.api = api
+        self.trigger = trigger
+        self.max_drift = max_drift
+        self.max_amends = max_amends
+        # orderId_open -> [first price, amends]
+        self.chases: dict[str, list] = {}
+
+    def running_away(self, order: entity.Order, price: float) -> bool:
+        if order.order_type == OrderType.long:
+            return price >= order.price_open * (1 + self.trigger)
+        return price <= order.price_open * (1 - self.trigger)
+
+    def exhausted(self, order: entity.Order, target: float) -> bool:
+        origin, amends = self.chases.get(order.orderId_open, (order.price_open, 0))
+        return amends >= self.max_amends or abs(target - origin) > origin * self.max_drift
+
+    def chase(self, order: entity.Order, target: float) -> bool:
+        """Amends the entry to `target`, False if throttled or the exchange refused it."""
+        if target == order.price_open or not self.api.amend_limiter.try_acquire():
+            return False
+        try:
+            self.api.amend_order_price(order, target)
+        except Exception as e:
+            logger.error(f"{e=}\n{traceback.format_exc()}")
+            return False
+        chase = self.chases.setdefault(order.orderId_open, [order.price_open, 0])
+        chase[1] += 1
+        logger.info("Chase entry {} {} -> {}, amend {}", order.orderId_open, order.price_open, target, chase[1])
+        return True
+
+    def forget(self, order: entity.Order) -> None:
+        self.chases.pop(order.orderId_open, None)
+
+    @staticmethod
+    def shifted(order: entity.Order, price: float, round_price: Callable[[float], float]) -> dict[str, float]:
+        """Row update moving the entry and its TP/SL levels by the same distance."""
+        delta = price - order.price_open
+        return {
+            "price_open": price,
+            "price_tp1": round_price(order.price_tp1 + delta),
+            "price_tp2": round_price(order.price_tp2 + delta),
+            "price_sl": round_price(order.price_sl + delta),
+            "value_tokens": round(order.value * price, 2),
+        }
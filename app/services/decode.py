@@ -0,0 +1,149 @@
+import datetime
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+import requests
+
+from app import entity
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Decoder install_fast_json puts on the HTTP sessions, logged once at startup
+JSON_DECODER = "orjson" if orjson is not None else "json"
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def install_fast_json(session: requests.Session) -> bool:
+    """Makes response.json() of the session use orjson, False if it is not installed."""
+    if orjson is None:
+        return False
+
+    def hook(response: requests.Response, *args: Any, **kwargs: Any) -> requests.Response:
+        response.json = lambda **_: orjson.loads(response.content)
+        return response
+
+    session.hooks["response"].append(hook)
+    return True
+
+
+def floats(values: list[str]) -> np.ndarray:
+    """Numeric strings to float64 in one pass, empty strings become NaN."""
+    return np.array([value or "nan" for value in values], dtype=np.float64)
+
+
+def from_ms(ms: int) -> datetime.datetime:
+    """Naive UTC datetime, same as BybitOrder's validators produce."""
+    return EPOCH + datetime.timedelta(milliseconds=int(ms))
+
+
+class KlineColumns(Sequence):
+    """Bybit kline list payload as float64 columns; Kline models are built per row on access."""
+
+    FIELDS = ("open", "high", "low", "close", "volume", "turnover")
+
+    def __init__(self, start: np.ndarray, values: np.ndarray):
+        self.start = start
+        self.values = values
+        self.open, self.high, self.low, self.close, self.volume, self.turnover = values.T
+        self._models: list[entity.Kline | None] = [None] * len(start)
+
+    @classmethod
+    def from_rows(cls, rows: list[list[str]]) -> "KlineColumns":
+        if not rows:
+            return cls(np.empty(0, dtype=np.int64), np.empty((0, len(cls.FIELDS))))
+        data = np.array(rows, dtype=np.float64)
+        return cls(data[:, 0].astype(np.int64), np.ascontiguousarray(data[:, 1:]))
+
+    @classmethod
+    def concat(cls, parts: list["KlineColumns"]) -> "KlineColumns":
+        if not parts:
+            return cls.from_rows([])
+        return cls(np.concatenate([part.start for part in parts]), np.concatenate([part.values for part in parts]))
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return KlineColumns(self.start[index], self.values[index])
+        model = self._models[index]
+        if model is None:
+            row = self.values[index]
+            model = self._models[index] = entity.Kline.model_construct(
+                start=from_ms(self.start[index]).replace(tzinfo=datetime.timezone.utc),
+                **dict(zip(self.FIELDS, row.tolist())),
+            )
+        return model
+
+    def to_klines(self, last: int | None = None) -> list[entity.Kline]:
+        start = 0 if last is None else max(len(self) - last, 0)
+        return [self[i] for i in range(start, len(self))]
+
+
+class OrderColumns(Sequence):
+    """Bybit order list payload as columns.
+
+    Fingerprints and id lookups work on the columns, BybitOrder models are built lazily
+    without re-running validation, only for rows the caller actually touches.
+    """
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.order_id = [row["orderId"] for row in rows]
+        self.status = [row["orderStatus"] for row in rows]
+        self.avg_price = floats([row["avgPrice"] for row in rows])
+        self.trigger_price = floats([row["triggerPrice"] for row in rows])
+        self.qty = floats([row["qty"] for row in rows])
+        self.updated_ms = np.array([row["updatedTime"] for row in rows], dtype=np.int64)
+        self._models: list[entity.BybitOrder | None] = [None] * len(rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        model = self._models[index]
+        if model is None:
+            row = self.rows[index]
+            avg_price = self.avg_price[index]
+            trigger_price = self.trigger_price[index]
+            model = self._models[index] = entity.BybitOrder.model_construct(
+                order_id=self.order_id[index],
+                avg_price=None if np.isnan(avg_price) else float(avg_price),
+                last_price_on_created=float(row["lastPriceOnCreated"]),
+                status=self.status[index],
+                trigger_price=None if np.isnan(trigger_price) else float(trigger_price),
+                stop_order_type=row["stopOrderType"],
+                create_type=row["createType"],
+                qty=float(self.qty[index]),
+                created_at=from_ms(row["createdTime"]),
+                updated_at=from_ms(self.updated_ms[index]),
+            )
+        return model
+
+    def __add__(self, other: "OrderColumns") -> "OrderColumns":
+        joined = OrderColumns.__new__(OrderColumns)
+        joined.rows = self.rows + other.rows
+        joined.order_id = self.order_id + other.order_id
+        joined.status = self.status + other.status
+        joined.avg_price = np.concatenate([self.avg_price, other.avg_price])
+        joined.trigger_price = np.concatenate([self.trigger_price, other.trigger_price])
+        joined.qty = np.concatenate([self.qty, other.qty])
+        joined.updated_ms = np.concatenate([self.updated_ms, other.updated_ms])
+        joined._models = self._models + other._models
+        return joined
+
+    def find(self, order_id: str) -> list[entity.BybitOrder]:
+        return [self[i] for i, value in enumerate(self.order_id) if value == order_id]
+
+    def fingerprint(self) -> int:
+        return hash((
+            tuple(self.order_id), tuple(self.status), self.updated_ms.tobytes(),
+            self.avg_price.tobytes(), self.trigger_price.tobytes(),
+        ))
@@ -1,30 +1,78 @@
-import pandas as pd
+import copy
+import datetime
+
+import numpy as np
 
 from app import entity
-from app.logger import logger
+from app.logger import log_sampled, logger
 from app.entity.enums import OrderType
+from app.services.decode import KlineColumns
+from app.services.indicators import IndicatorKernel, to_order_type
+from app.services.orderbook import OrderBook
+from app.services.strategy import EMA_RSI, STRATEGIES, Strategy, StrategySet
+from app.services.timeframes import (
+    CLOSE,
+    CONFLUENCE,
+    HIGH,
+    LOW,
+    VOLUME,
+    WARM_BARS,
+    BaseSeries,
+    Rollup,
+    kline_values,
+    to_ms,
+)
+from app.services.volume import VolumeIndicators
 from app.utils.datetime import utc_now
 
 
+def to_bar(price: entity.Kline | entity.Ticker) -> tuple[float, float, float, float]:
+    """close, high, low, volume; tickers have no range and volume."""
+    if isinstance(price, entity.Kline):
+        return price.close, price.high, price.low, price.volume
+    return price.close, np.nan, np.nan, np.nan
+
+
 class DirectionManager:
-    def __init__(self) -> None:
+    def __init__(
+            self,
+            kernel: IndicatorKernel | None = None,
+            row: int = 0,
+            strategy: Strategy = EMA_RSI,
+            keep: int = 200,
+    ) -> None:
         self.prices: list[entity.Kline | entity.Ticker] = []
+        # Сколько цен хранить для calculate_atr, 0 - только индикаторы в ядре
+        self.keep = keep
         self.last_time = None
+        # A shared kernel is advanced by its owner in one batch, an own one on every add.
+        self.own_kernel = kernel is None
+        self.kernel = kernel or IndicatorKernel(rows=1)
+        self.row = row
+        self.strategy = strategy
 
-    def add(self, price: entity.Kline | entity.Ticker, time_key: str | None) -> None:
-        now = utc_now()
+    def add(
+            self, price: entity.Kline | entity.Ticker, time_key: str | None, now: datetime.datetime | None = None
+    ) -> bool:
+        now = now or utc_now()
         attrs = {"microsecond": 0}
         if time_key is not None:
             attrs[time_key] = 0
         minute = now.replace(**attrs)
         if minute != self.last_time:
-            self.prices.append(price)
-            if len(self.prices) > 200:
-                self.prices.pop(0)
+            if self.keep:
+                self.prices.append(price)
+                if len(self.prices) > self.keep:
+                    self.prices.pop(0)
             self.last_time = minute
+            if self.own_kernel:
+                self.kernel.update(*(np.array([value]) for value in to_bar(price)))
+            return True
+        return False
 
     def clear(self) -> None:
         self.prices = []
+        self.kernel.reset([self.row])
 
     # def _ema(self, prices: list[float], window: int) -> list[float]:
     #     ema = []
@@ -104,73 +152,25 @@ class DirectionManager:
     #
     #     return rsi
 
-    def _rsi(self, prices: list[float], window: int = 14) -> list[float]:
-        series = pd.Series(prices)
-        delta = series.diff()
-
-        gain = delta.clip(lower=0)
-        loss = -delta.clip(upper=0)
-
-        avg_gain = gain.ewm(alpha=1 / window, min_periods=window).mean()
-        avg_loss = loss.ewm(alpha=1 / window, min_periods=window).mean()
-
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-
-        return rsi.tolist()
-
-    def _ema(self, prices: list[float], window: int) -> list[float]:
-        series = pd.Series(prices)
-        ema = series.ewm(span=window, adjust=False).mean()
-        return ema.tolist()
-
-    @property
-    def direction(self) -> OrderType | None:
-        if len(self.prices) < 100:
-            return None
-
-        prices = [kline.close for kline in self.prices]
-        ema_fast = self._ema(prices, 9)
-        ema_slow = self._ema(prices, 21)
-        rsi = self._rsi(prices, 14)
-
-        # Текущие значения индикаторов
-        ema9 = ema_fast[-1]
-        ema21 = ema_slow[-1]
-        rsi_val = rsi[-1]
-
-        volume_signal = self._volume_signal()
-        logger.info(f"{volume_signal=}")
-
-        # Условия входа
-        if ema9 > ema21 and rsi_val < 70 : #and volume_signal
-            return OrderType.long
-        elif ema9 < ema21 and rsi_val > 30 : #and volume_signal
-            return OrderType.short
-        return None
-
-    def _volume_signal(self) -> bool:
-        volumes = [kline.volume for kline in self.prices if isinstance(kline, entity.Kline)]
-        if len(volumes) < 20:
-            return True
-
-        series = pd.Series(volumes)
-        last_volume = series.iloc[-1]
-        average_volume = series.rolling(window=20).mean().iloc[-1]
-
-        if last_volume > average_volume * 1.2:
-            return True
-        return False
-
     def load_history(self, prices: list[entity.Kline]) -> None:
         """Загружает исторические цены при старте"""
         self.prices = prices[-200:]  # максимум 100
+        close, high, low, volume = zip(*(to_bar(price) for price in self.prices)) if self.prices else ([],) * 4
+        self.prices = self.prices[-self.keep:] if self.keep else []
+        self.kernel.load(self.row, close, high, low, volume)
+
+    def state(self) -> dict:
+        return {"prices": list(self.prices), "last_time": self.last_time}
+
+    def restore(self, state: dict) -> None:
+        self.prices = list(state["prices"])
+        self.last_time = state["last_time"]
 
     def calculate_true_range(self, high: float, low: float, close_prev: float) -> float:
         return max(high - low, abs(high - close_prev), abs(low - close_prev))
 
     def calculate_atr(self, period: int = 14) -> float | None:
-        klines = [kline for kline in self.prices[:] if isinstance(kline, entity.Kline)]
+        klines = [kline for kline in self.prices if isinstance(kline, entity.Kline)]
         if not klines:
             return None
         trs = []
@@ -183,21 +183,232 @@ class DirectionManager:
 
 
 class MultiFrameDirectionManager:
-    def __init__(self):
-        self.main_tf = DirectionManager()  # 100 минут
-        self.fast_tf = DirectionManager()  # 10 минут
+    """Main (1m) and fast (1s) rows plus higher timeframes, all advanced in one shared kernel.
 
-    def load_history(self, prices: list[entity.Kline]) -> None:
-        self.main_tf.load_history(prices)
+    Higher timeframes (minutes) take kernel rows 2.. in the order given. Their bars are
+    Rollup views over one BaseSeries of 1-minute bars and only the open bucket is kept per
+    timeframe, so a timeframe costs its indicator update when its bucket closes, nothing else.
+    `confluence` names the rule from timeframes.CONFLUENCE they gate the main/fast signal with;
+    the base holds enough 1m bars to warm up the longest timeframe, `history_bars` of them.
+    Volume indicators, if given, run on closed 1m klines only: ticker bars have no volume.
+    """
+
+    def __init__(
+            self,
+            strategy: str = EMA_RSI.name,
+            strategies: list[Strategy] | None = None,
+            ema_spans: tuple[int, ...] = (9, 21),
+            timeframes: tuple[int, ...] = (),
+            confluence: str = "trend",
+            volume: VolumeIndicators | None = None,
+    ):
+        strategies = strategies or list(STRATEGIES.values())
+        self.strategies = StrategySet(strategies)
+        self.strategy = self.strategies.strategies[strategy]
+        self.signals: dict[str, np.ndarray] = {}
+        # Bumped on every kernel change, lets callers skip re-evaluating unchanged signals.
+        self.version = 0
+        self.book: OrderBook | None = None
+        self.book_depth = 5
+        self.book_max_age = 5.0
+        self.timeframes = tuple(timeframes)
+        self.confluence = CONFLUENCE[confluence]
+        self.kernel = IndicatorKernel(rows=2 + len(self.timeframes), ema_spans=ema_spans)
+        self.main_tf = DirectionManager(self.kernel, 0, self.strategy)  # 100 минут
+        self.fast_tf = DirectionManager(self.kernel, 1, self.strategy, keep=0)  # 10 минут
+        # WARM_BARS buckets of the longest timeframe, plus the partial first and the open one
+        self.base = BaseSeries(max(1000, (WARM_BARS + 2) * max(self.timeframes, default=1)))
+        self.rollups = [Rollup(minutes, row) for row, minutes in enumerate(self.timeframes, start=2)]
+        self.volume = volume
+
+    def load_history(self, prices: list[entity.Kline] | KlineColumns) -> None:
+        """Klines oldest first, the last one still open: the main row takes the 200 closed before it,
+        the base series as many as it holds."""
+        start, values = kline_values(prices)
+        self.base.load(start, values)
+        if self.volume is not None:
+            self.volume.reset()
+            self.volume.load(start, values, until=start[-1] if len(start) else None)
+        recent = prices[-201:-1]
+        self.main_tf.load_history(recent.to_klines() if isinstance(recent, KlineColumns) else recent)
+        for rollup in self.rollups:
+            bars = rollup.load(self.base)
+            self.kernel.load(rollup.row, bars[CLOSE], bars[HIGH], bars[LOW], bars[VOLUME])
+            if bars.shape[1] < WARM_BARS:
+                logger.warning(
+                    "Timeframe {}m has {} of {} bars, it blocks entries until warmed up",
+                    rollup.minutes, bars.shape[1], WARM_BARS,
+                )
+        self.version += 1
+
+    @property
+    def history_bars(self) -> int:
+        """1m klines load_history needs: the base series and the open minute."""
+        return self.base.capacity + 1
+
+    def on_klines(self, klines: list[entity.Kline] | KlineColumns) -> int:
+        """Feeds fresh klines (oldest first) to the volume indicators, the minute still open is skipped."""
+        if self.volume is None:
+            return 0
+        added = self.volume.load(*kline_values(klines), until=self.base.last_start)
+        self.version += bool(added)
+        return added
+
+    def view(self, minutes: int) -> np.ndarray:
+        """[start, open, high, low, close, volume] bars of any timeframe, derived from the base on call."""
+        return Rollup(minutes, -1).view(self.base)
+
+    def state(self) -> dict:
+        return {
+            "strategy": self.strategy.name,
+            "kernel": self.kernel.state(),
+            "main_tf": self.main_tf.state(),
+            "fast_tf": self.fast_tf.state(),
+            "timeframes": self.timeframes,
+            "base": self.base.state(),
+            "rollups": [None if rollup.current is None else rollup.current.copy() for rollup in self.rollups],
+            "volume": copy.deepcopy(self.volume),
+        }
+
+    def restore(self, state: dict) -> bool:
+        if state.get("timeframes") != self.timeframes:
+            return False
+        volume = state.get("volume")
+        if (volume and volume.params) != (self.volume and self.volume.params):
+            return False
+        if not self.kernel.restore(state["kernel"]):
+            return False
+        if self.volume is not None:
+            self.volume = copy.deepcopy(volume)
+        self.main_tf.restore(state["main_tf"])
+        self.fast_tf.restore(state["fast_tf"])
+        self.base.restore(state["base"])
+        for rollup, current in zip(self.rollups, state["rollups"]):
+            rollup.current = None if current is None else current.copy()
+        self.version += 1
+        return True
+
+    def _bar(self, price: entity.Kline | entity.Ticker | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Empty row mask and close/high/low/volume rows filled with the price for every kernel row."""
+        rows = self.kernel.rows
+        if price is None:
+            return np.zeros(rows, dtype=bool), np.full((4, rows), np.nan)
+        return np.zeros(rows, dtype=bool), np.repeat(np.array(to_bar(price))[:, None], rows, axis=1)
+
+    def _roll(self, base_bar: np.ndarray, mask: np.ndarray, bar: np.ndarray) -> None:
+        """Folds a closed 1m bar into the main row and every timeframe, marking them for the kernel update.
+
+        Volume is taken from klines only, a minute built from tickers has none.
+        """
+        row = self.main_tf.row
+        mask[row] = True
+        bar[:3, row] = base_bar[[CLOSE, HIGH, LOW]]
+        if not np.isnan(base_bar[VOLUME]):
+            bar[3, row] = base_bar[VOLUME]
+        for rollup in self.rollups:
+            rolled = rollup.on_bar(base_bar)
+            if rolled is not None:
+                mask[rollup.row] = True
+                bar[:, rollup.row] = rolled[[CLOSE, HIGH, LOW, VOLUME]]
 
-    def add(self, price: entity.Kline | entity.Ticker) -> None:
-        self.main_tf.add(price, "second")
-        self.fast_tf.add(price, None)
+    def catch_up(self, klines: list[entity.Kline]) -> int:
+        """Feeds klines missed since a restore into the base series, oldest first; returns the 1m bars closed.
+
+        The fast timeframe keeps its restored state, it moves on with live tickers.
+        """
+        added = 0
+        for i, kline in enumerate(klines):
+            start = kline.start.replace(tzinfo=None)
+            values = (kline.open, kline.high, kline.low, kline.close, kline.volume)
+            for base_bar in self.base.on_kline(to_ms(start), values, is_open=i == len(klines) - 1):
+                mask, bar = self._bar()
+                self._roll(base_bar, mask, bar)
+                self.kernel.update(*bar, mask=mask)
+                added += 1
+            if self.main_tf.last_time is None or start > self.main_tf.last_time:
+                self.main_tf.add(kline, "second", start)
+        self.version += bool(added)
+        self.on_klines(klines)
+        return added
+
+    def add(self, price: entity.Kline | entity.Ticker, now: datetime.datetime | None = None) -> bool:
+        now = now or utc_now()
+        mask, bar = self._bar(price)
+        # Минутная строка ядра идёт закрытыми базовыми барами (_roll), main_tf только помнит минуту
+        self.main_tf.add(price, "second", now)
+        mask[self.fast_tf.row] = self.fast_tf.add(price, None, now)
+        closed = self.base.on_tick(price.close, now)
+        if closed is not None:
+            self._roll(closed, mask, bar)
+        if not mask.any():
+            return False
+        self.kernel.update(*bar, mask=mask)
+        self.version += 1
+        return True
+
+    @property
+    def atr(self) -> float | None:
+        """Kernel ATR of the main timeframe, from history klines and the 1m bars closed by tickers."""
+        atr = self.kernel.atr[self.main_tf.row]
+        return None if np.isnan(atr) else float(atr)
+
+    def entry_atr(self, price: float, direction: OrderType | None) -> float | None:
+        """ATR for a new order, None if there is no entry signal or the market is too quiet."""
+        if direction not in (OrderType.short, OrderType.long):
+            return None
+        atr = self.atr
+        if atr is None:
+            log_sampled("entry_atr", "Main timeframe ATR is not available yet, entry skipped", level="WARNING")
+        context = {"price": price, "atr": np.nan if atr is None else atr}
+        if not self.strategies.entry_allowed(context)[self.strategy.name]:
+            return None
+        return atr
+
+    def should_exit(self, order: entity.Order, price: float, direction: OrderType | None) -> bool:
+        context = {
+            "price": price,
+            "entry": order.price_open,
+            "sl": order.price_sl,
+            "tp1": order.price_tp1,
+            "tp1_filled": order.tp1_executed_at is not None,
+            "signal": {OrderType.long: 1, OrderType.short: -1}.get(direction, 0),
+        }
+        return self.strategies.exit(context, order.order_type == OrderType.long)[self.strategy.name]
+
+    def book_features(self) -> dict[str, float | None]:
+        if self.book is None or self.book.stale(self.book_max_age):
+            return {"imbalance": None, "microprice": None}
+        return {"imbalance": self.book.imbalance(self.book_depth), "microprice": self.book.microprice}
+
+    def volume_features(self) -> dict[str, float]:
+        if self.volume is None:
+            return dict.fromkeys(VolumeIndicators.FEATURES, np.nan)
+        return self.volume.features
+
+    def tp_levels(self) -> list[float]:
+        return self.volume.levels() if self.volume is not None else []
+
+    @property
+    def streams(self) -> dict[str, np.ndarray]:
+        """Kernel streams plus order book and volume features, the same value for every row."""
+        streams = self.kernel.streams
+        features = {**self.book_features(), **self.volume_features()}
+        for name, value in features.items():
+            streams[name] = np.full(self.kernel.rows, np.nan if value is None else value)
+        return streams
 
     def get_direction(self) -> OrderType | None:
-        main_dir = self.main_tf.direction
-        fast_dir = self.fast_tf.direction
-        logger.info(f"{main_dir=}, {fast_dir=}")
-        if main_dir and fast_dir == main_dir:
+        # All strategies are evaluated in one pass over the shared indicator state.
+        self.signals = self.strategies.signals(self.streams)
+        directions = self.signals[self.strategy.name]
+        main_dir = to_order_type(directions[self.main_tf.row])
+        fast_dir = to_order_type(directions[self.fast_tf.row])
+        higher = directions[2:]
+        ready = self.kernel.count[2:] >= WARM_BARS
+        log_sampled(
+            "direction", "main_dir={}, fast_dir={}, higher={}, ready={}",
+            main_dir, fast_dir, higher.tolist(), ready.tolist(),
+        )
+        if main_dir and fast_dir == main_dir and self.confluence(int(directions[self.main_tf.row]), higher, ready):
             return main_dir
         return None
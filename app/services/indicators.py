@@ -0,0 +1,178 @@
+import numpy as np
+
+from app.entity.enums import OrderType
+
+
+class IndicatorKernel:
+    """Incremental EMA/RSI/ATR/volume SMA state for many series (rows) held in flat arrays.
+
+    One row per symbol x timeframe. `update` advances every masked row by one bar in a
+    single vectorized step, matching the pandas formulas used before:
+    ewm(span, adjust=False) for EMA, ewm(alpha=1/period, min_periods=period) for RSI,
+    a simple mean of the last `atr_period` true ranges and a rolling volume mean.
+    """
+
+    def __init__(
+            self,
+            rows: int,
+            ema_spans: tuple[int, ...] = (9, 21),
+            rsi_period: int = 14,
+            atr_period: int = 14,
+            volume_period: int = 20,
+    ):
+        self.rows = rows
+        self.ema_spans = tuple(ema_spans)
+        self.rsi_period = rsi_period
+        self.atr_period = atr_period
+        self.volume_period = volume_period
+        self.alphas = np.array([2 / (span + 1) for span in self.ema_spans])[:, None]
+        self.reset()
+
+    def reset(self, rows: np.ndarray | list[int] | None = None) -> None:
+        if rows is None:
+            n = self.rows
+            self.count = np.zeros(n, dtype=np.int64)
+            self.close = np.full(n, np.nan)
+            self.ema = np.full((len(self.ema_spans), n), np.nan)
+            self.gain_num = np.zeros(n)
+            self.loss_num = np.zeros(n)
+            self.rsi_count = np.zeros(n, dtype=np.int64)
+            self.tr = np.zeros((n, self.atr_period))
+            self.tr_count = np.zeros(n, dtype=np.int64)
+            self.volume = np.zeros((n, self.volume_period))
+            self.volume_count = np.zeros(n, dtype=np.int64)
+            return
+        self.count[rows] = 0
+        self.close[rows] = np.nan
+        self.ema[:, rows] = np.nan
+        self.gain_num[rows] = 0
+        self.loss_num[rows] = 0
+        self.rsi_count[rows] = 0
+        self.tr[rows] = 0
+        self.tr_count[rows] = 0
+        self.volume[rows] = 0
+        self.volume_count[rows] = 0
+
+    STATE = (
+        "count", "close", "ema", "gain_num", "loss_num", "rsi_count", "tr", "tr_count", "volume", "volume_count",
+    )
+
+    def state(self) -> dict:
+        state = {name: getattr(self, name).copy() for name in self.STATE}
+        state["params"] = (self.rows, self.ema_spans, self.rsi_period, self.atr_period, self.volume_period)
+        return state
+
+    def restore(self, state: dict) -> bool:
+        """Loads arrays saved by `state`, False if they were taken with other parameters."""
+        if state.get("params") != (self.rows, self.ema_spans, self.rsi_period, self.atr_period, self.volume_period):
+            return False
+        for name in self.STATE:
+            setattr(self, name, state[name].copy())
+        return True
+
+    def update(
+            self,
+            close: np.ndarray,
+            high: np.ndarray | None = None,
+            low: np.ndarray | None = None,
+            volume: np.ndarray | None = None,
+            mask: np.ndarray | None = None,
+    ) -> None:
+        """Advances masked rows by one bar. NaN high/low or volume skip the ATR or volume update."""
+        idx = np.arange(self.rows) if mask is None else np.flatnonzero(mask)
+        if not len(idx):
+            return
+        c = np.asarray(close, dtype=float)[idx]
+        prev = self.close[idx]
+        first = np.isnan(prev)
+        has_prev = ~first
+
+        ema = self.ema[:, idx]
+        self.ema[:, idx] = np.where(first, c, ema + self.alphas * (c - ema))
+
+        delta = np.where(first, 0.0, c - prev)
+        decay = 1 - 1 / self.rsi_period
+        self.gain_num[idx] = np.where(has_prev, self.gain_num[idx] * decay + np.maximum(delta, 0), 0.0)
+        self.loss_num[idx] = np.where(has_prev, self.loss_num[idx] * decay + np.maximum(-delta, 0), 0.0)
+        self.rsi_count[idx] += has_prev
+
+        if high is not None and low is not None:
+            h = np.asarray(high, dtype=float)[idx]
+            l = np.asarray(low, dtype=float)[idx]
+            ok = has_prev & ~np.isnan(h) & ~np.isnan(l)
+            if ok.any():
+                rows = idx[ok]
+                tr = np.maximum(h[ok] - l[ok], np.maximum(np.abs(h[ok] - prev[ok]), np.abs(l[ok] - prev[ok])))
+                self.tr[rows, self.tr_count[rows] % self.atr_period] = tr
+                self.tr_count[rows] += 1
+
+        if volume is not None:
+            v = np.asarray(volume, dtype=float)[idx]
+            ok = ~np.isnan(v)
+            if ok.any():
+                rows = idx[ok]
+                self.volume[rows, self.volume_count[rows] % self.volume_period] = v[ok]
+                self.volume_count[rows] += 1
+
+        self.close[idx] = c
+        self.count[idx] += 1
+
+    def load(self, row: int, close: list[float], high: list[float], low: list[float], volume: list[float]) -> None:
+        self.reset([row])
+        mask = np.zeros(self.rows, dtype=bool)
+        mask[row] = True
+        bar = np.full((4, self.rows), np.nan)
+        for values in zip(close, high, low, volume):
+            bar[:, row] = values
+            self.update(bar[0], bar[1], bar[2], bar[3], mask)
+
+    def ema_of(self, span: int) -> np.ndarray:
+        return self.ema[self.ema_spans.index(span)]
+
+    @property
+    def rsi(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = self.gain_num / self.loss_num
+            rsi = 100 - 100 / (1 + rs)
+        return np.where(self.rsi_count >= self.rsi_period, rsi, np.nan)
+
+    @property
+    def atr(self) -> np.ndarray:
+        return np.where(self.tr_count >= self.atr_period, self.tr.mean(axis=1), np.nan)
+
+    @property
+    def volume_sma(self) -> np.ndarray:
+        return np.where(self.volume_count >= self.volume_period, self.volume.mean(axis=1), np.nan)
+
+    @property
+    def last_volume(self) -> np.ndarray:
+        return self.volume[np.arange(self.rows), (self.volume_count - 1) % self.volume_period]
+
+    @property
+    def volume_signal(self) -> np.ndarray:
+        return np.where(
+            self.volume_count >= self.volume_period, self.last_volume > self.volume_sma * 1.2, True
+        )
+
+    @property
+    def streams(self) -> dict[str, np.ndarray]:
+        streams = {
+            "close": self.close,
+            "count": self.count,
+            f"rsi{self.rsi_period}": self.rsi,
+            f"atr{self.atr_period}": self.atr,
+            "volume": self.last_volume,
+            f"volume_sma{self.volume_period}": self.volume_sma,
+            "volume_signal": self.volume_signal,
+        }
+        for i, span in enumerate(self.ema_spans):
+            streams[f"ema{span}"] = self.ema[i]
+        return streams
+
+
+def to_order_type(value: int) -> OrderType | None:
+    if value > 0:
+        return OrderType.long
+    if value < 0:
+        return OrderType.short
+    return None
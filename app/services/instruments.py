@@ -0,0 +1,43 @@
+import time
+import traceback
+from typing import Callable
+
+from pydantic import TypeAdapter
+
+from app import entity, exc
+from app.logger import logger
+
+
+class InstrumentRegistry:
+    """Symbol precision and limits, loaded once for the whole category and refreshed on TTL."""
+
+    def __init__(self, loader: Callable[[], list[dict]], ttl: float = 3600):
+        self.loader = loader
+        self.ttl = ttl
+        self.instruments: dict[str, entity.Instrument] = {}
+        self.loaded_at: float | None = None
+
+    @property
+    def expired(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl
+
+    def refresh(self) -> None:
+        try:
+            rows = self.loader()
+        except Exception as e:
+            if not self.instruments:
+                raise
+            logger.error(f"{e=} {traceback.format_exc()}")
+            self.loaded_at = time.monotonic()
+            return
+        instruments = TypeAdapter(list[entity.Instrument]).validate_python(rows)
+        self.instruments = {instrument.symbol: instrument for instrument in instruments}
+        self.loaded_at = time.monotonic()
+
+    def get(self, symbol: str) -> entity.Instrument:
+        if self.expired or symbol not in self.instruments:
+            self.refresh()
+        instrument = self.instruments.get(symbol)
+        if instrument is None:
+            raise exc.NotFoundError(f"Instrument {symbol} not found")
+        return instrument
@@ -1,76 +1,298 @@
 import asyncio
 import datetime
+import time
 import traceback
 
 from pybit.exceptions import InvalidRequestError
 from pydantic import TypeAdapter
 
-from app import entity
+from app import entity, models
+from app.config import config
 from app.entity.enums import OrderType
-from app.logger import logger
-from app.repository import SAUnitOfWork
+from app.logger import log_sampled, logger
+from app.repository import SAUnitOfWork, ReadOnlyUnitOfWork
 from app.services.api import BybitAPI
+from app.services.chaser import EntryChaser
+from app.services.decode import OrderColumns, from_ms
 from app.services.direction import MultiFrameDirectionManager
+from app.services.orderbook import OrderBook, OrderBookFeed
+from app.services.partitions import PartitionManager
+from app.services.risk import RiskEngine
+from app.services.shadow import ShadowEngine, default_variants, variant_spans
+from app.services.snapshot import StateSnapshot
+from app.services.stages import StageGate, orders_fingerprint, row_version
+from app.services.tape import TapeRecorder
+from app.services.timeframes import MINUTE_MS
+from app.services.trailing import TrailingStop
+from app.services.volume import VolumeIndicators
 from app.utils.datetime import utc_now
+from app.utils.memory import MemoryMonitor
 
 
 class Manager:
-    def __init__(self, uow: SAUnitOfWork, api: BybitAPI):
+    def __init__(
+            self,
+            uow: SAUnitOfWork,
+            api: BybitAPI,
+            report_uow: ReadOnlyUnitOfWork | None = None,
+            writer_uow: SAUnitOfWork | None = None,
+    ):
         self.uow = uow
+        self.report_uow = report_uow
+        # Background writes go through their own pool, the trading one is left to tick.
+        self.writer_uow = writer_uow
         self.api = api
-        self.direction = MultiFrameDirectionManager()
+        variants = (
+            [entity.ShadowVariant(**variant) for variant in config.SHADOW_VARIANTS] or default_variants()
+        ) if config.SHADOW_ENABLED else []
+        # Shadow variants read their EMAs from the same kernel, all spans are computed in one step.
+        spans = tuple(sorted({9, 21} | variant_spans(variants)))
+        volume = VolumeIndicators(
+            vwap_window=config.VWAP_WINDOW,
+            band_std=config.VWAP_BAND_STD,
+            profile_bars=config.VOLUME_PROFILE_BARS,
+            resolution=config.VOLUME_PROFILE_RESOLUTION,
+            value_area=config.VOLUME_VALUE_AREA,
+        ) if config.VOLUME_INDICATORS else None
+        self.direction = MultiFrameDirectionManager(
+            config.STRATEGY,
+            ema_spans=spans,
+            timeframes=tuple(config.TIMEFRAMES),
+            confluence=config.CONFLUENCE,
+            volume=volume,
+        )
+        self.volume_minute: int | None = None
+        self.shadow = ShadowEngine(
+            variants, self.direction.kernel, max_pending=config.SHADOW_MAX_PENDING
+        ) if variants else None
         self.prices = []
-        klines = self.api.get_kline()
-        prices = klines[::-1]
-        self.direction.load_history(prices)
+        self.tape = TapeRecorder(config.TAPE_DIR) if config.TAPE_DIR else None
         self.buy_leverage = None
         self.sell_leverage = None
+        self.order: entity.Order | None = None
+        self.book = OrderBook(api.pair) if config.ORDERBOOK_DEPTH else None
+        self.book_feed = OrderBookFeed(self.book, config.ORDERBOOK_DEPTH, config.TESTNET) if self.book else None
+        self.direction.book = self.book
+        self.direction.book_depth = config.ORDERBOOK_IMBALANCE_DEPTH
+        self.direction.book_max_age = config.ORDERBOOK_MAX_AGE
+        self.snapshot = StateSnapshot(
+            config.SNAPSHOT_PATH, interval=config.SNAPSHOT_INTERVAL, max_age=config.SNAPSHOT_MAX_AGE
+        ) if config.SNAPSHOT_PATH else None
+        self.chaser = EntryChaser(
+            api,
+            trigger=config.ENTRY_CHASE_TRIGGER,
+            max_drift=config.ENTRY_CHASE_MAX_DRIFT,
+            max_amends=config.ENTRY_CHASE_MAX_AMENDS,
+        )
+        self.trailing = TrailingStop(
+            api,
+            mode=config.TRAILING_MODE,
+            atr_mult=config.TRAILING_ATR_MULT,
+            percent=config.TRAILING_PERCENT,
+            min_step=config.TRAILING_MIN_STEP,
+            min_interval=config.TRAILING_MIN_INTERVAL,
+        )
+        self.gate = StageGate()
+        self.memory = MemoryMonitor(
+            trace=config.MEMORY_TRACE,
+            interval=config.MEMORY_INTERVAL,
+            budget_mb=config.MEMORY_BUDGET_MB,
+            frames=config.MEMORY_TRACE_FRAMES,
+            types=(entity.Ticker, entity.BybitOrder, entity.Order, entity.Kline, models.Order),
+        )
+        self.last_direction: OrderType | None = None
+        # Market time of the tick; a tape replay sets its own, throttles stay on the monotonic clock
+        self.clock = utc_now
+        self.risk = RiskEngine(
+            api,
+            refresh_interval=config.RISK_REFRESH_INTERVAL,
+            risk_per_trade=config.RISK_PER_TRADE,
+            max_exposure=config.RISK_MAX_EXPOSURE,
+            max_margin=config.RISK_MAX_MARGIN_USDT,
+        )
+        if not self._warm_start():
+            klines = self.api.get_kline_history(self.direction.history_bars)[::-1]
+            # Модели только для окна истории, базовая серия таймфреймов читает колонки
+            self.direction.load_history(klines)
+            if self.tape:
+                self.tape.klines(klines.to_klines())
         # atr = self.direction.main_tf.calculate_atr(period=10)
         # pass
 
+    def state(self) -> dict:
+        return {
+            "direction": self.direction.state(),
+            "buy_leverage": self.buy_leverage,
+            "sell_leverage": self.sell_leverage,
+            "chases": {order_id: list(chase) for order_id, chase in self.chaser.chases.items()},
+        }
+
+    def _warm_start(self) -> bool:
+        """Restores state from the snapshot and fetches only klines missed since then."""
+        loaded = self.snapshot.load() if self.snapshot else None
+        if loaded is None:
+            return False
+        state, age = loaded
+        if not self.direction.restore(state["direction"]):
+            logger.warning("Snapshot was taken with other indicator parameters, full reload")
+            return False
+        self.buy_leverage = state["buy_leverage"]
+        self.sell_leverage = state["sell_leverage"]
+        self.chaser.chases = state.get("chases", {})
+        last_time = self.direction.main_tf.last_time
+        prices = self.api.get_kline(start=last_time)[::-1] if last_time else []
+        added = self.direction.catch_up(prices)
+        if self.tape:
+            self.tape.klines(prices)
+        logger.info("Warm start from snapshot {:.0f}s old, {} klines caught up", age, added)
+        return True
+
+    async def report_trade_result(self) -> None:
+        """Logs the trade result periodically over the report pool, off the trading session."""
+        while True:
+            try:
+                async with self.report_uow:
+                    result = await self.report_uow.order.get_trade_result(datetime.datetime(2025, 6, 4))
+                logger.info(
+                    "result.spent={} result.received={} result.difference={}",
+                    result.spent, result.received, result.difference,
+                )
+            except Exception as e:
+                logger.error(f"{e=}\n{traceback.format_exc()}")
+            await asyncio.sleep(config.TRADE_RESULT_INTERVAL)
+
+    async def write_shadow_trades(self) -> None:
+        """Flushes closed shadow trades in batches on the writer pool."""
+        uow = SAUnitOfWork(self.writer_uow.session_factory)
+        while True:
+            await asyncio.sleep(config.SHADOW_FLUSH_INTERVAL)
+            written = await self.shadow.flush(uow)
+            if written:
+                logger.info("Shadow trades written: {}", written)
+
+    async def maintain_partitions(self) -> None:
+        partitions = PartitionManager(
+            SAUnitOfWork(self.writer_uow.session_factory),
+            archive_dir=config.ORDERS_ARCHIVE_DIR,
+            retention_months=config.ORDERS_RETENTION_MONTHS,
+            lock_timeout_ms=config.PARTITION_LOCK_TIMEOUT_MS,
+            drop_lock_timeout_ms=config.PARTITION_DROP_LOCK_TIMEOUT_MS,
+        )
+        while True:
+            try:
+                await partitions.maintain()
+            except Exception as e:
+                logger.error(f"{e=}\n{traceback.format_exc()}")
+            await asyncio.sleep(config.PARTITION_MAINTENANCE_INTERVAL)
+
     async def run(self) -> None:
+        if self.report_uow:
+            self.report_task = asyncio.create_task(self.report_trade_result())
+        if config.PARTITION_MAINTENANCE and self.writer_uow:
+            self.partitions_task = asyncio.create_task(self.maintain_partitions())
+        if self.shadow and self.writer_uow:
+            self.shadow_task = asyncio.create_task(self.write_shadow_trades())
+        if self.book_feed:
+            self.book.apply_snapshot(self.api.get_orderbook(config.ORDERBOOK_DEPTH))
+            self.book_feed.start()
         while True:
-            async with self.uow:
+            await self.tick()
+            if self.snapshot:
+                self.snapshot.maybe_save(self.state)
+            # await asyncio.sleep(0.1)
+
+    async def tick(self) -> None:
+        """One pass of the pipeline; stages whose inputs did not change since their last run are skipped."""
+        gate = self.gate
+        memory = self.memory
+        async with self.uow:
+            with memory.stage("fetch"):
                 price = self.api.get_tickers()
                 price = TypeAdapter(entity.Ticker).validate_python(price[0])
                 orders = self.api.get_last_orders_history()
                 open_orders = self.api.get_open_orders()
                 orders = open_orders + orders
-                result = await self.uow.order.get_trade_result(datetime.datetime(2025, 6, 4))
-                logger.info(f"{result.spent=} {result.received=} {result.difference=}")
-                self.direction.add(price)
-                direction = self.direction.get_direction()
+            if self.tape:
+                with memory.stage("tape"):
+                    self.tape.ticker(price)
+                    self.tape.orders(orders)
+            with memory.stage("risk"):
+                self.risk.refresh()
+                self.risk.mark(price.mark_price)
+            with memory.stage("direction"):
+                self.direction.add(price, self.clock())
+                self._feed_volume()
+                book = tuple(self.direction.book_features().values()) if self.book else None
+                if gate.should_run("direction", self.direction.version, book):
+                    self.last_direction = self.direction.get_direction()
+                direction = self.last_direction
+            with memory.stage("find_order"):
                 exist_order = await self.uow.order.find_or_none({"close_at": None, "reverse": False})
+                orders_fp = orders_fingerprint(orders)
 
-                if exist_order:
-                    exist_order = await self._check_order_opening(exist_order, orders, price.close, direction)
-                    if not exist_order:
-                        continue
-                    exist_order = await self._check_order_tp_sl(exist_order, orders)
-                    exist_order = await self._set_tp(exist_order, price.close)
-                    exist_order = await self._set_sl(exist_order, price.close)
-                    exist_order = await self._check_order_closing(exist_order, orders)
-                    exist_order = await self._check_trailing_stop(exist_order)
-                    exist_order = await self._check_close(exist_order, price.mark_price, direction)
-
+            cancelled = False
+            if exist_order:
+                with memory.stage("order"):
+                    exist_order = await self._process_order(exist_order, orders, orders_fp, price, direction)
+                cancelled = exist_order is None
 
-                if not exist_order:
+            if not exist_order and not cancelled:
+                if gate.should_run("open", price.close, direction, self.risk.refreshed_at):
+                    with memory.stage("open"):
                         await self._set_open_order(price.close, direction)
 
-                # await asyncio.sleep(0.1)
+            self.order = exist_order if exist_order and not exist_order.close_at else None
+        # После живого решения, чтобы варианты не задерживали его
+        if self.shadow:
+            with memory.stage("shadow"):
+                self.shadow.on_tick(price.close, self.clock())
+        memory.maybe_report()
+        log_sampled("stages", "stages={}", gate.stats, level="DEBUG", lazy=True)
 
-    @staticmethod
-    def is_same_orders(order: entity.Order, ord: entity.BybitOrder, attr: str) -> bool:
-        order_price = getattr(order, f"price_{attr}")
-        if not ord.trigger_price:
+    async def _process_order(
+            self,
+            order: entity.Order,
+            orders: OrderColumns,
+            orders_fp: int,
+            price: entity.Ticker,
+            direction: OrderType | None,
+    ) -> entity.Order | None:
+        """Need open uow. None if the unfilled entry was cancelled."""
+        gate = self.gate
+        waiting = order.open_at is None
+        if gate.should_run(
+                "opening", row_version(order), orders_fp,
+                price.close if waiting else None, direction if waiting else None,
+        ):
+            order = await self._check_order_opening(order, orders, price.close, direction)
+            if not order:
+                return None
+        if gate.should_run("tp_sl", row_version(order), orders_fp):
+            order = await self._check_order_tp_sl(order, orders)
+        if gate.should_run("bracket", row_version(order), price.close):
+            order = await self._set_bracket(order, price.close)
+        if gate.should_run("closing", row_version(order), orders_fp):
+            order = await self._check_order_closing(order, orders)
+        if gate.should_run(
+                "trailing", row_version(order), price.close, self.direction.atr,
+                int(time.monotonic() // self.trailing.min_interval),
+        ):
+            order = await self._check_trailing_stop(order, price.close)
+        if gate.should_run("close", row_version(order), price.mark_price, direction):
+            order = await self._check_close(order, price.mark_price, direction)
+        return order
+
+    def is_same_orders(self, order: entity.Order, ord: entity.BybitOrder, attr: str) -> bool:
+        order_price = self.api.round_price(getattr(order, f"price_{attr}"))
+        tp1_qty, tp2_qty = self.api.tp_qty(order.value)
+        if not ord.trigger_price or ord.trigger_price != order_price:
             return False
-        if ord.qty == order.value / 2 and ord.trigger_price == order_price:
-            if attr in ["tp1", "tp2"] and ord.stop_order_type == "PartialTakeProfit":
-                return True
-        if (ord.qty == order.value or ord.qty == order.value / 2) and ord.trigger_price == order_price:
-            if attr == "sl" and ord.stop_order_type == "StopLoss":
-                return True
-        return False
+        if attr in ["tp1", "tp2"]:
+            # Каждый TP сверяем со своим размером, TP2 добирает остаток после округления TP1
+            qty = tp1_qty if attr == "tp1" else tp2_qty
+            return ord.qty == qty and ord.stop_order_type == "PartialTakeProfit"
+        # Стоп на всю позицию или на остаток после TP1
+        return ord.qty in (order.value, tp2_qty) and ord.stop_order_type == "StopLoss"
 
     def is_need_open_reverse(self, order: entity.Order, price: float) -> bool:
         if order.order_type == OrderType.long and order.price_open * 0.99 < price < order.price_open * 0.995:
@@ -80,26 +302,37 @@ class Manager:
         return False
 
     async def _check_order_opening(
-            self, order: entity.Order, orders: list[entity.BybitOrder], price: float, direction: OrderType | None
+            self, order: entity.Order, orders: OrderColumns, price: float, direction: OrderType | None
     ) -> entity.Order | None:
         """Need open uow."""
         if order.open_at is None:
-            for ord in orders:
-                if ord.order_id != order.orderId_open:
-                    continue
+            for ord in orders.find(order.orderId_open):
                 if not ord.avg_price:
-                    if ord.status == "New" and (
+                    if ord.status != "New":
+                        continue
+                    if direction == order.order_type and self.chaser.running_away(order, price):
+                        target = self.api.round_price(self.entry_price(price, order.order_type))
+                        if not self.chaser.exhausted(order, target):
+                            if self.chaser.chase(order, target):
+                                order = await self._reprice_entry(order, target)
+                            elif target != order.price_open:
+                                # Throttled or refused, retried next tick even if nothing changes
+                                self.gate.invalidate("opening")
+                            continue
+                    if (
                         (price >= order.price_open * 1.005 and order.order_type == OrderType.long) or
                         (price <= order.price_open * 0.995 and order.order_type == OrderType.short) or
                         direction != order.order_type
                     ):
                         self.api.cancel_order(order)
+                        self.chaser.forget(order)
                         await self.uow.order.delete({"id": order.id})
                         await self.uow.commit()
                         return None
                     continue
 
                 if ord.status == "Cancelled":
+                    self.chaser.forget(order)
                     order = await self.uow.order.update(
                         order.id,
                         {
@@ -114,11 +347,19 @@ class Manager:
                     )
                     await self.uow.commit()
                 elif ord.status == "Filled":
+                    self.chaser.forget(order)
                     order = await self.uow.order.update(order.id, {"open_at": ord.updated_at, "price_open": ord.avg_price})
                     await self.uow.commit()
+                    self.risk.on_fill(order.order_type, order.value, ord.avg_price)
 
         return order
 
+    async def _reprice_entry(self, order: entity.Order, price: float) -> entity.Order:
+        """Need open uow. The same row follows the amended entry, TP/SL keep their distance."""
+        order = await self.uow.order.update(order.id, self.chaser.shifted(order, price, self.api.round_price))
+        await self.uow.commit()
+        return order
+
     async def _check_order_tp_sl(self, order: entity.Order, orders: list[entity.BybitOrder]) -> entity.Order:
         """Need open uow."""
         update = False
@@ -132,59 +373,48 @@ class Manager:
             await self.uow.commit()
         return order
 
-    async def _set_tp(self, order: entity.Order, price: float) -> entity.Order:
-        params = {"tp1_at": utc_now()}
-        if order.open_at and not order.orderId_tp1 and not order.tp1_at:
-            if order.order_type == OrderType.long and order.price_tp1 < price:
-                order.price_tp1 = price
-                params["price_tp1"] = price
-            if order.order_type == OrderType.short and order.price_tp1 > price:
-                order.price_tp1 = price
-                params["price_tp1"] = price
-            try:
-                self.api.create_take_profit_order(order, "price_tp1")
-            except InvalidRequestError as e:
-                logger.error(f"{e=} \n{traceback.format_exc()}")
-                return order
-            order = await self.uow.order.update(order.id, params)
-            await self.uow.commit()
+    @staticmethod
+    def bracket_price(order: entity.Order, attr: str, price: float) -> float:
+        """Moves a leg to the market price if the market already passed it."""
+        leg_price = getattr(order, f"price_{attr}")
+        above_market = (order.order_type == OrderType.long) == (attr != "sl")
+        if (above_market and leg_price < price) or (not above_market and leg_price > price):
+            return price
+        return leg_price
 
-        params = {"tp2_at": utc_now()}
-        if order.open_at and not order.orderId_tp2 and not order.tp2_at:
-            if order.order_type == OrderType.long and order.price_tp2 < price:
-                order.price_tp2 = price
-                params["price_tp2"] = price
-            if order.order_type == OrderType.short and order.price_tp2 > price:
-                order.price_tp2 = price
-                params["price_tp2"] = price
-            try:
-                self.api.create_take_profit_order(order, "price_tp2")
-            except InvalidRequestError as e:
-                logger.error(f"{e=} \n{traceback.format_exc()}")
-                return order
-            order = await self.uow.order.update(order.id, params)
-            await self.uow.commit()
+    async def _set_bracket(self, order: entity.Order, price: float) -> entity.Order:
+        """Need open uow."""
+        if not order.open_at:
+            return order
+        legs = [
+            attr for attr in ("sl", "tp1", "tp2")
+            if not getattr(order, f"orderId_{attr}") and not getattr(order, f"{attr}_at")
+        ]
+        if not legs:
+            return order
 
-        return order
+        params = {}
+        for attr in legs:
+            leg_price = self.bracket_price(order, attr, price)
+            if leg_price != getattr(order, f"price_{attr}"):
+                setattr(order, f"price_{attr}", leg_price)
+                params[f"price_{attr}"] = leg_price
 
-    async def _set_sl(self, order: entity.Order, price: float) -> entity.Order:
-        params = {"sl_at": utc_now()}
-        if order.open_at and not order.orderId_sl and not order.sl_at:
-            if order.order_type == OrderType.long and order.price_sl > price:
-                order.price_sl = price
-                params["price_sl"] = price
-            if order.order_type == OrderType.short and order.price_sl < price:
-                order.price_sl = price
-                params["price_sl"] = price
+        results = self.api.create_bracket_orders(order, legs)
+        now = self.clock()
+        for attr, error in results.items():
+            if error is not None:
+                logger.error(f"{attr=} {error=}")
+                params.pop(f"price_{attr}", None)
+                continue
+            params[f"{attr}_at"] = now
+        if any(error is not None for error in results.values()):
+            # Failed legs are retried on the next tick, not only when the price moves
+            self.gate.invalidate("bracket")
 
-            try:
-                self.api.create_stop_loss_order(order)
-            except Exception as e:
-                logger.error(f"{e=}\n{traceback.format_exc()}")
-                return order
+        if any(key.endswith("_at") for key in params):
             order = await self.uow.order.update(order.id, params)
             await self.uow.commit()
-
         return order
 
     async def _check_order_closing(self, order: entity.Order, orders: list[entity.BybitOrder]) -> entity.Order:
@@ -252,67 +482,95 @@ class Manager:
                     update = True
                 if update:
                     await self.uow.commit()
+                    self.risk.invalidate()
 
         return order
 
     async def _set_open_order(self, price: float, direction: OrderType | None) -> None:
         """Need open uow."""
-        if direction in (OrderType.short, OrderType.long):
-            atr = self.direction.main_tf.calculate_atr(period=14)
-            if atr < price * 0.0015:
-                return
-            logger.info(f"Atr: {atr}")
-            body = entity.AddOrder(
-                order_type=direction,
-                price_open=round(price, 1),
-                leverage=10,
-                atr=atr,
-            )
-            if self.buy_leverage != body.buy_leverage or self.sell_leverage != body.sell_leverage:
-                self.api.set_leverage(body.buy_leverage, body.sell_leverage)
-                self.buy_leverage = body.buy_leverage
-                self.sell_leverage = body.sell_leverage
-            try:
-                order = self.api.create_open_order(body)
-            except InvalidRequestError as e:
-                logger.error(f"{e=}\n{traceback.format_exc()}")
-                return
-            body.orderId_open = order["result"]["orderId"]
-            await self.uow.order.add(body.model_dump(exclude={"atr"}))
-            await self.uow.commit()
+        atr = self.direction.entry_atr(price, direction)
+        if atr is None:
+            return
+        logger.info("Atr: {}", atr)
+        leverage = config.LEVERAGE
+        margin = self.risk.margin_for(price, atr, leverage)
+        if margin is None:
+            return
+        body = entity.AddOrder(
+            order_type=direction,
+            price_open=self.api.round_price(self.entry_price(price, direction)),
+            leverage=leverage,
+            atr=atr,
+            instrument=self.api.instrument,
+            margin=margin,
+            tp_levels=self.direction.tp_levels() if config.VOLUME_TP else [],
+        )
+        if not self.api.instrument.can_split_tp(body.value):
+            log_sampled("tp_split", "Entry qty {} can not be split into two TPs of min qty {}",
+                        body.value, self.api.instrument.min_qty, level="WARNING")
+            return
+        if not self.risk.check(body):
+            return
+        if self.buy_leverage != body.buy_leverage or self.sell_leverage != body.sell_leverage:
+            self.api.set_leverage(body.buy_leverage, body.sell_leverage)
+            self.buy_leverage = body.buy_leverage
+            self.sell_leverage = body.sell_leverage
+        try:
+            order = self.api.create_open_order(body)
+        except InvalidRequestError as e:
+            logger.error(f"{e=}\n{traceback.format_exc()}")
+            self.gate.invalidate("open")
+            return
+        body.orderId_open = order["result"]["orderId"]
+        await self.uow.order.add(body.model_dump(exclude={"atr"}))
+        await self.uow.commit()
+
+    def _feed_volume(self) -> None:
+        """Fetches klines closed since the volume indicators' last one, one request per new minute."""
+        volume = self.direction.volume
+        current = self.direction.base.last_start
+        if volume is None or volume.last_start is None or current in (None, self.volume_minute):
+            return
+        if volume.last_start + MINUTE_MS >= current:
+            return
+        try:
+            klines = self.api.get_kline_columns(start=from_ms(volume.last_start + MINUTE_MS))[::-1]
+        except Exception as e:
+            logger.error(f"{e=}\n{traceback.format_exc()}")
+            return
+        self.volume_minute = current
+        self.direction.on_klines(klines)
+
+    def entry_price(self, price: float, direction: OrderType) -> float:
+        """Limit price for a new entry from the book, the last price without a fresh book."""
+        if self.book is None or self.book.stale(config.ORDERBOOK_MAX_AGE):
+            return price
+        limit_price = self.book.limit_price(direction, float(self.api.instrument.tick_size))
+        return price if limit_price is None else limit_price
 
-    async def _check_trailing_stop(self, order: entity.Order) -> entity.Order:
+    async def _check_trailing_stop(self, order: entity.Order, price: float) -> entity.Order:
         """Need open uow."""
-        if order.orderId_sl and order.tp1_executed_at and (
-                (order.order_type == OrderType.long and order.price_sl < order.price_open) or
-                (order.order_type == OrderType.short and order.price_sl > order.price_open)
-        ):
-            try:
-                self.api.amend_stop_loss(order)
-                order = await self.uow.order.update(order.id, {"price_sl": order.price_ts})
-                await self.uow.commit()
-            except Exception as e:
-                logger.error(f"{e=}\n{traceback.format_exc()}")
+        if not order.orderId_sl or not order.tp1_executed_at:
+            return order
+        if order.close_at:
+            self.trailing.forget(order)
+            return order
+        stop = self.trailing.update(order, price, self.direction.atr)
+        if stop is not None:
+            order = await self.uow.order.update(order.id, {"price_sl": stop})
+            await self.uow.commit()
         return order
 
     async def _check_close(self, order: entity.Order, price: float, direction: OrderType | None) -> entity.Order:
         """Need open uow."""
         if order.close_at or not all([order.orderId_tp1, order.orderId_tp2, order.orderId_sl]):
             return order
-        if (
-            (order.order_type == OrderType.long and order.price_sl > price) or
-            (order.order_type == OrderType.short and order.price_sl < price) or
-            (order.order_type == OrderType.long and order.price_open * 0.998 > price) or
-            (order.order_type == OrderType.short and order.price_open * 1.002 < price) or
-            (order.tp1_executed_at and order.order_type != direction and (
-                (order.order_type == OrderType.long and order.price_tp1 * 0.998 > price) or
-                (order.order_type == OrderType.short and order.price_tp1 * 1.002 < price)
-            ))
-        ):
+        if self.direction.should_exit(order, price, direction):
             try:
                 ord = self.api.create_close_order(order)
             except InvalidRequestError as e:
                 logger.error(f"{e=}\n{traceback.format_exc()}")
+                self.gate.invalidate("close")
                 return order
             order = await self.uow.order.update(order.id, {"orderId_close": ord["result"]["orderId"]})
             await self.uow.commit()
@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app import entity
+from app.logger import logger
+from app.repository import ReadOnlyUnitOfWork, report_session_maker
+
+# Drawdown histogram over [0, 1] and log growth histogram over [-GROWTH_RANGE, GROWTH_RANGE]:
+# fixed bins are what lets chunks from different processes be merged exactly.
+DD_BINS = 1000
+GROWTH_BINS = 4000
+GROWTH_RANGE = 20.0
+
+
+def simulate_chunk(
+        returns: np.ndarray,
+        horizon: int,
+        paths: int,
+        fractions: np.ndarray,
+        ruin: float,
+        seed: np.random.SeedSequence,
+        block: int = 2048,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bootstrapped equity paths for one worker.
+
+    Every path draws `horizon` trades with replacement; at fraction f a trade with return r
+    on margin multiplies equity by 1 + f * r. All fractions walk the same draws, trade by
+    trade over (fractions, block) arrays that stay in cache. Returns per fraction: drawdown
+    and log growth histograms and the number of paths that touched `ruin` of the start.
+    """
+    rng = np.random.default_rng(seed)
+    # log(1 + f * r) per fraction and trade, paths gather from it instead of recomputing logs
+    # Потеря больше маржи невозможна, ниже -100% режем
+    table = np.log1p(np.maximum(fractions[:, None] * returns[None, :], -1 + 1e-12))
+    dd_hist = np.zeros((len(fractions), DD_BINS), dtype=np.int64)
+    growth_hist = np.zeros((len(fractions), GROWTH_BINS), dtype=np.int64)
+    ruined = np.zeros(len(fractions), dtype=np.int64)
+    log_ruin = np.log(ruin)
+    offsets = np.arange(len(fractions))[:, None]
+    for done in range(0, paths, block):
+        size = min(block, paths - done)
+        index = rng.integers(0, len(returns), size=(horizon, size), dtype=np.int32)
+        shape = (len(fractions), size)
+        equity, peak, worst, low = np.zeros(shape), np.zeros(shape), np.zeros(shape), np.zeros(shape)
+        step = np.empty(shape)
+        for trade in index:
+            np.take(table, trade, axis=1, out=step)
+            equity += step
+            np.maximum(peak, equity, out=peak)
+            np.subtract(equity, peak, out=step)
+            np.minimum(worst, step, out=worst)
+            np.minimum(low, equity, out=low)
+        ruined += (low <= log_ruin).sum(axis=1)
+        bins = np.minimum((1 - np.exp(worst)) * DD_BINS, DD_BINS - 1).astype(np.int64)
+        dd_hist += np.bincount((bins + offsets * DD_BINS).ravel(), minlength=dd_hist.size).reshape(dd_hist.shape)
+        growth = np.clip(equity, -GROWTH_RANGE, GROWTH_RANGE - 1e-9)
+        bins = ((growth + GROWTH_RANGE) * (GROWTH_BINS / (2 * GROWTH_RANGE))).astype(np.int64)
+        growth_hist += np.bincount(
+            (bins + offsets * GROWTH_BINS).ravel(), minlength=growth_hist.size
+        ).reshape(growth_hist.shape)
+    return dd_hist, growth_hist, ruined
+
+
+def hist_quantile(hist: np.ndarray, q: float, low: float, high: float) -> float:
+    cumulative = np.cumsum(hist)
+    index = int(np.searchsorted(cumulative, q * cumulative[-1]))
+    width = (high - low) / len(hist)
+    return low + (index + 0.5) * width
+
+
+def growth_optimal(returns: np.ndarray, tolerance: float = 1e-6) -> float | None:
+    """Fraction with the highest mean log growth per trade on the empirical returns (Kelly).
+
+    Solved directly: the growth derivative mean(r / (1 + f * r)) falls with f, bisection finds
+    its zero below the fraction at which the worst trade would wipe out the account. None when
+    no fraction grows (mean return <= 0), inf when no trade ever lost.
+    """
+    if not len(returns) or returns.mean() <= 0:
+        return None
+    worst = returns.min()
+    if worst >= 0:
+        return float("inf")
+    low, high = 0.0, -1 / worst
+    while high - low > tolerance:
+        middle = (low + high) / 2
+        if (returns / (1 + middle * returns)).mean() > 0:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+class RiskSimulator:
+    """Monte Carlo bootstrap of per-trade returns across a process pool.
+
+    Returns are pnl over margin (spent / leverage) per closed order, the fraction is
+    the share of equity put up as margin for one trade.
+    """
+
+    def __init__(
+            self,
+            returns: np.ndarray,
+            horizon: int | None = None,
+            paths: int = 100_000,
+            fractions: np.ndarray | None = None,
+            ruin: float = 0.5,
+            workers: int | None = None,
+            chunk: int = 20_000,
+            seed: int | None = None,
+    ):
+        self.returns = np.asarray(returns, dtype=float)
+        self.horizon = horizon or len(self.returns)
+        self.paths = paths
+        self.fractions = np.asarray(fractions if fractions is not None else np.linspace(0.025, 0.5, 20), dtype=float)
+        self.ruin = ruin
+        self.workers = workers or os.cpu_count()
+        self.chunk = chunk
+        self.seed = seed
+
+    def run(self, current_fraction: float | None = None) -> entity.RiskSimulation:
+        """Simulates the grid plus the current and the growth optimal fraction (when at most 1)."""
+        optimal = growth_optimal(self.returns)
+        extra = [fraction for fraction in (current_fraction, optimal) if fraction is not None and 0 < fraction <= 1]
+        fractions = np.unique(np.r_[self.fractions, extra])
+        sizes = [self.chunk] * (self.paths // self.chunk)
+        if self.paths % self.chunk:
+            sizes.append(self.paths % self.chunk)
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+        dd_hist = np.zeros((len(fractions), DD_BINS), dtype=np.int64)
+        growth_hist = np.zeros((len(fractions), GROWTH_BINS), dtype=np.int64)
+        ruined = np.zeros(len(fractions), dtype=np.int64)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(simulate_chunk, self.returns, self.horizon, size, fractions, self.ruin, seed)
+                for size, seed in zip(sizes, seeds)
+            ]
+            for future in futures:
+                dd, growth, ruin = future.result()
+                dd_hist += dd
+                growth_hist += growth
+                ruined += ruin
+
+        results = []
+        for i, fraction in enumerate(fractions):
+            results.append(entity.RiskFraction(
+                fraction=float(fraction),
+                risk_of_ruin=float(ruined[i] / self.paths),
+                drawdown_p50=hist_quantile(dd_hist[i], 0.5, 0, 1),
+                drawdown_p95=hist_quantile(dd_hist[i], 0.95, 0, 1),
+                drawdown_p99=hist_quantile(dd_hist[i], 0.99, 0, 1),
+                growth_p05=float(np.exp(hist_quantile(growth_hist[i], 0.05, -GROWTH_RANGE, GROWTH_RANGE))),
+                growth_p50=float(np.exp(hist_quantile(growth_hist[i], 0.5, -GROWTH_RANGE, GROWTH_RANGE))),
+            ))
+        return entity.RiskSimulation(
+            trades=len(self.returns),
+            paths=self.paths,
+            horizon=self.horizon,
+            current_fraction=current_fraction,
+            optimal_fraction=optimal,
+            fractions=results,
+        )
+
+
+async def load_returns(
+        uow: ReadOnlyUnitOfWork, date_from: datetime.datetime | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """Per-trade return on margin of closed orders (received - spent as in get_trade_result) and the margin."""
+    async with uow:
+        trades = await uow.order.get_closed_trades(date_from)
+    pnl = np.array(trades.get("pnl", []), dtype=float)
+    margin = np.array(trades.get("spent", []), dtype=float) / np.array(trades.get("leverage", []), dtype=float)
+    ok = np.isfinite(pnl) & (margin > 0)
+    return pnl[ok] / margin[ok], margin[ok]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Monte Carlo drawdown and ruin simulation over closed trades")
+    parser.add_argument("--paths", type=int, default=100_000)
+    parser.add_argument("--horizon", type=int, default=None, help="trades per path, all closed trades by default")
+    parser.add_argument("--ruin", type=float, default=0.5, help="equity share counted as ruin")
+    parser.add_argument("--equity", type=float, default=None, help="account equity, adds the current fraction")
+    parser.add_argument(
+        "--margin", type=float, default=None,
+        help="margin per trade for the current fraction, median of the closed trades by default",
+    )
+    parser.add_argument("--date-from", type=datetime.datetime.fromisoformat, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    returns, margins = asyncio.run(load_returns(ReadOnlyUnitOfWork(report_session_maker), args.date_from))
+    if not len(returns):
+        logger.warning("No closed trades to simulate")
+        return
+    simulator = RiskSimulator(
+        returns, horizon=args.horizon, paths=args.paths, ruin=args.ruin, workers=args.workers, seed=args.seed
+    )
+    # Per-trade margin as RiskEngine.margin_for sized it, not the cap
+    margin = args.margin if args.margin is not None else float(np.median(margins))
+    current = margin / args.equity if args.equity else None
+    started = time.perf_counter()
+    result = simulator.run(current)
+    logger.info("{}", result.model_dump_json(indent=2))
+    if result.optimal_fraction is not None and result.optimal_fraction > simulator.fractions[-1]:
+        logger.warning(
+            "Growth optimal fraction {:.3f} is above the simulated grid (up to {:.3f})",
+            result.optimal_fraction, simulator.fractions[-1],
+        )
+    logger.info("{} paths x {} trades in {:.2f}s", result.paths, result.horizon, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
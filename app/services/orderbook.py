@@ -0,0 +1,190 @@
+import threading
+import time
+import traceback
+from array import array
+from bisect import bisect_left
+from typing import Any
+
+from pybit.unified_trading import WebSocket
+
+from app.entity.enums import OrderType
+from app.logger import logger
+
+
+class BookSide:
+    """Price levels of one side in two parallel double arrays sorted by key, best level last.
+
+    Bids are keyed by price and asks by -price, so the top of both sides sits at the end
+    of the arrays where most updates land and inserts move the fewest items.
+    """
+
+    __slots__ = ("sign", "keys", "sizes")
+
+    def __init__(self, bid: bool):
+        self.sign = 1.0 if bid else -1.0
+        self.keys = array("d")
+        self.sizes = array("d")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def clear(self) -> None:
+        self.keys = array("d")
+        self.sizes = array("d")
+
+    def set(self, price: float, size: float) -> None:
+        """Sets the level size, size 0 removes the level."""
+        key = price * self.sign
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            if size:
+                self.sizes[i] = size
+            else:
+                del self.keys[i]
+                del self.sizes[i]
+        elif size:
+            self.keys.insert(i, key)
+            self.sizes.insert(i, size)
+
+    def best(self) -> tuple[float, float] | None:
+        if not self.keys:
+            return None
+        return self.keys[-1] * self.sign, self.sizes[-1]
+
+    def levels(self, depth: int) -> list[tuple[float, float]]:
+        n = len(self.keys)
+        return [(self.keys[i] * self.sign, self.sizes[i]) for i in range(n - 1, max(n - depth, 0) - 1, -1)]
+
+    def volume(self, depth: int) -> float:
+        return sum(self.sizes[-depth:]) if depth else 0.0
+
+
+class OrderBook:
+    """L2 book of one symbol built from Bybit orderbook snapshot and delta messages.
+
+    Updates come from the websocket thread, readers take the same lock.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = BookSide(bid=True)
+        self.asks = BookSide(bid=False)
+        self.update_id: int | None = None
+        self.updated_at: float | None = None
+        self.lock = threading.Lock()
+
+    def apply_snapshot(self, data: dict[str, Any]) -> None:
+        with self.lock:
+            self.bids.clear()
+            self.asks.clear()
+            self._apply(data)
+
+    def apply_delta(self, data: dict[str, Any]) -> None:
+        with self.lock:
+            if self.update_id is None:
+                # Дельта до снапшота не к чему применять
+                return
+            self._apply(data)
+
+    def _apply(self, data: dict[str, Any]) -> None:
+        for price, size in data.get("b", ()):
+            self.bids.set(float(price), float(size))
+        for price, size in data.get("a", ()):
+            self.asks.set(float(price), float(size))
+        self.update_id = data.get("u", self.update_id)
+        self.updated_at = time.monotonic()
+
+    def on_message(self, message: dict[str, Any]) -> None:
+        data = message["data"]
+        # u == 1 is a snapshot sent after a service restart on the exchange side
+        if message.get("type") == "snapshot" or data.get("u") == 1:
+            self.apply_snapshot(data)
+        else:
+            self.apply_delta(data)
+
+    def stale(self, max_age: float) -> bool:
+        return self.updated_at is None or time.monotonic() - self.updated_at > max_age
+
+    def top(self) -> tuple[tuple[float, float] | None, tuple[float, float] | None]:
+        with self.lock:
+            return self.bids.best(), self.asks.best()
+
+    @property
+    def mid(self) -> float | None:
+        bid, ask = self.top()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    @property
+    def spread(self) -> float | None:
+        bid, ask = self.top()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def imbalance(self, depth: int = 5) -> float | None:
+        """(bid volume - ask volume) / total over the top `depth` levels, in [-1, 1]."""
+        with self.lock:
+            bid, ask = self.bids.volume(depth), self.asks.volume(depth)
+        total = bid + ask
+        if not total:
+            return None
+        return (bid - ask) / total
+
+    @property
+    def microprice(self) -> float | None:
+        """Mid weighted by the opposite top sizes, leans to the side about to be taken out."""
+        bid, ask = self.top()
+        if bid is None or ask is None or not bid[1] + ask[1]:
+            return None
+        return (bid[0] * ask[1] + ask[0] * bid[1]) / (bid[1] + ask[1])
+
+    def features(self, depth: int = 5) -> dict[str, float | None]:
+        bid, ask = self.top()
+        return {
+            "best_bid": bid[0] if bid else None,
+            "best_ask": ask[0] if ask else None,
+            "spread": self.spread,
+            "imbalance": self.imbalance(depth),
+            "microprice": self.microprice,
+        }
+
+    def limit_price(self, order_type: OrderType, tick: float) -> float | None:
+        """Passive entry price: join our side of the book, one tick inside when the
+        microprice leans towards us and the spread leaves room."""
+        bid, ask = self.top()
+        if bid is None or ask is None:
+            return None
+        microprice = self.microprice
+        mid = (bid[0] + ask[0]) / 2
+        room = ask[0] - bid[0] > tick * 1.5
+        if order_type == OrderType.long:
+            return bid[0] + tick if room and microprice is not None and microprice > mid else bid[0]
+        return ask[0] - tick if room and microprice is not None and microprice < mid else ask[0]
+
+
+class OrderBookFeed:
+    """Keeps an OrderBook current from the pybit public websocket."""
+
+    def __init__(self, book: OrderBook, depth: int = 50, testnet: bool = True, category: str = "linear"):
+        self.book = book
+        self.depth = depth
+        self.testnet = testnet
+        self.category = category
+        self.ws: WebSocket | None = None
+
+    def start(self) -> None:
+        self.ws = WebSocket(testnet=self.testnet, channel_type=self.category)
+        self.ws.orderbook_stream(depth=self.depth, symbol=self.book.symbol, callback=self._on_message)
+
+    def _on_message(self, message: dict[str, Any]) -> None:
+        try:
+            self.book.on_message(message)
+        except Exception as e:
+            logger.error(f"{e=}\n{traceback.format_exc()}")
+
+    def stop(self) -> None:
+        if self.ws is not None:
+            self.ws.exit()
+            self.ws = None
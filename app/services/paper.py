@@ -0,0 +1,206 @@
+import itertools
+import random
+import time
+
+
+def response(result: dict) -> dict:
+    return {"retCode": 0, "retMsg": "OK", "result": result}
+
+
+class PaperExchange:
+    """The part of pybit's HTTP client BybitAPI uses, answering in Bybit's v5 payload format.
+
+    Limit entries fill when the price reaches them or with `fill_probability` per tick,
+    TP/SL legs trigger at their price, a filled SL, TP2 or market close flattens the
+    position and deactivates the rest of its legs. `latency` (seconds) blocks every call
+    like a REST round trip does.
+
+    `market` supplies `price`, `mark_price`, `tick`, 1m `klines` as Bybit rows and
+    `now_ms()`, all order times are taken from its clock.
+    """
+
+    def __init__(
+            self, symbol: str, market, fill_probability: float = 0, open_orders: int = 0, latency: float = 0,
+            seed: int = 0,
+    ):
+        self.symbol = symbol
+        self.market = market
+        self.fill_probability = fill_probability
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.ids = itertools.count(1)
+        self.orders: dict[str, dict] = {}
+        self.positions = {1: 0.0, 2: 0.0}
+        self.balance = 10_000.0
+        self.calls = 0
+        # Чужие заявки далеко от рынка, только раздувают ответы
+        self.foreign = []
+        if open_orders:
+            created = str(self.market.now_ms())
+            self.foreign = [
+                self._order("New", price=market.price * 0.5, qty=0.001, created=created) for _ in range(open_orders)
+            ]
+
+    def _call(self) -> None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _order(self, status: str, price: float | None = None, trigger: float | None = None, qty: float = 0,
+               side: str = "Buy", idx: int = 1, stop_type: str = "", created: str | None = None) -> dict:
+        order_id = f"{self.symbol}-{next(self.ids)}"
+        created = created or str(self.market.now_ms())
+        return {
+            "orderId": order_id,
+            "symbol": self.symbol,
+            "side": side,
+            "positionIdx": idx,
+            "price": "" if price is None else str(price),
+            "avgPrice": "",
+            "triggerPrice": "" if trigger is None else str(trigger),
+            "qty": str(qty),
+            "orderStatus": status,
+            "stopOrderType": stop_type,
+            "createType": "CreateByUser" if not stop_type else "CreateByStopOrder",
+            "lastPriceOnCreated": str(self.market.price),
+            "createdTime": created,
+            "updatedTime": created,
+        }
+
+    def _fill(self, order: dict, price: float) -> None:
+        order["orderStatus"] = "Filled"
+        order["avgPrice"] = str(price)
+        order["updatedTime"] = str(self.market.now_ms())
+        idx = order["positionIdx"]
+        qty = float(order["qty"])
+        if order["stopOrderType"] or order.get("reduceOnly"):
+            closed = self.positions[idx] if order.get("reduceOnly") or order["stopOrderType"] == "StopLoss" else qty
+            self.positions[idx] = max(self.positions[idx] - closed, 0.0)
+            if not self.positions[idx]:
+                self._deactivate(idx)
+        else:
+            self.positions[idx] += qty
+
+    def _deactivate(self, idx: int) -> None:
+        for order in self.orders.values():
+            if order["positionIdx"] == idx and order["orderStatus"] == "Untriggered":
+                order["orderStatus"] = "Deactivated"
+                order["updatedTime"] = str(self.market.now_ms())
+
+    def step(self) -> None:
+        self.match(self.market.step())
+
+    def match(self, price: float) -> None:
+        """Fills resting orders against `price`."""
+        for order in list(self.orders.values()):
+            status = order["orderStatus"]
+            long = order["positionIdx"] == 1
+            if status == "New":
+                limit = float(order["price"])
+                if (price <= limit if long else price >= limit) or self.rng.random() < self.fill_probability:
+                    self._fill(order, limit)
+            elif status == "Untriggered":
+                trigger = float(order["triggerPrice"])
+                take_profit = order["stopOrderType"] == "PartialTakeProfit"
+                if (price >= trigger) == (long == take_profit):
+                    self._fill(order, trigger)
+        if len(self.orders) > 500:
+            finished = [key for key, order in self.orders.items() if order["orderStatus"] not in ("New", "Untriggered")]
+            for key in finished[:-200]:
+                del self.orders[key]
+
+    # pybit HTTP surface
+
+    def get_instruments_info(self, **kwargs) -> dict:
+        self._call()
+        return response({"list": [{
+            "symbol": self.symbol,
+            "priceFilter": {"tickSize": str(self.market.tick)},
+            "lotSizeFilter": {"qtyStep": "0.001", "minOrderQty": "0.001", "maxOrderQty": "100"},
+            "leverageFilter": {"minLeverage": "1", "maxLeverage": "100", "leverageStep": "0.01"},
+        }], "nextPageCursor": ""})
+
+    def get_tickers(self, **kwargs) -> dict:
+        self._call()
+        return response({"list": [{
+            "symbol": self.symbol, "lastPrice": str(self.market.price), "markPrice": str(self.market.mark_price),
+        }]})
+
+    def get_kline(self, start: int | None = None, end: int | None = None, limit: int = 1000, **kwargs) -> dict:
+        self._call()
+        klines = [
+            kline for kline in self.market.klines
+            if (start is None or kline[0] >= start) and (end is None or kline[0] <= end)
+        ][-limit:]
+        return response({"list": [[str(int(kline[0]))] + [str(value) for value in kline[1:]] for kline in klines[::-1]]})
+
+    def get_wallet_balance(self, **kwargs) -> dict:
+        self._call()
+        return response({"list": [{"coin": [{"coin": "USDT", "walletBalance": str(self.balance)}]}]})
+
+    def get_positions(self, **kwargs) -> dict:
+        self._call()
+        price = str(self.market.price)
+        return response({"list": [
+            {"positionIdx": idx, "side": "Buy" if idx == 1 else "Sell", "size": str(size),
+             "avgPrice": price, "markPrice": price, "unrealisedPnl": "0"}
+            for idx, size in self.positions.items()
+        ]})
+
+    def set_leverage(self, **kwargs) -> dict:
+        self._call()
+        return response({})
+
+    def place_order(self, side: str, orderType: str, qty: str, positionIdx: int, price: str | None = None,
+                    reduceOnly: bool = False, **kwargs) -> dict:
+        self._call()
+        order = self._order("New", price=float(price) if price else None, qty=float(qty), side=side, idx=positionIdx)
+        order["orderType"] = orderType
+        self.orders[order["orderId"]] = order
+        if orderType == "Market":
+            order["reduceOnly"] = reduceOnly
+            order["qty"] = str(self.positions[positionIdx]) if reduceOnly else qty
+            self._fill(order, self.market.price)
+        return response({"orderId": order["orderId"]})
+
+    def set_trading_stop(self, positionIdx: int, takeProfit: str | None = None, tpSize: str | None = None,
+                         stopLoss: str | None = None, slSize: str | None = None, **kwargs) -> dict:
+        self._call()
+        side = "Sell" if positionIdx == 1 else "Buy"
+        if takeProfit is not None:
+            order = self._order("Untriggered", trigger=float(takeProfit), qty=float(tpSize), side=side,
+                                idx=positionIdx, stop_type="PartialTakeProfit")
+        else:
+            order = self._order("Untriggered", trigger=float(stopLoss), qty=float(slSize), side=side,
+                                idx=positionIdx, stop_type="StopLoss")
+        self.orders[order["orderId"]] = order
+        return response({})
+
+    def cancel_order(self, orderId: str, **kwargs) -> dict:
+        self._call()
+        order = self.orders.get(orderId)
+        if order and order["orderStatus"] in ("New", "Untriggered"):
+            order["orderStatus"] = "Cancelled"
+            order["updatedTime"] = str(self.market.now_ms())
+        return response({"orderId": orderId})
+
+    def amend_order(self, orderId: str, price: str | None = None, triggerPrice: str | None = None, **kwargs) -> dict:
+        self._call()
+        order = self.orders.get(orderId)
+        if order:
+            if price is not None:
+                order["price"] = price
+            if triggerPrice is not None:
+                order["triggerPrice"] = triggerPrice
+            order["updatedTime"] = str(self.market.now_ms())
+        return response({"orderId": orderId})
+
+    def get_open_orders(self, **kwargs) -> dict:
+        self._call()
+        own = [order for order in self.orders.values() if order["orderStatus"] in ("New", "Untriggered")]
+        return response({"list": own + self.foreign, "nextPageCursor": ""})
+
+    def get_order_history(self, limit: int = 50, **kwargs) -> dict:
+        self._call()
+        orders = sorted(self.orders.values(), key=lambda order: order["updatedTime"], reverse=True)[:limit]
+        return response({"list": orders, "nextPageCursor": ""})
@@ -0,0 +1,221 @@
+import asyncio
+import datetime
+import gzip
+import json
+import os
+import traceback
+from pathlib import Path
+
+from sqlalchemy.exc import DBAPIError
+
+from app import models
+from app.config import config
+from app.logger import logger
+from app.repository import SAUnitOfWork, writer_session_maker
+from app.repository.repositories import month_start, next_month, partition_name
+from app.utils.datetime import utc_now
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Postgres lock_not_available, raised when lock_timeout runs out
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def fsync_path(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def arrow_schema(model: type[models.Base]) -> "pa.Schema":
+    """Column types from the model, so batches with all-NULL columns still match the first one."""
+    types = {int: pa.int64(), float: pa.float64(), bool: pa.bool_(), datetime.datetime: pa.timestamp("us")}
+    fields = []
+    for column in model.__table__.columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = str
+        fields.append(pa.field(column.name, types.get(python_type, pa.string())))
+    return pa.schema(fields)
+
+
+class ArchiveWriter:
+    """Parquet (zstd) when pyarrow is installed, gzipped JSON lines otherwise.
+
+    Batches are written to a temporary file as they arrive. `commit` fsyncs it, moves it in
+    place and fsyncs the directory, only then the rows may be deleted from the database.
+    """
+
+    def __init__(self, path: Path, model: type[models.Base] = models.Order):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path.with_suffix(".parquet" if pa is not None else ".jsonl.gz")
+        self.tmp = self.path.with_name(f"{self.path.name}.tmp")
+        self.rows = 0
+        if pa is not None:
+            self.schema = arrow_schema(model)
+            self.file = pq.ParquetWriter(self.tmp, self.schema, compression="zstd")
+        else:
+            self.file = gzip.open(self.tmp, "wt")
+
+    def write(self, batch: list[dict]) -> None:
+        if pa is not None:
+            self.file.write_table(pa.Table.from_pylist(batch, schema=self.schema))
+        else:
+            for row in batch:
+                self.file.write(json.dumps(row, default=str))
+                self.file.write("\n")
+        self.rows += len(batch)
+
+    def commit(self) -> Path:
+        self.file.close()
+        fsync_path(self.tmp)
+        os.replace(self.tmp, self.path)
+        if os.name != "nt":
+            fsync_path(self.path.parent)
+        return self.path
+
+    def abort(self) -> None:
+        self.file.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+class PartitionManager:
+    """Keeps monthly orders partitions ahead of time and archives closed months past retention.
+
+    A month is archived only when it has no open orders; its rows are streamed to a file in
+    `archive_dir` and the partition is detached and dropped in a short transaction of its own
+    once the file is on disk. DDL gives up after `lock_timeout_ms` rather than hold up the
+    trading queries on the orders table, a failed month is retried on the next run. The detach
+    locks the whole orders table, it waits `drop_lock_timeout_ms` per attempt, `drop_attempts` times.
+    """
+
+    def __init__(
+            self,
+            uow: SAUnitOfWork,
+            archive_dir: str | Path = "archive",
+            retention_months: int | None = None,
+            months_ahead: int = 2,
+            lock_timeout_ms: int = 5000,
+            drop_lock_timeout_ms: int = 200,
+            drop_attempts: int = 5,
+    ):
+        self.uow = uow
+        self.archive_dir = Path(archive_dir)
+        self.retention_months = retention_months
+        self.months_ahead = months_ahead
+        self.lock_timeout_ms = lock_timeout_ms
+        self.drop_lock_timeout_ms = drop_lock_timeout_ms
+        self.drop_attempts = drop_attempts
+
+    async def ensure_partitions(self, now: datetime.datetime | None = None) -> list[str]:
+        month = month_start(now or utc_now())
+        async with self.uow:
+            existing = {name for name, _ in await self.uow.order.partitions()}
+        created = []
+        for _ in range(self.months_ahead + 1):
+            if partition_name(month) not in existing:
+                try:
+                    async with self.uow:
+                        await self.uow.order.set_lock_timeout(self.lock_timeout_ms)
+                        name, moved = await self.uow.order.create_partition(month)
+                        await self.uow.commit()
+                except Exception as e:
+                    logger.error(f"{e=}\n{traceback.format_exc()}")
+                else:
+                    created.append(name)
+                    if moved:
+                        logger.warning("{} orders moved from the default partition to {}", moved, name)
+            month = next_month(month)
+        if created:
+            logger.info("Orders partitions created: {}", created)
+        return created
+
+    def cutoff(self, now: datetime.datetime) -> datetime.date | None:
+        """First month that is kept, older months are archived."""
+        if self.retention_months is None:
+            return None
+        index = now.year * 12 + now.month - 1 - self.retention_months
+        return datetime.date(index // 12, index % 12 + 1, 1)
+
+    async def archive(self, now: datetime.datetime | None = None) -> list[Path]:
+        cutoff = self.cutoff(now or utc_now())
+        if cutoff is None:
+            return []
+        paths = []
+        async with self.uow:
+            partitions = await self.uow.order.partitions()
+        for name, month in partitions:
+            if month >= cutoff:
+                break
+            try:
+                path = await self.archive_partition(name, month)
+            except Exception as e:
+                logger.error(f"{e=}\n{traceback.format_exc()}")
+                continue
+            if path is not None:
+                paths.append(path)
+        return paths
+
+    async def archive_partition(self, name: str, month: datetime.date) -> Path | None:
+        async with self.uow:
+            if await self.uow.order.has_open_orders(month):
+                logger.warning("Orders partition {} still has open orders, not archived", name)
+                return None
+            writer = await asyncio.to_thread(ArchiveWriter, self.archive_dir / name)
+            try:
+                async for batch in self.uow.order.stream_partition(name):
+                    await asyncio.to_thread(writer.write, batch)
+                path = await asyncio.to_thread(writer.commit)
+            except BaseException:
+                await asyncio.to_thread(writer.abort)
+                raise
+        for attempt in range(1, self.drop_attempts + 1):
+            try:
+                async with self.uow:
+                    await self.uow.order.set_lock_timeout(self.drop_lock_timeout_ms)
+                    rows = await self.uow.order.count_partition(name)
+                    if rows != writer.rows:
+                        # Строки появились после выгрузки, месяц останется до следующего прогона
+                        logger.warning(
+                            "Orders partition {} has {} rows, {} archived, not dropped", name, rows, writer.rows
+                        )
+                        return None
+                    await self.uow.order.drop_partition(name)
+                    await self.uow.commit()
+            except DBAPIError as e:
+                if getattr(e.orig, "pgcode", None) != LOCK_NOT_AVAILABLE or attempt == self.drop_attempts:
+                    raise
+                logger.warning(
+                    "Orders partition {} is locked, drop attempt {} of {}", name, attempt, self.drop_attempts
+                )
+                await asyncio.sleep(attempt)
+            else:
+                break
+        logger.info("Orders partition {} archived to {}, {} rows", name, path, writer.rows)
+        return path
+
+    async def maintain(self, now: datetime.datetime | None = None) -> None:
+        await self.ensure_partitions(now)
+        await self.archive(now)
+
+
+async def main() -> None:
+    manager = PartitionManager(
+        SAUnitOfWork(writer_session_maker),
+        archive_dir=config.ORDERS_ARCHIVE_DIR,
+        retention_months=config.ORDERS_RETENTION_MONTHS,
+        lock_timeout_ms=config.PARTITION_LOCK_TIMEOUT_MS,
+        drop_lock_timeout_ms=config.PARTITION_DROP_LOCK_TIMEOUT_MS,
+    )
+    await manager.maintain()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
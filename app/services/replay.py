@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import datetime
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+
+from app import entity
+from app.config import config
+from app.logger import logger
+from app.repository.memory import MemoryUnitOfWork
+from app.services.api import BybitAPI
+from app.services.manager import Manager
+from app.services.paper import PaperExchange
+from app.services.tape import KLINE, TICKER, read_tape
+from app.services.timeframes import MINUTE_MS, to_ms
+
+
+class TapeMarket:
+    """Market state of a tape for PaperExchange: the last ticker and its time, 1m klines.
+
+    Recorded KLINE events seed the klines, tickers between them extend the current minute
+    like the exchange would, without volume.
+    """
+
+    def __init__(self, tick: float = 0.1):
+        self.tick = tick
+        self.price: float | None = None
+        self.mark_price: float | None = None
+        self.now: datetime.datetime | None = None
+        self.klines: list[list[float]] = []
+
+    def now_ms(self) -> int:
+        return to_ms(self.now)
+
+    def on_kline(self, kline: entity.Kline) -> None:
+        row = [
+            to_ms(kline.start),
+            kline.open, kline.high, kline.low, kline.close, kline.volume, kline.turnover,
+        ]
+        if self.klines and self.klines[-1][0] == row[0]:
+            self.klines[-1] = row
+        elif not self.klines or self.klines[-1][0] < row[0]:
+            self.klines.append(row)
+
+    def on_ticker(self, now: datetime.datetime, ticker: entity.Ticker) -> None:
+        self.now = now
+        self.price = ticker.close
+        self.mark_price = ticker.mark_price
+        minute = to_ms(now) // MINUTE_MS * MINUTE_MS
+        if self.klines and self.klines[-1][0] == minute:
+            last = self.klines[-1]
+            last[2] = max(last[2], self.price)
+            last[3] = min(last[3], self.price)
+            last[4] = self.price
+        elif not self.klines or self.klines[-1][0] < minute:
+            self.klines.append([minute, self.price, self.price, self.price, self.price, 0.0, 0.0])
+            del self.klines[:-2000]
+
+
+class TapeExchange(PaperExchange):
+    """PaperExchange that reports every order sent to it and every fill as a replay decision."""
+
+    def __init__(self, symbol: str, market: TapeMarket, decide: Callable[[str, float], None]):
+        super().__init__(symbol, market)
+        self.decide = decide
+
+    def _fill(self, order: dict, price: float) -> None:
+        super()._fill(order, price)
+        kind = order["stopOrderType"] or ("close" if order.get("reduceOnly") else "entry")
+        self.decide(f"{kind} filled", price)
+
+    def place_order(self, side: str, orderType: str, qty: str, positionIdx: int, price: str | None = None,
+                    reduceOnly: bool = False, **kwargs) -> dict:
+        self.decide("close" if reduceOnly else "open", float(price) if price else self.market.price)
+        return super().place_order(side, orderType, qty, positionIdx, price, reduceOnly, **kwargs)
+
+    def set_trading_stop(self, positionIdx: int, takeProfit: str | None = None, tpSize: str | None = None,
+                         stopLoss: str | None = None, slSize: str | None = None, **kwargs) -> dict:
+        if takeProfit is not None:
+            self.decide("tp", float(takeProfit))
+        else:
+            self.decide("sl", float(stopLoss))
+        return super().set_trading_stop(positionIdx, takeProfit, tpSize, stopLoss, slSize, **kwargs)
+
+    def amend_order(self, orderId: str, price: str | None = None, triggerPrice: str | None = None, **kwargs) -> dict:
+        self.decide("amend", float(price if price is not None else triggerPrice))
+        return super().amend_order(orderId, price, triggerPrice, **kwargs)
+
+    def cancel_order(self, orderId: str, **kwargs) -> dict:
+        self.decide("cancel", self.market.price)
+        return super().cancel_order(orderId, **kwargs)
+
+
+class TapeReplay:
+    """Replays tapes through the live `Manager.tick` against a TapeExchange behind BybitAPI.
+
+    Klines recorded before the first ticker are the Manager's startup history; every ticker
+    moves the paper market, fills the resting orders it crosses and runs one tick on the
+    tape's clock. Orders are kept in memory. Recorded ORDER events are skipped, fills are
+    simulated from the recorded prices. Throttles (risk refresh, trailing interval) stay on
+    wall time, so a replay faster than live relaxes them.
+
+    The Manager reads config when it is built: snapshot, tape, order book and shadow writes
+    should be off (`main` does it).
+    """
+
+    def __init__(self, symbol: str = "BTCUSDT", tick: float = 0.1):
+        self.symbol = symbol
+        self.market = TapeMarket(tick)
+        self.exchange = TapeExchange(symbol, self.market, self._decide)
+        self.decisions: list[entity.ReplayDecision] = []
+        self.manager: Manager | None = None
+
+    def _decide(self, action: str, price: float) -> None:
+        direction = self.manager.last_direction if self.manager else None
+        self.decisions.append(
+            entity.ReplayDecision(time=self.market.now, action=action, price=price, direction=direction)
+        )
+
+    def _start(self) -> Manager:
+        api = BybitAPI()
+        api.cli = self.exchange
+        api.client_factory = lambda: self.exchange
+        api.pair = self.symbol
+        manager = Manager(MemoryUnitOfWork(), api)
+        manager.clock = lambda: self.market.now
+        return manager
+
+    async def on_ticker(self, now: datetime.datetime, ticker: entity.Ticker) -> None:
+        self.market.on_ticker(now, ticker)
+        if self.manager is None:
+            self.manager = self._start()
+        self.exchange.match(ticker.close)
+        await self.manager.tick()
+
+    async def run(self, paths: Iterable[str | Path]) -> list[entity.ReplayDecision]:
+        for path in sorted(Path(path) for path in paths):
+            for record_type, now, event in read_tape(path):
+                if record_type == TICKER:
+                    await self.on_ticker(now, event)
+                elif record_type == KLINE:
+                    self.market.on_kline(event)
+        return self.decisions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay market data tapes through the decision loop")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--tick", type=float, default=0.1, help="price tick size of the symbol")
+    args = parser.parse_args()
+    # Только цикл решений: без снапшотов, записи ленты, стакана и теневых вариантов
+    config.SNAPSHOT_PATH = None
+    config.TAPE_DIR = None
+    config.ORDERBOOK_DEPTH = 0
+    config.SHADOW_ENABLED = False
+    started = time.perf_counter()
+    replay = TapeReplay(args.symbol, args.tick)
+    decisions = asyncio.run(replay.run(args.paths))
+    for decision in decisions:
+        logger.info(
+            "{} {} price={} direction={}", decision.time, decision.action, decision.price, decision.direction
+        )
+    logger.info("Replayed {} decisions in {:.2f}s", len(decisions), time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
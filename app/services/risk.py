@@ -0,0 +1,106 @@
+import time
+import traceback
+
+from app import entity
+from app.entity.enums import OrderType
+from app.logger import log_sampled, logger
+from app.services.api import BybitAPI
+
+
+class RiskEngine:
+    """Wallet balance and positions kept in memory for sizing and pre-trade checks.
+
+    State is changed by fills between REST refreshes, refresh() only hits the exchange
+    once per `refresh_interval` or after invalidate(); a failed refresh is retried on the
+    next call. Entries are blocked until the wallet balance has been read once.
+    """
+
+    def __init__(
+            self,
+            api: BybitAPI,
+            refresh_interval: float = 30,
+            risk_per_trade: float = 0.01,
+            max_exposure: float = 3.0,
+            max_margin: float = 20,
+    ):
+        self.api = api
+        self.refresh_interval = refresh_interval
+        self.risk_per_trade = risk_per_trade
+        self.max_exposure = max_exposure
+        self.max_margin = max_margin
+        self.balance: float | None = None
+        self.positions: dict[int, entity.Position] = {}
+        self.refreshed_at: float | None = None
+
+    def invalidate(self) -> None:
+        self.refreshed_at = None
+
+    def refresh(self) -> None:
+        if self.refreshed_at is not None and time.monotonic() - self.refreshed_at < self.refresh_interval:
+            return
+        try:
+            balance = self.api.get_usdt_wallet_balance()
+            positions = {position.position_idx: position for position in self.api.get_positions()}
+        except Exception as e:
+            log_sampled("risk_refresh", f"{e=}\n{traceback.format_exc()}", level="ERROR")
+            return
+        self.balance = balance
+        self.positions = positions
+        self.refreshed_at = time.monotonic()
+
+    def mark(self, price: float) -> None:
+        for position in self.positions.values():
+            position.mark_price = price
+            position.unrealised_pnl = position.sign * position.size * (price - position.avg_price)
+
+    def on_fill(self, order_type: OrderType, qty: float, price: float) -> None:
+        idx = 1 if order_type == OrderType.long else 2
+        position = self.positions.get(idx)
+        if position is None or not position.size:
+            side = "Buy" if order_type == OrderType.long else "Sell"
+            self.positions[idx] = entity.Position(
+                position_idx=idx, side=side, size=qty, avg_price=price, mark_price=price
+            )
+            return
+        size = position.size + qty
+        position.avg_price = (position.avg_price * position.size + price * qty) / size
+        position.size = size
+
+    @property
+    def equity(self) -> float | None:
+        if self.balance is None:
+            return None
+        return self.balance + sum(position.unrealised_pnl for position in self.positions.values())
+
+    @property
+    def exposure(self) -> float:
+        return sum(position.value for position in self.positions.values())
+
+    def margin_for(self, price: float, atr: float, leverage: float) -> float | None:
+        """Margin so that a stop at 1 ATR loses `risk_per_trade` of equity, None if there is no room."""
+        equity = self.equity
+        if equity is None:
+            log_sampled("risk_equity", "Risk: equity unknown, entries blocked", level="WARNING")
+            return None
+        if equity <= 0:
+            return None
+        margin = min(equity * self.risk_per_trade * price / (leverage * atr), self.max_margin)
+        room = self.max_exposure * equity - self.exposure
+        margin = min(margin, room / leverage)
+        if margin <= 0:
+            return None
+        return margin
+
+    def check(self, order: entity.AddOrder) -> bool:
+        """Rejects orders whose size after qty rounding breaks the loss or exposure limits."""
+        equity = self.equity
+        if equity is None:
+            return False
+        max_loss = order.value * abs(order.price_open - order.price_sl)
+        if max_loss > equity * self.risk_per_trade * 1.05:
+            logger.warning("Risk: max loss {} over limit, equity {}", max_loss, equity)
+            return False
+        if self.exposure + order.value_tokens > self.max_exposure * equity:
+            logger.warning("Risk: exposure {} over limit, equity {}", self.exposure + order.value_tokens, equity)
+            return False
+        return True
@@ -0,0 +1,187 @@
+import datetime
+import itertools
+import traceback
+
+import numpy as np
+
+from app import entity
+from app.entity.enums import OrderType
+from app.logger import log_sampled, logger
+from app.repository import SAUnitOfWork
+from app.services.indicators import IndicatorKernel
+
+
+def default_variants() -> list[entity.ShadowVariant]:
+    """54 variants around the live ema_rsi parameters."""
+    variants = []
+    for (fast, slow), (upper, lower), (tp1, tp2, sl), min_atr in itertools.product(
+            [(9, 21), (5, 13), (12, 26)],
+            [(70, 30), (65, 35), (75, 25)],
+            [(1, 2.5, 1), (1.5, 3, 1), (1, 2, 0.75)],
+            [0.0015, 0.001],
+    ):
+        variants.append(entity.ShadowVariant(
+            name=f"ema{fast}-{slow}_rsi{upper:g}-{lower:g}_tp{tp1:g}-{tp2:g}_sl{sl:g}_atr{min_atr:g}",
+            ema_fast=fast, ema_slow=slow, rsi_upper=upper, rsi_lower=lower,
+            min_atr=min_atr, tp1=tp1, tp2=tp2, sl=sl,
+        ))
+    return variants
+
+
+def variant_spans(variants: list[entity.ShadowVariant]) -> set[int]:
+    return {span for variant in variants for span in (variant.ema_fast, variant.ema_slow)}
+
+
+class ShadowEngine:
+    """Paper trading of many strategy variants on the live kernel, one vectorized step per tick.
+
+    Every variant holds at most one position. Entries need the main and fast rows to agree,
+    like the live direction, and fill at the tick price; TP1 closes half and moves the stop
+    to the entry, TP2 or the stop close the rest. Closed trades wait in `pending` for `flush`,
+    at most `max_pending` of them, the oldest are dropped while the database is away.
+    """
+
+    def __init__(
+            self,
+            variants: list[entity.ShadowVariant],
+            kernel: IndicatorKernel,
+            rows: tuple[int, int] = (0, 1),
+            notional: float = 200,
+            min_count: int = 100,
+            max_pending: int = 10000,
+    ):
+        self.variants = variants
+        self.kernel = kernel
+        self.rows = list(rows)
+        self.notional = notional
+        self.min_count = min_count
+        self.max_pending = max_pending
+        self.names = [variant.name for variant in variants]
+        self.fast_idx = np.array([kernel.ema_spans.index(variant.ema_fast) for variant in variants])
+        self.slow_idx = np.array([kernel.ema_spans.index(variant.ema_slow) for variant in variants])
+        self.rsi_upper = np.array([variant.rsi_upper for variant in variants])[:, None]
+        self.rsi_lower = np.array([variant.rsi_lower for variant in variants])[:, None]
+        self.min_atr = np.array([variant.min_atr for variant in variants])
+        self.tp1_mult = np.array([variant.tp1 for variant in variants])
+        self.tp2_mult = np.array([variant.tp2 for variant in variants])
+        self.sl_mult = np.array([variant.sl for variant in variants])
+
+        n = len(variants)
+        self.side = np.zeros(n, dtype=np.int8)
+        self.entry = np.zeros(n)
+        self.qty = np.zeros(n)
+        self.tp1 = np.zeros(n)
+        self.tp2 = np.zeros(n)
+        self.sl = np.zeros(n)
+        self.stop = np.zeros(n)
+        self.realized = np.zeros(n)
+        self.tp1_done = np.zeros(n, dtype=bool)
+        self.open_at = np.empty(n, dtype=object)
+        self.tp1_at = np.empty(n, dtype=object)
+        self.pending: list[dict] = []
+        self.dropped = 0
+
+    def signals(self) -> np.ndarray:
+        """1 long, -1 short, 0 nothing per variant."""
+        k = self.kernel
+        fast = k.ema[self.fast_idx][:, self.rows]
+        slow = k.ema[self.slow_idx][:, self.rows]
+        rsi = k.rsi[self.rows]
+        ready = k.count[self.rows] >= self.min_count
+        with np.errstate(invalid="ignore"):
+            long = ready & (fast > slow) & (rsi < self.rsi_upper)
+            short = ready & (fast < slow) & (rsi > self.rsi_lower)
+        signal = long.astype(np.int8) - short.astype(np.int8)
+        return np.where(signal[:, 0] == signal[:, 1], signal[:, 0], 0)
+
+    def on_tick(self, price: float, now: datetime.datetime) -> None:
+        if (self.side != 0).any():
+            self._exits(price, now)
+        flat = self.side == 0
+        if not flat.any():
+            return
+        atr = self.kernel.atr[self.rows[0]]
+        if np.isnan(atr):
+            return
+        direction = self.signals()
+        enter = flat & (direction != 0) & (atr >= price * self.min_atr)
+        if not enter.any():
+            return
+        side = direction[enter]
+        self.side[enter] = side
+        self.entry[enter] = price
+        self.qty[enter] = self.notional / price
+        self.tp1[enter] = price + side * atr * self.tp1_mult[enter]
+        self.tp2[enter] = price + side * atr * self.tp2_mult[enter]
+        self.sl[enter] = price - side * atr * self.sl_mult[enter]
+        self.stop[enter] = self.sl[enter]
+        self.open_at[enter] = now
+
+    def _exits(self, price: float, now: datetime.datetime) -> None:
+        open_ = self.side != 0
+        long = self.side == 1
+        hit_tp1 = open_ & ~self.tp1_done & np.where(long, price >= self.tp1, price <= self.tp1)
+        if hit_tp1.any():
+            self.realized[hit_tp1] += (
+                0.5 * self.qty[hit_tp1] * (self.tp1[hit_tp1] - self.entry[hit_tp1]) * self.side[hit_tp1]
+            )
+            self.tp1_done[hit_tp1] = True
+            self.stop[hit_tp1] = self.entry[hit_tp1]
+            self.tp1_at[hit_tp1] = now
+
+        hit_tp2 = open_ & np.where(long, price >= self.tp2, price <= self.tp2)
+        hit_stop = open_ & ~hit_tp2 & np.where(long, price <= self.stop, price >= self.stop)
+        closing = hit_tp2 | hit_stop
+        if not closing.any():
+            return
+        exit_price = np.where(hit_tp2, self.tp2, self.stop)
+        remaining = np.where(self.tp1_done, 0.5, 1.0) * self.qty
+        pnl = self.realized + remaining * (exit_price - self.entry) * self.side
+        for i in np.flatnonzero(closing):
+            self.pending.append({
+                "variant": self.names[i],
+                "order_type": OrderType.long if self.side[i] == 1 else OrderType.short,
+                "value": float(self.qty[i]),
+                "price_open": float(self.entry[i]),
+                "price_tp1": float(self.tp1[i]),
+                "price_tp2": float(self.tp2[i]),
+                "price_sl": float(self.sl[i]),
+                "price_close": float(exit_price[i]),
+                "pnl": float(pnl[i]),
+                "exit_reason": "tp2" if hit_tp2[i] else ("breakeven" if self.tp1_done[i] else "sl"),
+                "open_at": self.open_at[i],
+                "close_at": now,
+                "tp1_executed_at": self.tp1_at[i],
+            })
+        self._trim()
+        self.side[closing] = 0
+        self.realized[closing] = 0
+        self.tp1_done[closing] = False
+        self.tp1_at[closing] = None
+
+    async def flush(self, uow: SAUnitOfWork) -> int:
+        """Writes pending trades in one batch, they stay queued if the write fails."""
+        rows, self.pending = self.pending, []
+        if not rows:
+            return 0
+        try:
+            async with uow:
+                await uow.shadow_trade.bulk_add(rows)
+                await uow.commit()
+        except Exception as e:
+            logger.error(f"{e=}\n{traceback.format_exc()}")
+            self.pending = rows + self.pending
+            self._trim()
+            return 0
+        return len(rows)
+
+    def _trim(self) -> None:
+        dropped = len(self.pending) - self.max_pending
+        if dropped <= 0:
+            return
+        del self.pending[:dropped]
+        self.dropped += dropped
+        log_sampled(
+            "shadow_dropped", "Shadow trades dropped over {} pending, {} in total",
+            self.max_pending, self.dropped, level="WARNING",
+        )
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import pickle
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable
+
+from app.logger import logger
+from app.utils.datetime import utc_now
+
+SNAPSHOT_VERSION = 1
+
+
+class StateSnapshot:
+    """In-memory trading state pickled to a local file for a warm restart.
+
+    Written to a temporary file and moved over the old one with os.replace,
+    so a crash mid-write never leaves a broken snapshot behind. Pickling and fsync
+    run in a worker thread, one write at a time, off the event loop.
+    """
+
+    def __init__(self, path: str | Path, interval: float = 10, max_age: float = 12 * 3600):
+        self.path = Path(path)
+        self.interval = interval
+        self.max_age = max_age
+        self.saved_at: float | None = None
+        self.writing: asyncio.Task | None = None
+
+    def save(self, state: dict[str, Any]) -> None:
+        payload = {"version": SNAPSHOT_VERSION, "taken_at": utc_now(), "state": state}
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.saved_at = time.monotonic()
+
+    def maybe_save(self, state: Callable[[], dict[str, Any]]) -> bool:
+        """Starts a save at most once per `interval`, `state` is only built when a save is due.
+
+        `state` runs on the loop and has to return copies, the write happens in a thread.
+        """
+        if self.writing is not None and not self.writing.done():
+            return False
+        if self.saved_at is not None and time.monotonic() - self.saved_at < self.interval:
+            return False
+        self.saved_at = time.monotonic()
+        try:
+            payload = state()
+        except Exception as e:
+            logger.error(f"{e=}\n{traceback.format_exc()}")
+            return False
+        self.writing = asyncio.create_task(self._write(payload))
+        return True
+
+    async def _write(self, state: dict[str, Any]) -> None:
+        try:
+            await asyncio.to_thread(self.save, state)
+        except Exception as e:
+            logger.error(f"{e=}\n{traceback.format_exc()}")
+
+    def load(self) -> tuple[dict[str, Any], float] | None:
+        """State and its age in seconds, None if there is no usable snapshot."""
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                payload = pickle.load(f)
+        except Exception as e:
+            logger.warning("Snapshot {} is unreadable: {!r}", self.path, e)
+            return None
+        if payload.get("version") != SNAPSHOT_VERSION:
+            logger.warning("Snapshot {} has version {}, expected {}", self.path, payload.get("version"), SNAPSHOT_VERSION)
+            return None
+        age = (utc_now() - payload["taken_at"]).total_seconds()
+        if age > self.max_age:
+            logger.info("Snapshot {} is {:.0f}s old, ignored", self.path, age)
+            return None
+        return payload["state"], age
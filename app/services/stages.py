@@ -0,0 +1,51 @@
+from collections import Counter
+from typing import Any, Hashable
+
+from app import entity
+from app.services.decode import OrderColumns
+
+
+class StageGate:
+    """Remembers the inputs each pipeline stage last ran with.
+
+    A stage declares its inputs on every tick and is skipped while they are unchanged.
+    Inputs are recorded before the stage runs, a stage that failed has to `invalidate` itself.
+    """
+
+    def __init__(self):
+        self.inputs: dict[str, tuple] = {}
+        self.runs: Counter[str] = Counter()
+        self.skips: Counter[str] = Counter()
+
+    def should_run(self, stage: str, *inputs: Hashable) -> bool:
+        if self.inputs.get(stage) == inputs:
+            self.skips[stage] += 1
+            return False
+        self.inputs[stage] = inputs
+        self.runs[stage] += 1
+        return True
+
+    def invalidate(self, stage: str | None = None) -> None:
+        if stage is None:
+            self.inputs.clear()
+        else:
+            self.inputs.pop(stage, None)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            stage: {"runs": self.runs[stage], "skips": self.skips[stage]}
+            for stage in sorted(self.runs.keys() | self.skips.keys())
+        }
+
+
+def orders_fingerprint(orders: list[entity.BybitOrder] | OrderColumns) -> int:
+    """Changes whenever an exchange order changes status, fill or trigger."""
+    if isinstance(orders, OrderColumns):
+        return orders.fingerprint()
+    return hash(tuple(
+        (order.order_id, order.status, order.updated_at, order.avg_price, order.trigger_price) for order in orders
+    ))
+
+
+def row_version(order: entity.Order) -> tuple:
+    return order.id, order.updated_at
@@ -0,0 +1,201 @@
+import operator
+from typing import Any, Callable
+
+import numpy as np
+
+
+class Expr:
+    """Rule expression over named streams, built with operators: stream("ema9") > stream("ema21")."""
+
+    __hash__ = None
+
+    def __init__(self, key: str, op: Callable | None = None, args: tuple["Expr", ...] = (), value: Any = None):
+        self.key = key
+        self.op = op
+        self.args = args
+        self.value = value
+
+    def _binary(self, other: Any, op: Callable, symbol: str, reverse: bool = False) -> "Expr":
+        other = other if isinstance(other, Expr) else const(other)
+        left, right = (other, self) if reverse else (self, other)
+        return Expr(f"({left.key} {symbol} {right.key})", op, (left, right))
+
+    def __gt__(self, other): return self._binary(other, operator.gt, ">")
+    def __ge__(self, other): return self._binary(other, operator.ge, ">=")
+    def __lt__(self, other): return self._binary(other, operator.lt, "<")
+    def __le__(self, other): return self._binary(other, operator.le, "<=")
+    def __eq__(self, other): return self._binary(other, operator.eq, "==")
+    def __ne__(self, other): return self._binary(other, operator.ne, "!=")
+    def __and__(self, other): return self._binary(other, np.logical_and, "&")
+    def __or__(self, other): return self._binary(other, np.logical_or, "|")
+    def __add__(self, other): return self._binary(other, operator.add, "+")
+    def __sub__(self, other): return self._binary(other, operator.sub, "-")
+    def __mul__(self, other): return self._binary(other, operator.mul, "*")
+    def __truediv__(self, other): return self._binary(other, operator.truediv, "/")
+    def __rand__(self, other): return self._binary(other, np.logical_and, "&", reverse=True)
+    def __ror__(self, other): return self._binary(other, np.logical_or, "|", reverse=True)
+    def __radd__(self, other): return self._binary(other, operator.add, "+", reverse=True)
+    def __rsub__(self, other): return self._binary(other, operator.sub, "-", reverse=True)
+    def __rmul__(self, other): return self._binary(other, operator.mul, "*", reverse=True)
+    def __rtruediv__(self, other): return self._binary(other, operator.truediv, "/", reverse=True)
+
+    def __invert__(self) -> "Expr":
+        return Expr(f"~{self.key}", np.logical_not, (self,))
+
+    def __repr__(self) -> str:
+        return self.key
+
+
+def stream(name: str) -> Expr:
+    return Expr(name)
+
+
+def const(value: Any) -> Expr:
+    return Expr(repr(value), value=value)
+
+
+class Program:
+    """Expressions compiled into one flat list of vectorized steps.
+
+    Subexpressions shared between outputs (and strategies) are computed once per run.
+    """
+
+    def __init__(self, outputs: dict[str, Expr]):
+        self.steps: list[tuple[str, Callable, tuple[str, ...]]] = []
+        self.consts: dict[str, Any] = {}
+        self.inputs: set[str] = set()
+        self.outputs = {name: expr.key for name, expr in outputs.items()}
+        seen = set()
+        for expr in outputs.values():
+            self._compile(expr, seen)
+
+    def _compile(self, expr: Expr, seen: set[str]) -> None:
+        if expr.key in seen:
+            return
+        seen.add(expr.key)
+        if expr.op is None:
+            if expr.value is None:
+                self.inputs.add(expr.key)
+            else:
+                self.consts[expr.key] = expr.value
+            return
+        for arg in expr.args:
+            self._compile(arg, seen)
+        self.steps.append((expr.key, expr.op, tuple(arg.key for arg in expr.args)))
+
+    def run(self, streams: dict[str, Any]) -> dict[str, Any]:
+        values = {**self.consts, **streams}
+        with np.errstate(invalid="ignore"):
+            for key, op, arg_keys in self.steps:
+                values[key] = op(*(values[arg] for arg in arg_keys))
+        return {name: values[key] for name, key in self.outputs.items()}
+
+
+class Strategy:
+    """Entry rules run over indicator streams (one value per kernel row).
+
+    `entry_filter` and exit rules run over scalar context: entry gets `price` and `atr`,
+    exit gets `price`, `entry`, `sl`, `tp1`, `tp1_filled` and `signal` (1 long, -1 short, 0).
+    """
+
+    def __init__(
+            self,
+            name: str,
+            long_entry: Expr,
+            short_entry: Expr,
+            entry_filter: Expr | None = None,
+            long_exit: Expr | None = None,
+            short_exit: Expr | None = None,
+    ):
+        self.name = name
+        self.long_entry = long_entry
+        self.short_entry = short_entry
+        self.entry_filter = entry_filter if entry_filter is not None else const(True)
+        self.long_exit = long_exit if long_exit is not None else const(False)
+        self.short_exit = short_exit if short_exit is not None else const(False)
+
+
+class StrategySet:
+    def __init__(self, strategies: list[Strategy]):
+        self.strategies = {strategy.name: strategy for strategy in strategies}
+        self.entries = Program({
+            f"{name}.{side}": getattr(strategy, f"{side}_entry")
+            for name, strategy in self.strategies.items() for side in ("long", "short")
+        })
+        self.filters = Program({name: strategy.entry_filter for name, strategy in self.strategies.items()})
+        self.exits = Program({
+            f"{name}.{side}": getattr(strategy, f"{side}_exit")
+            for name, strategy in self.strategies.items() for side in ("long", "short")
+        })
+
+    def signals(self, streams: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        """Direction vector per strategy: 1 long, -1 short, 0 nothing."""
+        values = self.entries.run(streams)
+        return {
+            name: (
+                np.asarray(values[f"{name}.long"]).astype(np.int8) -
+                np.asarray(values[f"{name}.short"]).astype(np.int8)
+            )
+            for name in self.strategies
+        }
+
+    def entry_allowed(self, context: dict[str, Any]) -> dict[str, bool]:
+        return {name: bool(value) for name, value in self.filters.run(context).items()}
+
+    def exit(self, context: dict[str, Any], long: bool) -> dict[str, bool]:
+        side = "long" if long else "short"
+        values = self.exits.run(context)
+        return {name: bool(values[f"{name}.{side}"]) for name in self.strategies}
+
+
+price = stream("price")
+
+EMA_RSI = Strategy(
+    "ema_rsi",
+    long_entry=(stream("count") >= 100) & (stream("ema9") > stream("ema21")) & (stream("rsi14") < 70),
+    short_entry=(stream("count") >= 100) & (stream("ema9") < stream("ema21")) & (stream("rsi14") > 30),
+    entry_filter=stream("atr") >= price * 0.0015,
+    long_exit=(
+        (price < stream("sl")) |
+        (price < stream("entry") * 0.998) |
+        (stream("tp1_filled") & (stream("signal") != 1) & (price < stream("tp1") * 0.998))
+    ),
+    short_exit=(
+        (price > stream("sl")) |
+        (price > stream("entry") * 1.002) |
+        (stream("tp1_filled") & (stream("signal") != -1) & (price > stream("tp1") * 1.002))
+    ),
+)
+
+EMA_RSI_VOLUME = Strategy(
+    "ema_rsi_volume",
+    long_entry=EMA_RSI.long_entry & stream("volume_signal"),
+    short_entry=EMA_RSI.short_entry & stream("volume_signal"),
+    entry_filter=EMA_RSI.entry_filter,
+    long_exit=EMA_RSI.long_exit,
+    short_exit=EMA_RSI.short_exit,
+)
+
+# Book streams are NaN without a live order book, so this one never enters then.
+EMA_RSI_BOOK = Strategy(
+    "ema_rsi_book",
+    long_entry=EMA_RSI.long_entry & (stream("imbalance") > 0.1) & (stream("microprice") >= stream("close")),
+    short_entry=EMA_RSI.short_entry & (stream("imbalance") < -0.1) & (stream("microprice") <= stream("close")),
+    entry_filter=EMA_RSI.entry_filter,
+    long_exit=EMA_RSI.long_exit,
+    short_exit=EMA_RSI.short_exit,
+)
+
+# Volume streams are NaN with VOLUME_INDICATORS off: trend entries only on the VWAP side inside the bands.
+EMA_RSI_VWAP = Strategy(
+    "ema_rsi_vwap",
+    long_entry=EMA_RSI.long_entry & (stream("close") > stream("vwap")) & (stream("close") < stream("vwap_upper")),
+    short_entry=EMA_RSI.short_entry & (stream("close") < stream("vwap")) & (stream("close") > stream("vwap_lower")),
+    entry_filter=EMA_RSI.entry_filter,
+    long_exit=EMA_RSI.long_exit,
+    short_exit=EMA_RSI.short_exit,
+)
+
+STRATEGIES = {
+    strategy.name: strategy for strategy in (EMA_RSI, EMA_RSI_VOLUME, EMA_RSI_BOOK, EMA_RSI_VWAP)
+}
@@ -0,0 +1,215 @@
+import datetime
+import json
+import time
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from app import entity
+from app.logger import logger
+from app.services.decode import OrderColumns
+from app.utils.datetime import utc_now
+
+VERSION = 1
+SCALE = 8
+
+HEADER = 0
+TICKER = 1
+KLINE = 2
+ORDER = 3
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _to_ms(value: datetime.datetime) -> int:
+    return (value - _EPOCH) // datetime.timedelta(milliseconds=1)
+
+
+def _from_ms(value: int) -> datetime.datetime:
+    return _EPOCH + datetime.timedelta(milliseconds=value)
+
+
+def _write_varint(buf: bytearray, value: int) -> None:
+    value = value * 2 if value >= 0 else -value * 2 - 1
+    while value > 0x7F:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    return (result >> 1) ^ -(result & 1), pos
+
+
+def _scaled(value: float) -> int:
+    return round(value * 10 ** SCALE)
+
+
+def _order_to_raw(order: entity.BybitOrder) -> dict:
+    raw = order.model_dump(by_alias=True)
+    raw["createdTime"] = str(_to_ms(order.created_at))
+    raw["updatedTime"] = str(_to_ms(order.updated_at))
+    raw["avgPrice"] = "" if order.avg_price is None else str(order.avg_price)
+    raw["triggerPrice"] = "" if order.trigger_price is None else str(order.trigger_price)
+    return raw
+
+
+class _DeltaState:
+    def __init__(self):
+        self.time = 0
+        self.ticker = [0, 0]
+        self.kline = [0] * 7
+
+
+class TapeRecorder:
+    """Appends market events to hourly rotated tape files in `directory`.
+
+    A record is `type:u8 | time delta ms:varint | payload`, prices and volumes are integers
+    scaled by 10**SCALE and delta encoded against the previous record of the same type,
+    so a ticker takes 5-8 bytes. Every file starts with a HEADER record resetting the deltas.
+    """
+
+    def __init__(self, directory: str | Path, flush_interval: float = 1.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.file = None
+        self.hour = None
+        self.state = _DeltaState()
+        self.buf = bytearray()
+        self.flushed_at = time.monotonic()
+        self.order_versions: dict[str, datetime.datetime | int] = {}
+
+    def _open(self, now: datetime.datetime) -> None:
+        self.close()
+        self.hour = now.replace(minute=0, second=0, microsecond=0)
+        path = self.directory / f"tape-{self.hour:%Y%m%d%H}.bin"
+        self.file = open(path, "ab")
+        self.state = _DeltaState()
+        self.buf.append(HEADER)
+        _write_varint(self.buf, _to_ms(now))
+        _write_varint(self.buf, VERSION)
+        _write_varint(self.buf, SCALE)
+        self.state.time = _to_ms(now)
+
+    def _begin(self, record_type: int, now: datetime.datetime | None) -> None:
+        now = now or utc_now()
+        if self.hour is None or now - self.hour >= datetime.timedelta(hours=1) or now < self.hour:
+            self._open(now)
+        ms = _to_ms(now)
+        self.buf.append(record_type)
+        _write_varint(self.buf, ms - self.state.time)
+        self.state.time = ms
+
+    def _delta(self, prev: list[int], values: Iterable[int]) -> None:
+        for i, value in enumerate(values):
+            _write_varint(self.buf, value - prev[i])
+            prev[i] = value
+
+    def _end(self) -> None:
+        if time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.flush()
+
+    def ticker(self, ticker: entity.Ticker, now: datetime.datetime | None = None) -> None:
+        self._begin(TICKER, now)
+        self._delta(self.state.ticker, (_scaled(ticker.close), _scaled(ticker.mark_price)))
+        self._end()
+
+    def kline(self, kline: entity.Kline, now: datetime.datetime | None = None) -> None:
+        self._begin(KLINE, now)
+        self._delta(self.state.kline, (
+            _to_ms(kline.start.replace(tzinfo=None)),
+            _scaled(kline.open), _scaled(kline.high), _scaled(kline.low), _scaled(kline.close),
+            _scaled(kline.volume), _scaled(kline.turnover),
+        ))
+        self._end()
+
+    def klines(self, klines: list[entity.Kline], now: datetime.datetime | None = None) -> None:
+        for kline in klines:
+            self.kline(kline, now)
+
+    def order(self, order: entity.BybitOrder, now: datetime.datetime | None = None) -> None:
+        self._begin(ORDER, now)
+        payload = json.dumps(_order_to_raw(order), separators=(",", ":")).encode()
+        _write_varint(self.buf, len(payload))
+        self.buf.extend(payload)
+        self._end()
+
+    def orders(self, orders: list[entity.BybitOrder] | OrderColumns, now: datetime.datetime | None = None) -> None:
+        """Records only orders changed since they were last seen."""
+        if len(self.order_versions) > 10000:
+            self.order_versions.clear()
+        if isinstance(orders, OrderColumns):
+            # Versions compared on the columns, models are built for changed rows only
+            versions = zip(orders.order_id, orders.updated_ms.tolist())
+        else:
+            versions = ((order.order_id, order.updated_at) for order in orders)
+        for i, (order_id, version) in enumerate(versions):
+            if self.order_versions.get(order_id) != version:
+                self.order_versions[order_id] = version
+                self.order(orders[i], now)
+
+    def flush(self) -> None:
+        if self.file is not None and self.buf:
+            self.file.write(self.buf)
+            self.file.flush()
+        self.buf.clear()
+        self.flushed_at = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_tape(path: str | Path) -> Iterator[tuple[int, datetime.datetime, entity.Ticker | entity.Kline | entity.BybitOrder]]:
+    data = Path(path).read_bytes()
+    state = _DeltaState()
+    scale = 10 ** SCALE
+    pos = 0
+    size = len(data)
+    while pos < size:
+        record_type = data[pos]
+        delta, pos = _read_varint(data, pos + 1)
+        if record_type == HEADER:
+            state = _DeltaState()
+            state.time = delta
+            _, pos = _read_varint(data, pos)
+            exponent, pos = _read_varint(data, pos)
+            scale = 10 ** exponent
+            continue
+
+        state.time += delta
+        now = _from_ms(state.time)
+        if record_type == TICKER:
+            for i in range(2):
+                delta, pos = _read_varint(data, pos)
+                state.ticker[i] += delta
+            yield TICKER, now, entity.Ticker(
+                lastPrice=state.ticker[0] / scale, markPrice=state.ticker[1] / scale
+            )
+        elif record_type == KLINE:
+            for i in range(7):
+                delta, pos = _read_varint(data, pos)
+                state.kline[i] += delta
+            start, *values = state.kline
+            yield KLINE, now, entity.Kline(
+                start=_from_ms(start), open=values[0] / scale, high=values[1] / scale, low=values[2] / scale,
+                close=values[3] / scale, volume=values[4] / scale, turnover=values[5] / scale,
+            )
+        elif record_type == ORDER:
+            length, pos = _read_varint(data, pos)
+            raw = json.loads(data[pos:pos + length])
+            pos += length
+            yield ORDER, now, entity.BybitOrder.model_validate(raw)
+        else:
+            raise ValueError(f"Unknown tape record type {record_type} at {pos} in {path}")
@@ -0,0 +1,221 @@
+import datetime
+
+import numpy as np
+
+from app import entity
+from app.services.decode import EPOCH, KlineColumns
+
+MINUTE_MS = 60_000
+# start (ms), open, high, low, close, volume
+START, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+
+
+def to_ms(moment: datetime.datetime) -> int:
+    """Naive UTC (or aware) datetime to epoch milliseconds."""
+    return (moment.replace(tzinfo=None) - EPOCH) // datetime.timedelta(milliseconds=1)
+
+
+def merge(bar: np.ndarray, other: np.ndarray) -> None:
+    """Folds `other` into `bar` in place, both are [start, open, high, low, close, volume]."""
+    bar[HIGH] = np.fmax(bar[HIGH], other[HIGH])
+    bar[LOW] = np.fmin(bar[LOW], other[LOW])
+    bar[CLOSE] = other[CLOSE]
+    bar[VOLUME] = other[VOLUME] if np.isnan(bar[VOLUME]) else bar[VOLUME] + np.nan_to_num(other[VOLUME])
+
+
+class BaseSeries:
+    """The one 1-minute OHLCV series every timeframe is rolled up from.
+
+    Closed bars live in a (6, 2 * capacity) float array, the oldest half is dropped when it
+    fills up, so appends are amortized O(1) and views are plain slices. The open minute is
+    built from ticks in `current` and is closed when a tick of the next minute comes in.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.data = np.full((6, capacity * 2), np.nan)
+        self.size = 0
+        self.current: np.ndarray | None = None
+
+    @property
+    def bars(self) -> np.ndarray:
+        return self.data[:, :self.size]
+
+    @property
+    def last_start(self) -> int | None:
+        if self.current is not None:
+            return int(self.current[START])
+        return int(self.data[START, self.size - 1]) if self.size else None
+
+    def _append(self, bar: np.ndarray) -> None:
+        if self.size == self.data.shape[1]:
+            self.data[:, :self.capacity] = self.data[:, self.size - self.capacity:self.size]
+            self.size = self.capacity
+        self.data[:, self.size] = bar
+        self.size += 1
+
+    def load(self, start: np.ndarray, values: np.ndarray) -> None:
+        """Replaces the series with klines oldest first, `values` rows are open/high/low/close/volume[/turnover].
+
+        The last kline is the minute in progress on the exchange, it stays open for ticks.
+        """
+        start, values = start[-self.capacity - 1:], values[-self.capacity - 1:]
+        self.size = max(len(start) - 1, 0)
+        self.data[START, :self.size] = start[:self.size]
+        self.data[OPEN:, :self.size] = values[:self.size, :5].T
+        self.current = np.r_[start[-1], values[-1, :5]] if len(start) else None
+
+    def on_tick(self, price: float, now: datetime.datetime) -> np.ndarray | None:
+        """Updates the open minute, returns the bar it closed if `now` is in a later minute."""
+        minute = to_ms(now) // MINUTE_MS * MINUTE_MS
+        current = self.current
+        if current is not None and current[START] > minute:
+            return None
+        if current is not None and current[START] == minute:
+            current[HIGH] = max(current[HIGH], price)
+            current[LOW] = min(current[LOW], price)
+            current[CLOSE] = price
+            return None
+        self.current = np.array([minute, price, price, price, price, np.nan])
+        if current is None:
+            return None
+        self._append(current)
+        return current
+
+    def on_kline(self, start: int, values: tuple[float, ...], is_open: bool = False) -> list[np.ndarray]:
+        """Adds a kline, returns the bars it closed: a pending older minute and the kline unless `is_open`."""
+        bar = np.array([start, *values], dtype=float)
+        closed = []
+        current = self.current
+        if current is not None and current[START] >= start:
+            if current[START] == start:
+                self.current = bar if is_open else None
+                if not is_open:
+                    self._append(bar)
+                    closed.append(bar)
+            return closed
+        if current is not None:
+            self._append(current)
+            closed.append(current)
+            self.current = None
+        if self.size and self.data[START, self.size - 1] >= start:
+            return closed
+        if is_open:
+            self.current = bar
+        else:
+            self._append(bar)
+            closed.append(bar)
+        return closed
+
+    def state(self) -> dict:
+        return {"bars": self.bars.copy(), "current": None if self.current is None else self.current.copy()}
+
+    def restore(self, state: dict) -> None:
+        bars = state["bars"][:, -self.capacity:]
+        self.size = bars.shape[1]
+        self.data[:, :self.size] = bars
+        self.current = None if state["current"] is None else state["current"].copy()
+
+
+class Rollup:
+    """A higher timeframe over BaseSeries, nothing but the bar being built is stored.
+
+    `on_bar` folds closed base bars into the open bucket in O(1) and hands back the bucket
+    when a bar of the next one arrives; `view` derives past bars from the base on demand.
+    """
+
+    def __init__(self, minutes: int, row: int):
+        self.minutes = minutes
+        self.ms = minutes * MINUTE_MS
+        self.row = row
+        self.current: np.ndarray | None = None
+
+    def bucket(self, start: float) -> float:
+        return start // self.ms * self.ms
+
+    def on_bar(self, bar: np.ndarray) -> np.ndarray | None:
+        bucket = self.bucket(bar[START])
+        current = self.current
+        if current is not None and current[START] == bucket:
+            merge(current, bar)
+            return None
+        self.current = bar.copy()
+        self.current[START] = bucket
+        if current is None or current[START] > bucket:
+            return None
+        return current
+
+    def view(self, base: BaseSeries) -> np.ndarray:
+        """Rolled bars over the whole base, the partial first bucket dropped and the last one still open."""
+        bars = base.bars
+        if not bars.shape[1]:
+            return np.empty((6, 0))
+        buckets = bars[START] // self.ms
+        edges = np.flatnonzero(np.diff(buckets)) + 1
+        if bars[START, 0] != buckets[0] * self.ms:
+            if not len(edges):
+                return np.empty((6, 0))
+            first = edges[0]
+            bars, buckets, edges = bars[:, first:], buckets[first:], edges[1:] - first
+        starts = np.r_[0, edges]
+        ends = np.r_[edges, bars.shape[1]] - 1
+        volume = bars[VOLUME]
+        known = np.add.reduceat(~np.isnan(volume), starts) > 0
+        return np.vstack([
+            buckets[starts] * self.ms,
+            bars[OPEN, starts],
+            np.fmax.reduceat(bars[HIGH], starts),
+            np.fmin.reduceat(bars[LOW], starts),
+            bars[CLOSE, ends],
+            np.where(known, np.add.reduceat(np.nan_to_num(volume), starts), np.nan),
+        ])
+
+    def load(self, base: BaseSeries) -> np.ndarray:
+        """Completed bars for warming up indicators; the last bucket becomes the open one."""
+        bars = self.view(base)
+        if not bars.shape[1]:
+            self.current = None
+            return bars
+        self.current = bars[:, -1].copy()
+        return bars[:, :-1]
+
+
+def kline_values(klines: list[entity.Kline] | KlineColumns) -> tuple[np.ndarray, np.ndarray]:
+    """start ms and open/high/low/close/volume/turnover rows of klines, oldest first."""
+    if isinstance(klines, KlineColumns):
+        return klines.start.astype(float), klines.values
+    if not klines:
+        return np.empty(0), np.empty((0, 6))
+    return (
+        np.array([to_ms(kline.start) for kline in klines], dtype=float),
+        np.array([
+            (kline.open, kline.high, kline.low, kline.close, kline.volume, kline.turnover) for kline in klines
+        ]),
+    )
+
+
+# Higher timeframe rows with fewer bars are still warming up. Their 0 means "no data yet",
+# not "neutral", so no rule counts such a row as agreeing or as not pointing the other way.
+WARM_BARS = 100
+
+
+def confluence_all(main: int, higher: np.ndarray, ready: np.ndarray) -> bool:
+    """Every higher timeframe is warmed up and points the same way."""
+    return bool((ready & (higher == main)).all())
+
+
+def confluence_majority(main: int, higher: np.ndarray, ready: np.ndarray) -> bool:
+    """More than half of all higher timeframes are warmed up and point the same way."""
+    return bool((ready & (higher == main)).sum() * 2 > len(higher)) if len(higher) else True
+
+
+def confluence_trend(main: int, higher: np.ndarray, ready: np.ndarray) -> bool:
+    """Every higher timeframe is warmed up and none points the other way, neutral ones do not block."""
+    return bool((ready & (higher != -main)).all())
+
+
+CONFLUENCE = {
+    "all": confluence_all,
+    "majority": confluence_majority,
+    "trend": confluence_trend,
+}
@@ -0,0 +1,94 @@
+import math
+import time
+import traceback
+
+from app import entity
+from app.entity.enums import OrderType
+from app.logger import logger
+from app.services.api import BybitAPI
+
+
+class TrailState:
+    def __init__(self, extreme: float):
+        self.extreme = extreme
+        self.amended_at: float | None = None
+        self.skipped = 0
+
+
+class TrailingStop:
+    """Stop level trailed locally on every tick after TP1, sent to the exchange sparingly.
+
+    The level follows the best price by `atr_mult` ATR (mode "atr") or by `percent` (mode "percent")
+    and never goes below break-even (price_ts). Only the latest level is amended, once it is
+    `min_step` (fraction of price) past the exchange stop and `min_interval` seconds passed.
+    """
+
+    def __init__(
+            self,
+            api: BybitAPI,
+            mode: str = "atr",
+            atr_mult: float = 1.0,
+            percent: float = 0.003,
+            min_step: float = 0.0005,
+            min_interval: float = 5,
+    ):
+        if mode not in ("atr", "percent"):
+            raise ValueError(f"Unknown trailing mode {mode!r}")
+        self.api = api
+        self.mode = mode
+        self.atr_mult = atr_mult
+        self.percent = percent
+        self.min_step = min_step
+        self.min_interval = min_interval
+        self.states: dict[int, TrailState] = {}
+
+    def level(self, order: entity.Order, price: float, atr: float | None) -> float | None:
+        """Trailing level for the current tick, None if it would not tighten the stop."""
+        long = order.order_type == OrderType.long
+        state = self.states.get(order.id)
+        if state is None:
+            state = self.states[order.id] = TrailState(price)
+        state.extreme = max(state.extreme, price) if long else min(state.extreme, price)
+
+        if self.mode == "atr":
+            if atr is None or math.isnan(atr):
+                return None
+            distance = atr * self.atr_mult
+        else:
+            distance = state.extreme * self.percent
+        if long:
+            level = max(state.extreme - distance, order.price_ts)
+            tighter = level > order.price_sl and level < price
+        else:
+            level = min(state.extreme + distance, order.price_ts)
+            tighter = level < order.price_sl and level > price
+        return self.api.round_price(level) if tighter else None
+
+    def update(self, order: entity.Order, price: float, atr: float | None) -> float | None:
+        """Amends the exchange stop when due, returns the new stop price or None."""
+        level = self.level(order, price, atr)
+        state = self.states[order.id]
+        if level is None:
+            return None
+        now = time.monotonic()
+        if abs(level - order.price_sl) < price * self.min_step or (
+                state.amended_at is not None and now - state.amended_at < self.min_interval
+        ):
+            state.skipped += 1
+            return None
+        if not self.api.amend_limiter.try_acquire():
+            state.skipped += 1
+            return None
+        try:
+            self.api.amend_stop_loss(order, level)
+        except Exception as e:
+            logger.error(f"{e=}\n{traceback.format_exc()}")
+            state.amended_at = now
+            return None
+        logger.info("Trailing stop {} -> {}, {} updates coalesced", order.price_sl, level, state.skipped)
+        state.amended_at = now
+        state.skipped = 0
+        return level
+
+    def forget(self, order: entity.Order) -> None:
+        self.states.pop(order.id, None)
@@ -0,0 +1,208 @@
+from collections import deque
+
+import numpy as np
+
+DAY_MS = 24 * 3600 * 1000
+
+
+class VWAP:
+    """Session (UTC day) or rolling VWAP with standard deviation bands, O(1) per bar.
+
+    A bar enters at turnover / volume, its exact average traded price; at the typical
+    price when turnover is unknown.
+    """
+
+    def __init__(self, window: int | None = None, band_std: float = 2):
+        self.window = window
+        self.band_std = band_std
+        self.session: int | None = None
+        # volume, price * volume, price^2 * volume
+        self.sums = np.zeros(3)
+        self.ring = np.zeros((window, 3)) if window else None
+        self.count = 0
+
+    def update(self, start: int, price: float, volume: float) -> None:
+        row = np.array([volume, price * volume, price * price * volume])
+        if self.ring is None:
+            session = start // DAY_MS
+            if session != self.session:
+                self.sums[:] = 0
+                self.session = session
+            self.sums += row
+        else:
+            slot = self.count % self.window
+            self.sums += row - self.ring[slot]
+            self.ring[slot] = row
+            if slot == self.window - 1:
+                # Пересчёт раз в окно, чтобы не копилась ошибка вычитаний
+                self.sums = self.ring.sum(axis=0)
+        self.count += 1
+
+    @property
+    def value(self) -> float:
+        volume, pv, _ = self.sums
+        return pv / volume if volume > 0 else np.nan
+
+    def bands(self) -> tuple[float, float]:
+        volume, pv, p2v = self.sums
+        if volume <= 0:
+            return np.nan, np.nan
+        vwap = pv / volume
+        std = np.sqrt(max(p2v / volume - vwap * vwap, 0.0))
+        return vwap - self.band_std * std, vwap + self.band_std * std
+
+
+class VolumeProfile:
+    """Rolling volume by price bucket in one float array.
+
+    Each bar's volume is spread evenly over the buckets of its high-low range and taken
+    out again when the bar leaves the window. POC and the value area are recomputed
+    lazily, once per change.
+    """
+
+    def __init__(self, bars: int = 1440, resolution: float = 0.0005, value_area: float = 0.7):
+        self.bars = bars
+        self.resolution = resolution
+        self.value_area = value_area
+        self.bucket: float | None = None
+        self.hist = np.zeros(0)
+        self.origin = 0
+        self.window: deque[tuple[int, int, float]] = deque()
+        self.version = 0
+        self._levels: tuple[int, tuple[float, float, float]] | None = None
+
+    def _index(self, price: float) -> int:
+        return int(price // self.bucket)
+
+    def _cover(self, lo: int, hi: int) -> None:
+        """Grows the histogram to cover buckets lo..hi, dropping buckets no bar in the window touches."""
+        if self.hist.size and self.origin <= lo and hi < self.origin + self.hist.size:
+            return
+        bounds = [(lo, hi)] + [(a, b) for a, b, _ in self.window]
+        start = min(a for a, _ in bounds)
+        end = max(b for _, b in bounds)
+        margin = max((end - start) // 4, 16)
+        start, end = start - margin, end + margin
+        hist = np.zeros(end - start + 1)
+        if self.hist.size:
+            keep_from = max(self.origin, start)
+            keep_to = min(self.origin + self.hist.size, end + 1)
+            if keep_from < keep_to:
+                hist[keep_from - start:keep_to - start] = self.hist[keep_from - self.origin:keep_to - self.origin]
+        self.hist = hist
+        self.origin = start
+
+    def update(self, high: float, low: float, volume: float) -> None:
+        if not volume > 0:
+            return
+        if self.bucket is None:
+            self.bucket = low * self.resolution
+        lo, hi = self._index(low), self._index(high)
+        self._cover(lo, hi)
+        per = volume / (hi - lo + 1)
+        self.hist[lo - self.origin:hi - self.origin + 1] += per
+        self.window.append((lo, hi, per))
+        if len(self.window) > self.bars:
+            lo, hi, per = self.window.popleft()
+            self.hist[lo - self.origin:hi - self.origin + 1] -= per
+        self.version += 1
+
+    def levels(self) -> tuple[float, float, float]:
+        """POC (bucket middle), value area low and high; NaN while the profile is empty."""
+        if self._levels is not None and self._levels[0] == self.version:
+            return self._levels[1]
+        hist = np.maximum(self.hist, 0)
+        total = hist.sum()
+        if total <= 0:
+            levels = (np.nan, np.nan, np.nan)
+        else:
+            poc = int(hist.argmax())
+            lo = hi = poc
+            volume = hist[poc]
+            target = total * self.value_area
+            while volume < target:
+                left = hist[lo - 1] if lo > 0 else -1.0
+                right = hist[hi + 1] if hi < hist.size - 1 else -1.0
+                if right >= left:
+                    hi += 1
+                    volume += right
+                else:
+                    lo -= 1
+                    volume += left
+            levels = (
+                (self.origin + poc + 0.5) * self.bucket,
+                (self.origin + lo) * self.bucket,
+                (self.origin + hi + 1) * self.bucket,
+            )
+        self._levels = (self.version, levels)
+        return levels
+
+
+class VolumeIndicators:
+    """VWAP with bands, volume profile, OBV and CVD over closed 1m klines.
+
+    Klines carry no taker side, CVD adds each bar's volume weighted by
+    (close - open) / (high - low), the usual estimate of buy minus sell volume.
+    """
+
+    FEATURES = ("vwap", "vwap_lower", "vwap_upper", "poc", "va_low", "va_high", "obv", "cvd")
+
+    def __init__(
+            self,
+            vwap_window: int | None = None,
+            band_std: float = 2,
+            profile_bars: int = 1440,
+            resolution: float = 0.0005,
+            value_area: float = 0.7,
+    ):
+        self.params = (vwap_window, band_std, profile_bars, resolution, value_area)
+        self.reset()
+
+    def reset(self) -> None:
+        vwap_window, band_std, profile_bars, resolution, value_area = self.params
+        self.vwap = VWAP(vwap_window, band_std)
+        self.profile = VolumeProfile(profile_bars, resolution, value_area)
+        self.obv = 0.0
+        self.cvd = 0.0
+        self.prev_close: float | None = None
+        self.last_start: int | None = None
+
+    def update(
+            self, start: int, open_: float, high: float, low: float, close: float, volume: float, turnover: float,
+    ) -> bool:
+        if self.last_start is not None and start <= self.last_start:
+            return False
+        price = turnover / volume if volume > 0 and turnover > 0 else (high + low + close) / 3
+        self.vwap.update(start, price, volume)
+        self.profile.update(high, low, volume)
+        if self.prev_close is not None:
+            self.obv += np.sign(close - self.prev_close) * volume
+        if high > low:
+            self.cvd += volume * (close - open_) / (high - low)
+        self.prev_close = close
+        self.last_start = start
+        return True
+
+    def load(self, start: np.ndarray, values: np.ndarray, until: float | None = None) -> int:
+        """Feeds klines oldest first (rows open/high/low/close/volume/turnover) that start before `until`."""
+        added = 0
+        for bar_start, row in zip(start.tolist(), values.tolist()):
+            if until is not None and bar_start >= until:
+                break
+            added += self.update(int(bar_start), *row)
+        return added
+
+    @property
+    def features(self) -> dict[str, float]:
+        lower, upper = self.vwap.bands()
+        poc, va_low, va_high = self.profile.levels()
+        values = (self.vwap.value, lower, upper, poc, va_low, va_high, self.obv, self.cvd)
+        return dict(zip(self.FEATURES, values))
+
+    def levels(self) -> list[float]:
+        """Price levels volume tends to stall at: VWAP with its bands, POC and the value area edges."""
+        features = self.features
+        return [
+            value for name, value in features.items()
+            if name not in ("obv", "cvd") and not np.isnan(value)
+        ]
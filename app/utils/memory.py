@@ -0,0 +1,118 @@
+import contextlib
+import gc
+import os
+import time
+import tracemalloc
+from collections import Counter
+from typing import Iterator
+
+from app.logger import logger
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_null = contextlib.nullcontext()
+
+
+def rss_bytes() -> int | None:
+    """Current resident set size, None where it can't be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MemoryMonitor:
+    """Optional allocation tracking per loop stage and a memory budget check.
+
+    With `trace` tracemalloc records net and peak traced memory of every `stage`, and every
+    `interval` seconds the top allocation sites are diffed against the previous snapshot
+    together with live object counts of `types`. The RSS budget is checked without tracing too.
+    """
+
+    def __init__(
+            self,
+            trace: bool = False,
+            interval: float = 300,
+            budget_mb: float | None = None,
+            frames: int = 5,
+            top: int = 10,
+            types: tuple[type, ...] = (),
+    ):
+        self.trace = trace
+        self.interval = interval
+        self.budget = budget_mb * 1024 * 1024 if budget_mb else None
+        self.frames = frames
+        self.top = top
+        self.types = types
+        self.stages: dict[str, list[int]] = {}  # name -> [calls, net bytes, max peak bytes]
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self.reported_at = time.monotonic()
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    @property
+    def enabled(self) -> bool:
+        return self.trace or self.budget is not None
+
+    def stage(self, name: str) -> contextlib.AbstractContextManager:
+        if not self.trace:
+            return _null
+        return self._stage(name)
+
+    @contextlib.contextmanager
+    def _stage(self, name: str) -> Iterator[None]:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            after, peak = tracemalloc.get_traced_memory()
+            stats = self.stages.setdefault(name, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += after - before
+            stats[2] = max(stats[2], peak - before)
+
+    def object_counts(self) -> dict[str, int]:
+        if not self.types:
+            return {}
+        counts = Counter(type(obj).__name__ for obj in gc.get_objects() if isinstance(obj, self.types))
+        return dict(counts)
+
+    def maybe_report(self) -> None:
+        if not self.enabled or time.monotonic() - self.reported_at < self.interval:
+            return
+        self.reported_at = time.monotonic()
+        self.report()
+
+    def report(self) -> None:
+        rss = rss_bytes()
+        if self.budget is not None and rss is not None and rss > self.budget:
+            logger.warning("Memory budget exceeded: rss={:.1f}MB budget={:.1f}MB", rss / 2**20, self.budget / 2**20)
+        if not self.trace:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        logger.info(
+            "Memory: rss={} traced={:.1f}MB traced_peak={:.1f}MB objects={}",
+            f"{rss / 2**20:.1f}MB" if rss is not None else None, current / 2**20, peak / 2**20, self.object_counts(),
+        )
+        for name, (calls, net, stage_peak) in sorted(self.stages.items()):
+            logger.info(
+                "Memory stage {}: calls={} net={:.1f}KB per_call={:.0f}B peak={:.1f}KB",
+                name, calls, net / 1024, net / calls if calls else 0, stage_peak / 1024,
+            )
+        self.stages.clear()
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        if self.snapshot is not None:
+            for diff in snapshot.compare_to(self.snapshot, "lineno")[:self.top]:
+                logger.info("Memory growth: {}", diff)
+        self.snapshot = snapshot
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from app.logger import logger
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler over all threads of the process.
+
+    A background thread reads sys._current_frames every `interval` seconds for `duration`
+    seconds and writes a speedscope or collapsed-stack file to `directory`. Stacks of the
+    event loop thread are rooted at the running asyncio task only: tasks suspended in an
+    await have no frames on the thread and do not show up.
+    """
+
+    def __init__(
+            self,
+            directory: str | Path,
+            interval: float = 0.01,
+            duration: float = 30,
+            fmt: str = "speedscope",
+            loop: asyncio.AbstractEventLoop | None = None,
+    ):
+        if fmt not in ("speedscope", "collapsed"):
+            raise ValueError(f"Unknown profile format {fmt!r}")
+        self.directory = Path(directory)
+        self.interval = interval
+        self.duration = duration
+        self.fmt = fmt
+        self.loop = loop
+        self.loop_thread_id: int | None = None
+        self.root = str(Path(__file__).resolve().parents[2])
+        self.thread: threading.Thread | None = None
+        self.stop_event = threading.Event()
+        self.last_path: Path | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def install(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Binds to the running loop, SIGUSR1 toggles profiling where signals are supported."""
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident()
+        if hasattr(signal, "SIGUSR1"):
+            try:
+                loop.add_signal_handler(signal.SIGUSR1, self.toggle)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    def start(self, duration: float | None = None) -> bool:
+        if self.running:
+            return False
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._run, args=(duration or self.duration,), name="profiler", daemon=True
+        )
+        self.thread.start()
+        logger.info("Profiler started for {}s, every {}s", duration or self.duration, self.interval)
+        return True
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def toggle(self) -> None:
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def _frame_name(self, frame) -> str:
+        code = frame.f_code
+        filename = code.co_filename
+        if filename.startswith(self.root):
+            filename = os.path.relpath(filename, self.root)
+        return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+    def _run(self, duration: float) -> None:
+        me = threading.get_ident()
+        stacks: dict[str, Counter[tuple[str, ...]]] = {}
+        started = time.perf_counter()
+        deadline = started + duration
+        samples = 0
+        while not self.stop_event.is_set() and time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            # Задача читается до кадров: пока идёт обход стека, цикл успел бы переключиться на другую
+            task = asyncio.current_task(self.loop) if self.loop is not None else None
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_name(frame))
+                    frame = frame.f_back
+                if thread_id == self.loop_thread_id and self.loop is not None:
+                    stack.append(f"task {task.get_name()}" if task else "event loop")
+                stack.reverse()
+                stacks.setdefault(names.get(thread_id, str(thread_id)), Counter())[tuple(stack)] += 1
+            samples += 1
+            self.stop_event.wait(self.interval)
+        elapsed = time.perf_counter() - started
+        try:
+            self.last_path = self._write(stacks, elapsed)
+            logger.info("Profile of {} samples over {:.1f}s written to {}", samples, elapsed, self.last_path)
+        except Exception as e:
+            logger.error("Profile write failed: {!r}", e)
+
+    def _write(self, stacks: dict[str, Counter[tuple[str, ...]]], elapsed: float) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if self.fmt == "collapsed":
+            path = self.directory / f"profile-{stamp}.folded"
+            with open(path, "w") as f:
+                for thread, counter in stacks.items():
+                    for stack, count in counter.most_common():
+                        f.write(f"{';'.join((thread, *stack))} {count}\n")
+            return path
+
+        path = self.directory / f"profile-{stamp}.speedscope.json"
+        frames: dict[str, int] = {}
+        profiles = []
+        for thread, counter in stacks.items():
+            samples, weights = [], []
+            for stack, count in counter.items():
+                samples.append([frames.setdefault(name, len(frames)) for name in stack])
+                weights.append(count * self.interval)
+            profiles.append({
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": elapsed,
+                "samples": samples,
+                "weights": weights,
+            })
+        with open(path, "w") as f:
+            json.dump({
+                "$schema": SPEEDSCOPE_SCHEMA,
+                "name": f"futures_bot {stamp}",
+                "exporter": "futures_bot",
+                "shared": {"frames": [{"name": name} for name in frames]},
+                "profiles": profiles,
+            }, f)
+        return path
+
+    async def serve(self, port: int, host: str = "127.0.0.1") -> asyncio.AbstractServer:
+        """Line protocol on a local socket: `start [seconds]`, `stop`, `status`."""
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                while line := await reader.readline():
+                    command, *args = line.decode().split() or [""]
+                    if command == "start":
+                        try:
+                            duration = float(args[0]) if args else None
+                        except ValueError:
+                            duration = None
+                        reply = "started" if self.start(duration) else "already running"
+                    elif command == "stop":
+                        self.stop()
+                        reply = "stopping"
+                    elif command == "status":
+                        reply = f"running={self.running} last={self.last_path}"
+                    else:
+                        reply = "commands: start [seconds] | stop | status"
+                    writer.write(f"{reply}\n".encode())
+                    await writer.drain()
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,32 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """`rate` tokens per second up to `capacity`; try_acquire never blocks."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self.lock:
+            self._refill()
+            if self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            return True
+
+    @property
+    def available(self) -> float:
+        with self.lock:
+            self._refill()
+            return self.tokens
@@ -0,0 +1,73 @@
+"""Throughput of SARepository bulk writes against the configured database.
+
+Every run is rolled back, nothing is kept in the orders table.
+
+    python -m benchmarks.bulk_ingest --rows 100000
+"""
+import argparse
+import asyncio
+import datetime
+import random
+import time
+
+from app.entity.enums import OrderType
+from app.logger import logger
+from app.repository import SAUnitOfWork, pg_async_session_maker
+from app.utils.datetime import utc_now
+
+
+def generate_orders(count: int) -> list[dict]:
+    now = utc_now()
+    rows = []
+    for i in range(count):
+        price = 60000 + random.uniform(-5000, 5000)
+        atr = random.uniform(50, 300)
+        order_type = random.choice([OrderType.long, OrderType.short])
+        sign = 1 if order_type == OrderType.long else -1
+        opened = now - datetime.timedelta(minutes=count - i)
+        rows.append({
+            "value": 0.003,
+            "value_tokens": round(0.003 * price, 2),
+            "order_type": order_type,
+            "price_open": price,
+            "price_tp1": price + sign * atr,
+            "price_tp2": price + sign * atr * 2.5,
+            "price_sl": price - sign * atr,
+            "price_close": price + sign * random.uniform(-atr, atr * 2.5),
+            "leverage": 10,
+            "open_at": opened,
+            "close_at": opened + datetime.timedelta(minutes=random.randint(1, 120)),
+            "orderId_open": f"bench-{i}",
+            # reverse and updated_at come from the model defaults
+            "created_at": opened,
+        })
+    return rows
+
+
+async def measure(name: str, rows: list[dict], write) -> None:
+    uow = SAUnitOfWork(pg_async_session_maker)
+    async with uow:
+        started = time.perf_counter()
+        await write(uow, rows)
+        elapsed = time.perf_counter() - started
+    logger.info("{}: {} rows in {:.2f}s, {:.0f} rows/s", name, len(rows), elapsed, len(rows) / elapsed)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    rows = generate_orders(args.rows)
+
+    async def bulk_add(uow: SAUnitOfWork, data: list[dict]) -> None:
+        await uow.order.bulk_add(data)
+
+    async def bulk_copy(uow: SAUnitOfWork, data: list[dict]) -> None:
+        await uow.order.bulk_copy(data)
+
+    await measure("bulk_add", rows, bulk_add)
+    await measure("bulk_copy", rows, bulk_copy)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
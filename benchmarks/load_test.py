@@ -0,0 +1,257 @@
+"""Load test of the whole decision loop: real Manager, BybitAPI and repositories.
+
+The exchange is app.services.paper.PaperExchange behind BybitAPI's pybit client (`api.cli`),
+every symbol trades a generated random-walk market. Every symbol gets its own Manager and its own
+Postgres schema (orders has no symbol column), created in the configured database and
+dropped after each level unless --keep is given.
+
+Each level runs `symbols` Managers in one event loop for `duration` seconds at `rate`
+ticks per second per symbol, with `open_orders` foreign resting orders in every open
+orders response. Reported per level: sustained ticks/s against the target, p50/p99
+tick latency, CPU share of one core and RSS.
+
+    python -m benchmarks.load_test --symbols 1,4,16 --rates 1,10,50 --open-orders 0,50 --duration 30
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import math
+import random
+import time
+import traceback
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import entity, models
+from app.config import config
+from app.logger import logger, setup_logger
+from app.repository import SAUnitOfWork
+from app.services.api import BybitAPI
+from app.services.manager import Manager
+from app.services.paper import PaperExchange
+from app.utils.datetime import utc_now
+from app.utils.memory import rss_bytes
+
+MINUTE_MS = 60_000
+PRIME_SECONDS = 120
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class Market:
+    """Geometric random walk moved once per tick; 1m klines are built from the ticks.
+
+    `volatility` is the std of 1-minute log returns, a tick at `rate` per second moves by
+    its share of a minute so klines look the same at every tick rate.
+    """
+
+    def __init__(self, price: float, volatility: float, seed: int, rate: float = 1, tick: float = 0.1):
+        self.rng = random.Random(seed)
+        self.price = price
+        self.volatility = volatility
+        self.step_volatility = volatility / math.sqrt(60 * rate)
+        self.tick = tick
+        self.klines: list[list[float]] = []
+        self.history(1000)
+
+    @property
+    def mark_price(self) -> float:
+        return self.price
+
+    @staticmethod
+    def now_ms() -> int:
+        return now_ms()
+
+    def history(self, count: int) -> None:
+        """Klines for the minutes before now, walked back from the current price."""
+        minute = now_ms() // MINUTE_MS * MINUTE_MS
+        close = self.price
+        klines = []
+        for i in range(count):
+            open_ = close * math.exp(self.rng.gauss(0, self.volatility))
+            high = max(open_, close) * (1 + abs(self.rng.gauss(0, self.volatility / 2)))
+            low = min(open_, close) * (1 - abs(self.rng.gauss(0, self.volatility / 2)))
+            volume = self.rng.uniform(1, 50)
+            klines.append([minute - i * MINUTE_MS, open_, high, low, close, volume, volume * close])
+            close = open_
+        self.klines = klines[::-1]
+
+    def step(self) -> float:
+        self.price = round(round(self.price * math.exp(self.rng.gauss(0, self.step_volatility)) / self.tick) * self.tick, 8)
+        minute = now_ms() // MINUTE_MS * MINUTE_MS
+        last = self.klines[-1]
+        volume = self.rng.uniform(0.01, 1)
+        if last[0] == minute:
+            last[2] = max(last[2], self.price)
+            last[3] = min(last[3], self.price)
+            last[4] = self.price
+            last[5] += volume
+            last[6] += volume * self.price
+        else:
+            self.klines.append([minute, self.price, self.price, self.price, self.price, volume, volume * self.price])
+            del self.klines[:-2000]
+        return self.price
+
+
+class SymbolSchema:
+    """Orders and shadow trades for one symbol in their own schema of the configured database."""
+
+    def __init__(self, name: str, keep: bool = False):
+        self.name = name
+        self.keep = keep
+        self.engine = create_async_engine(
+            config.async_dsn,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=0,
+            connect_args={"server_settings": {"search_path": name}},
+        )
+        self.session_maker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def create(self) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {self.name} CASCADE"))
+            await conn.execute(text(f"CREATE SCHEMA {self.name}"))
+            await conn.run_sync(models.Base.metadata.create_all)
+            await conn.execute(text("CREATE TABLE orders_default PARTITION OF orders DEFAULT"))
+
+    async def drop(self) -> None:
+        if not self.keep:
+            async with self.engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {self.name} CASCADE"))
+        await self.engine.dispose()
+
+
+class Symbol:
+    def __init__(self, index: int, args: argparse.Namespace, rate: float, open_orders: int):
+        self.name = f"LT{index}USDT"
+        self.exchange = PaperExchange(
+            self.name,
+            Market(price=60000 / (index + 1), volatility=args.volatility, seed=args.seed + index, rate=rate),
+            fill_probability=args.fill_probability,
+            open_orders=open_orders,
+            latency=args.latency,
+            seed=args.seed + index,
+        )
+        self.schema = SymbolSchema(f"load_test_{index}", keep=args.keep)
+        self.latencies: list[float] = []
+        self.errors = 0
+        self.manager: Manager | None = None
+
+    def start(self) -> None:
+        api = BybitAPI()
+        api.cli = self.exchange
+        api.client_factory = lambda: self.exchange
+        api.pair = self.name
+        self.manager = Manager(SAUnitOfWork(self.schema.session_maker), api)
+        # Быстрый таймфрейм копит 100 секундных цен, без прогрева заявок не было бы весь прогон
+        now = utc_now()
+        for i in range(PRIME_SECONDS, 0, -1):
+            price = self.exchange.market.step()
+            ticker = entity.Ticker.model_construct(close=price, mark_price=price)
+            self.manager.direction.add(ticker, now - datetime.timedelta(seconds=i))
+
+    async def run(self, rate: float, deadline: float) -> None:
+        interval = 1 / rate
+        next_tick = time.perf_counter()
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            if next_tick > now:
+                await asyncio.sleep(next_tick - now)
+            self.exchange.step()
+            started = time.perf_counter()
+            try:
+                await self.manager.tick()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"{self.name} {e=}\n{traceback.format_exc()}")
+            self.latencies.append(time.perf_counter() - started)
+            # Не догоняем пропущенные тики пачкой, отставание видно по throughput
+            next_tick = max(next_tick + interval, time.perf_counter())
+
+
+async def run_level(args: argparse.Namespace, symbols: int, rate: float, open_orders: int) -> dict:
+    items = [Symbol(i, args, rate, open_orders) for i in range(symbols)]
+    for item in items:
+        await item.schema.create()
+        item.start()
+    try:
+        rss_before = rss_bytes()
+        cpu = time.process_time()
+        started = time.perf_counter()
+        await asyncio.gather(*(item.run(rate, started + args.duration) for item in items))
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu
+        rss_after = rss_bytes()
+    finally:
+        for item in items:
+            await item.schema.drop()
+
+    latencies = np.array([latency for item in items for latency in item.latencies]) * 1000
+    ticks = len(latencies)
+    return {
+        "symbols": symbols,
+        "rate": rate,
+        "open_orders": open_orders,
+        "target_tps": symbols * rate,
+        "tps": ticks / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)) if ticks else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if ticks else None,
+        "max_ms": float(latencies.max()) if ticks else None,
+        "cpu": cpu / elapsed,
+        "rss_mb": rss_after / 2 ** 20 if rss_after else None,
+        "rss_delta_mb": (rss_after - rss_before) / 2 ** 20 if rss_after and rss_before else None,
+        "exchange_calls": sum(item.exchange.calls for item in items),
+        "errors": sum(item.errors for item in items),
+    }
+
+
+def numbers(value: str, cast=float) -> list:
+    return [cast(item) for item in value.split(",") if item]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", type=lambda value: numbers(value, int), default=[1, 4, 16])
+    parser.add_argument("--rates", type=numbers, default=[1, 10, 50], help="ticks per second per symbol")
+    parser.add_argument("--open-orders", type=lambda value: numbers(value, int), default=[0])
+    parser.add_argument("--duration", type=float, default=30, help="seconds per level")
+    parser.add_argument("--volatility", type=float, default=0.003, help="std of 1-minute log returns")
+    parser.add_argument("--fill-probability", type=float, default=0.05, help="entry fill chance per tick")
+    parser.add_argument("--latency", type=float, default=0, help="blocking seconds per exchange call")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="keep the load_test_* schemas")
+    parser.add_argument("--json", default=None, help="write results to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    setup_logger(level=args.log_level, enqueue=False)
+    # Только цикл решений: без снапшотов, ленты, стакана и теневых вариантов
+    config.SNAPSHOT_PATH = None
+    config.TAPE_DIR = None
+    config.ORDERBOOK_DEPTH = 0
+    config.SHADOW_ENABLED = False
+
+    results = []
+    for symbols, rate, open_orders in itertools.product(args.symbols, args.rates, args.open_orders):
+        result = await run_level(args, symbols, rate, open_orders)
+        results.append(result)
+        logger.warning(
+            "symbols={symbols} rate={rate} open_orders={open_orders}: {tps:.1f}/{target_tps:.0f} ticks/s "
+            "p50={p50_ms:.2f}ms p99={p99_ms:.2f}ms cpu={cpu:.0%} rss={rss_mb:.0f}MB errors={errors}",
+            **result,
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,13 +1,45 @@
 import asyncio
 
-from app.repository import SAUnitOfWork, pg_async_session_maker
+from app.config import config
+from app.logger import logger, setup_logger
+from app.repository import (
+    ReadOnlyUnitOfWork,
+    SAUnitOfWork,
+    pg_async_session_maker,
+    report_session_maker,
+    writer_session_maker,
+)
 from app.services.api import BybitAPI
+from app.services.decode import JSON_DECODER
 from app.services.manager import Manager
+from app.utils.profiler import SamplingProfiler
 
 
 async def main() -> None:
+    setup_logger(
+        level=config.LOG_LEVEL,
+        json_format=config.LOG_JSON,
+        enqueue=config.LOG_ENQUEUE,
+        sample_interval=config.LOG_SAMPLE_INTERVAL,
+        sample_intervals=config.LOG_SAMPLE_INTERVALS,
+    )
+    logger.info("Exchange responses are decoded with {}", JSON_DECODER)
+    profiler = SamplingProfiler(
+        config.PROFILE_DIR,
+        interval=config.PROFILE_INTERVAL,
+        duration=config.PROFILE_DURATION,
+        fmt=config.PROFILE_FORMAT,
+    )
+    profiler.install(asyncio.get_running_loop())
+    if config.PROFILE_PORT:
+        await profiler.serve(config.PROFILE_PORT)
     api = BybitAPI()
-    manager = Manager(SAUnitOfWork(pg_async_session_maker), api)
+    manager = Manager(
+        SAUnitOfWork(pg_async_session_maker),
+        api,
+        ReadOnlyUnitOfWork(report_session_maker),
+        SAUnitOfWork(writer_session_maker),
+    )
     await manager.run()
 
 
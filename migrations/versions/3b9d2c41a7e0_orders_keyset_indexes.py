@@ -0,0 +1,28 @@
+"""orders keyset indexes
+
+Revision ID: 3b9d2c41a7e0
+Revises: f6b289d5f723
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d2c41a7e0'
+down_revision: Union[str, None] = 'f6b289d5f723'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_orders_close_at_id', 'orders', ['close_at', 'id'], unique=False)
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_created_at_id', table_name='orders')
+    op.drop_index('ix_orders_close_at_id', table_name='orders')
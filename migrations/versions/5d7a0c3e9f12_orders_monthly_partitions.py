@@ -0,0 +1,81 @@
+"""orders monthly partitions
+
+Revision ID: 5d7a0c3e9f12
+Revises: 8e1f4a6b2c90
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7a0c3e9f12'
+down_revision: Union[str, None] = '8e1f4a6b2c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 2
+
+
+def month_start(value: datetime.datetime) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_month(value: datetime.date) -> datetime.date:
+    return datetime.date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    # The table is rebuilt from its live shape, LIKE copies whatever columns it has now.
+    op.execute("ALTER TABLE orders RENAME TO orders_old")
+    op.execute("ALTER TABLE orders_old RENAME CONSTRAINT orders_pkey TO orders_old_pkey")
+    op.execute("ALTER INDEX IF EXISTS ix_orders_close_at_id RENAME TO ix_orders_old_close_at_id")
+    op.execute("ALTER INDEX IF EXISTS ix_orders_created_at_id RENAME TO ix_orders_old_created_at_id")
+    op.execute(
+        "CREATE TABLE orders (LIKE orders_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY orders.id")
+    op.execute("ALTER TABLE orders ADD CONSTRAINT orders_pkey PRIMARY KEY (id, created_at)")
+    op.execute("CREATE TABLE orders_default PARTITION OF orders DEFAULT")
+
+    first = op.get_bind().execute(sa.text("SELECT min(created_at) FROM orders_old")).scalar()
+    now = datetime.datetime.utcnow()
+    month = month_start(first or now)
+    last = month_start(now)
+    for _ in range(MONTHS_AHEAD):
+        last = next_month(last)
+    while month <= last:
+        end = next_month(month)
+        op.execute(
+            f"CREATE TABLE orders_y{month.year}m{month.month:02d} PARTITION OF orders "
+            f"FOR VALUES FROM ('{month}') TO ('{end}')"
+        )
+        month = end
+
+    op.execute("INSERT INTO orders SELECT * FROM orders_old")
+    op.execute("DROP TABLE orders_old")
+    op.create_index('ix_orders_close_at_id', 'orders', ['close_at', 'id'], unique=False)
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'], unique=False)
+    op.create_index(
+        'ix_orders_open', 'orders', ['reverse'], unique=False, postgresql_where=sa.text('close_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE orders RENAME TO orders_partitioned")
+    op.execute("ALTER TABLE orders_partitioned RENAME CONSTRAINT orders_pkey TO orders_partitioned_pkey")
+    op.execute("ALTER INDEX ix_orders_close_at_id RENAME TO ix_orders_partitioned_close_at_id")
+    op.execute("ALTER INDEX ix_orders_created_at_id RENAME TO ix_orders_partitioned_created_at_id")
+    op.execute("ALTER INDEX ix_orders_open RENAME TO ix_orders_partitioned_open")
+    op.execute("CREATE TABLE orders (LIKE orders_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    op.execute("ALTER SEQUENCE orders_id_seq OWNED BY orders.id")
+    op.execute("INSERT INTO orders SELECT * FROM orders_partitioned")
+    op.execute("DROP TABLE orders_partitioned")
+    op.execute("ALTER TABLE orders ADD CONSTRAINT orders_pkey PRIMARY KEY (id)")
+    op.create_index('ix_orders_close_at_id', 'orders', ['close_at', 'id'], unique=False)
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'], unique=False)
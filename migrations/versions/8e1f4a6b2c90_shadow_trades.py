@@ -0,0 +1,47 @@
+"""shadow trades
+
+Revision ID: 8e1f4a6b2c90
+Revises: 3b9d2c41a7e0
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e1f4a6b2c90'
+down_revision: Union[str, None] = '3b9d2c41a7e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('shadow_trades',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('variant', sa.String(), nullable=False),
+    sa.Column('order_type', postgresql.ENUM('long', 'short', name='ordertype', create_type=False), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('price_open', sa.Float(), nullable=False),
+    sa.Column('price_tp1', sa.Float(), nullable=False),
+    sa.Column('price_tp2', sa.Float(), nullable=False),
+    sa.Column('price_sl', sa.Float(), nullable=False),
+    sa.Column('price_close', sa.Float(), nullable=False),
+    sa.Column('pnl', sa.Float(), nullable=False),
+    sa.Column('exit_reason', sa.String(), nullable=False),
+    sa.Column('open_at', sa.DateTime(), nullable=False),
+    sa.Column('close_at', sa.DateTime(), nullable=False),
+    sa.Column('tp1_executed_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_shadow_trades_variant_close_at', 'shadow_trades', ['variant', 'close_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_shadow_trades_variant_close_at', table_name='shadow_trades')
+    op.drop_table('shadow_trades')
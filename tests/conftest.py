@@ -0,0 +1,13 @@
+import os
+
+# app.config needs these to import; tests never reach the exchange or a database
+for name, value in {
+    "BYBIT_API_KEY": "test",
+    "BYBIT_API_SECRET": "test",
+    "DB_USERNAME": "test",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "test",
+    "DB_PASSWORD": "test",
+}.items():
+    os.environ.setdefault(name, value)
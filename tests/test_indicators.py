@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.indicators import IndicatorKernel
+
+
+# Formulas the kernel replaced (DirectionManager before user-031), kept here as the reference.
+
+def pandas_ema(prices: list[float], window: int) -> list[float]:
+    return pd.Series(prices).ewm(span=window, adjust=False).mean().tolist()
+
+
+def pandas_rsi(prices: list[float], window: int = 14) -> list[float]:
+    delta = pd.Series(prices).diff()
+    gain = delta.clip(lower=0)
+    loss = -delta.clip(upper=0)
+    avg_gain = gain.ewm(alpha=1 / window, min_periods=window).mean()
+    avg_loss = loss.ewm(alpha=1 / window, min_periods=window).mean()
+    return (100 - (100 / (1 + avg_gain / avg_loss))).tolist()
+
+
+def calculate_atr(high: list[float], low: list[float], close: list[float], period: int = 14) -> float | None:
+    trs = [
+        max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+        for i in range(1, len(close))
+    ]
+    return sum(trs[-period:]) / period if len(trs) >= period else None
+
+
+def random_bars(rng: np.random.Generator, n: int) -> tuple[np.ndarray, ...]:
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    high = close * (1 + rng.uniform(0, 0.01, n))
+    low = close * (1 - rng.uniform(0, 0.01, n))
+    volume = rng.uniform(1, 100, n)
+    return close, high, low, volume
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_kernel_matches_pandas_per_row(seed):
+    rng = np.random.default_rng(seed)
+    rows, steps = 4, 300
+    kernel = IndicatorKernel(rows=rows, ema_spans=(9, 21))
+    series = [random_bars(rng, steps) for _ in range(rows)]
+    seen = [[] for _ in range(rows)]
+    for step in range(steps):
+        # Rows advance independently, as timeframes do in the shared kernel
+        mask = rng.random(rows) < 0.6
+        bar = np.array([[values[step] for values in row_series] for row_series in series]).T
+        kernel.update(bar[0], bar[1], bar[2], bar[3], mask=mask)
+        for row in np.flatnonzero(mask):
+            seen[row].append(step)
+            close, high, low, volume = (values[seen[row]] for values in series[row])
+            assert kernel.ema_of(9)[row] == pytest.approx(pandas_ema(list(close), 9)[-1])
+            assert kernel.ema_of(21)[row] == pytest.approx(pandas_ema(list(close), 21)[-1])
+            rsi = pandas_rsi(list(close))[-1]
+            assert kernel.rsi[row] == pytest.approx(rsi, nan_ok=True)
+            atr = calculate_atr(list(high), list(low), list(close))
+            assert kernel.atr[row] == pytest.approx(np.nan if atr is None else atr, nan_ok=True)
+            sma = pd.Series(volume).rolling(window=20).mean().iloc[-1]
+            assert kernel.volume_sma[row] == pytest.approx(sma, nan_ok=True)
+
+
+def test_nan_high_low_skips_atr_only():
+    rng = np.random.default_rng(7)
+    close, high, low, volume = random_bars(rng, 60)
+    kernel = IndicatorKernel(rows=1)
+    for i in range(40):
+        kernel.update(close[i:i + 1], high[i:i + 1], low[i:i + 1], volume[i:i + 1])
+    atr = kernel.atr[0]
+    kernel.update(close[40:41], np.array([np.nan]), np.array([np.nan]), np.array([np.nan]))
+    assert kernel.atr[0] == atr
+    assert kernel.ema_of(9)[0] == pytest.approx(pandas_ema(list(close[:41]), 9)[-1])
+
+
+def test_load_equals_updates():
+    rng = np.random.default_rng(3)
+    close, high, low, volume = random_bars(rng, 120)
+    loaded = IndicatorKernel(rows=2)
+    loaded.load(1, close, high, low, volume)
+    updated = IndicatorKernel(rows=2)
+    mask = np.array([False, True])
+    for values in zip(close, high, low, volume):
+        updated.update(*(np.full(2, value) for value in values), mask=mask)
+    for name in IndicatorKernel.STATE:
+        np.testing.assert_allclose(getattr(loaded, name), getattr(updated, name))
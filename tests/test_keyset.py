@@ -0,0 +1,86 @@
+import asyncio
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from app.repository.base import SARepository
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[int]
+    value: Mapped[int | None] = mapped_column(nullable=True)
+
+
+class ItemRepository(SARepository):
+    model = Item
+    name = "Item"
+
+
+class SyncSession:
+    """The AsyncSession surface find_page uses, over a sync SQLite session."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def execute(self, stmt):
+        return self.session.execute(stmt)
+
+
+@pytest.fixture
+def repository():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    rng = random.Random(5)
+    with Session(engine) as session:
+        session.add_all(
+            # Few distinct values so ties are broken by id, about a third NULL
+            Item(id=i, kind=i % 2, value=None if rng.random() < 0.3 else rng.randint(0, 5))
+            for i in range(1, 61)
+        )
+        session.commit()
+        yield ItemRepository(SyncSession(session)), session.query(Item).all()
+
+
+def expected_ids(items: list[Item], order: str, kind: int) -> list[int]:
+    desc = order == "desc"
+    items = [item for item in items if item.kind == kind]
+    valued = sorted((item for item in items if item.value is not None), key=lambda item: (item.value, item.id))
+    nulls = sorted((item for item in items if item.value is None), key=lambda item: item.id)
+    if desc:
+        valued.reverse()
+        nulls.reverse()
+    return [item.id for item in valued + nulls]
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("limit", [1, 4, 7, 100])
+def test_nullable_keyset_pages_every_row_once(repository, order, limit):
+    repo, items = repository
+
+    async def pages() -> list[int]:
+        ids, after = [], None
+        while True:
+            page = await repo.find_page({"kind": 1}, after=after, limit=limit, order=order, order_by="value")
+            ids += [row.id for row in page]
+            if len(page) < limit:
+                return ids
+            after = repo.page_key(page[-1], "value")
+
+    assert asyncio.run(pages()) == expected_ids(items, order, kind=1)
+
+
+def test_null_phase_uses_no_or(repository):
+    repo, _ = repository
+    for after, nulls in ((None, False), ((3, 10), False), ((None, 10), True)):
+        sql = str(repo._keyset({}, after, "asc", "value", nulls=nulls))
+        assert " OR " not in sql
+        assert "NULLS LAST" not in sql
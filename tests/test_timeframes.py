@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.timeframes import MINUTE_MS, BaseSeries, Rollup
+
+COLUMNS = ["start", "open", "high", "low", "close", "volume"]
+
+
+def random_minutes(seed: int, n: int = 600) -> tuple[np.ndarray, np.ndarray]:
+    """1m bars starting off a bucket boundary, with a few missing minutes."""
+    rng = np.random.default_rng(seed)
+    minutes = np.flatnonzero(rng.random(n + n // 10) > 0.05)[:n]
+    start = (1_767_225_600_000 + 7 * MINUTE_MS + minutes * MINUTE_MS).astype(float)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.002, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.002, n))
+    volume = rng.uniform(1, 50, n)
+    return start, np.column_stack([open_, high, low, close, volume])
+
+
+def resampled(bars: np.ndarray, minutes: int) -> np.ndarray:
+    """pandas reference: full buckets only, the partial first one dropped."""
+    frame = pd.DataFrame(bars.T, columns=COLUMNS)
+    frame.index = pd.to_datetime(frame["start"], unit="ms")
+    rolled = frame.resample(f"{minutes}min").agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+    ).dropna(subset=["open"])
+    if frame.index[0] != rolled.index[0]:
+        rolled = rolled.iloc[1:]
+    start = (rolled.index - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+    return np.vstack([start.to_numpy(dtype=float), rolled.to_numpy().T])
+
+
+@pytest.mark.parametrize("minutes", [5, 15, 60, 240])
+@pytest.mark.parametrize("seed", range(3))
+def test_view_matches_resample(minutes, seed):
+    start, values = random_minutes(seed)
+    base = BaseSeries(capacity=1000)
+    base.load(start, values)
+    np.testing.assert_allclose(Rollup(minutes, -1).view(base), resampled(base.bars, minutes))
+
+
+@pytest.mark.parametrize("minutes", [5, 15, 60])
+def test_incremental_rollup_matches_resample(minutes):
+    start, values = random_minutes(11)
+    base = BaseSeries(capacity=1000)
+    base.load(start[:300], values[:300])
+    rollup = Rollup(minutes, 2)
+    bars = [rollup.load(base)]
+    for i in range(300, len(start)):
+        for bar in base.on_kline(start[i], tuple(values[i]), is_open=i == len(start) - 1):
+            rolled = rollup.on_bar(bar)
+            if rolled is not None:
+                bars.append(rolled[:, None])
+    expected = resampled(base.bars, minutes)
+    closed = np.hstack(bars)
+    # The last bucket is still open in the rollup
+    np.testing.assert_allclose(closed, expected[:, :-1])
+    np.testing.assert_allclose(rollup.current, expected[:, -1])